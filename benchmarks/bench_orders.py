@@ -0,0 +1,51 @@
+"""
+Per-order CPU cost of building and rendering a charge, Order against a
+ContextOrder created from a shared MerchantContext.
+
+    python -m benchmarks.bench_orders
+"""
+import timeit
+
+from orbital_gateway.context import MerchantContext
+from orbital_gateway.orbital_gateway import Order
+
+CREDENTIALS = {
+    'merchant_id': '1234',
+    'username': 'user',
+    'password': 'secret',
+}
+
+FIELDS = {
+    'name': 'Test Visa',
+    'address1': 'Apt 2',
+    'address2': '1 Northeastern Blvd',
+    'city': 'Bedford',
+    'state': 'NH',
+    'zip_code': '03109-1234',
+    'phone': '(603) 555-1234',
+    'cc_num': '4112344112344113',
+    'cc_expiry': '1230',
+    'cvv': '411',
+    'order_id': '946033583',
+    'amount': '100.00',
+    'message_type': 'AC',
+}
+
+
+def main(number=20000):
+    context = MerchantContext(**CREDENTIALS)
+    kwargs = dict(FIELDS, **CREDENTIALS)
+    cases = (
+        ('Order()', lambda: Order(**kwargs)),
+        ('context.order()', lambda: context.order(**FIELDS)),
+        ('Order render', lambda: Order(**kwargs).render_charge()),
+        ('context.order render',
+         lambda: context.order(**FIELDS).render_charge()),
+    )
+    for label, func in cases:
+        seconds = timeit.timeit(func, number=number)
+        print('%-22s %8.2f us/order' % (label, seconds / number * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Time and memory per decoded Orbital response: the old ElementTree dict,
+parse_result's dict and the typed OrbitalResult.
+
+    python -m benchmarks.bench_results
+"""
+import timeit
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+from orbital_gateway.results import decode
+
+RESPONSE = (
+    '<?xml version="1.0" encoding="UTF-8"?><Response><NewOrderResp>'
+    '<IndustryType></IndustryType><MessageType>A</MessageType>'
+    '<MerchantID>1234</MerchantID><TerminalID>001</TerminalID>'
+    '<CardBrand>AX</CardBrand><AccountNum>341134113411347</AccountNum>'
+    '<OrderID>946033583</OrderID>'
+    '<TxRefNum>57E9B37668E45028A6FB3E10EF1F8CBD3B59535A</TxRefNum>'
+    '<TxRefIdx>0</TxRefIdx><ProcStatus>0</ProcStatus>'
+    '<ApprovalStatus>1</ApprovalStatus><RespCode>00</RespCode>'
+    '<AVSRespCode>B </AVSRespCode><CVV2RespCode> </CVV2RespCode>'
+    '<AuthCode>tst661</AuthCode><RecurringAdviceCd></RecurringAdviceCd>'
+    '<CAVVRespCode></CAVVRespCode><StatusMsg>Approved</StatusMsg>'
+    '<RespMsg></RespMsg><HostRespCode>100</HostRespCode>'
+    '<HostAVSRespCode>I3</HostAVSRespCode><HostCVV2RespCode>  '
+    '</HostCVV2RespCode><CustomerRefNum></CustomerRefNum><CustomerName>'
+    '</CustomerName><ProfileProcStatus></ProfileProcStatus>'
+    '<CustomerProfileMessage></CustomerProfileMessage><RespTime>194702'
+    '</RespTime><PartialAuthOccurred></PartialAuthOccurred>'
+    '<RequestedAmount></RequestedAmount><RedeemedAmount></RedeemedAmount>'
+    '<RemainingBalance></RemainingBalance><CountryFraudFilterStatus>'
+    '</CountryFraudFilterStatus><IsoCountryCode></IsoCountryCode>'
+    '</NewOrderResp></Response>'
+)
+
+
+def elementtree_dict(text):
+    values = {}
+    for child_elem in ET.fromstring(text)[0]:
+        values[child_elem.tag] = child_elem.text
+    return values
+
+
+def parse_result_dict(text):
+    return decode(text).to_dict()
+
+
+def typed_result(text):
+    return decode(text)
+
+
+def retained_bytes(func, count=10000):
+    # distinct copies so interned strings do not hide per-response cost
+    texts = [RESPONSE.replace('946033583', str(i)) for i in range(count)]
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    kept = [func(text) for text in texts]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    del kept
+    return size / float(count)
+
+
+def main(number=20000):
+    for label, func in (('ElementTree dict', elementtree_dict),
+                        ('parse_result dict', parse_result_dict),
+                        ('OrbitalResult', typed_result)):
+        seconds = timeit.timeit(lambda: func(RESPONSE), number=number)
+        print('%-18s %7.2f us/response %7.0f bytes/response' % (
+            label, seconds / number * 1e6, retained_bytes(func)
+        ))
+
+
+if __name__ == '__main__':
+    main()
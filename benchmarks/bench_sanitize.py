@@ -0,0 +1,56 @@
+"""
+Rows per minute cleaned by sanitize_columns() against Profile.sanitize()
+and remove_control_characters() one profile at a time.
+
+    python -m benchmarks.bench_sanitize
+"""
+import time
+
+from orbital_gateway.orbital_gateway import Profile, remove_control_characters
+from orbital_gateway.sanitize import PROFILE_FIELDS, sanitize_columns
+
+ROWS = [
+    {
+        'name': u'Test Customer %d' % i,
+        'address1': u'%d Northeastern Blvd / Suite 100' % i,
+        'address2': u'Apt %d' % (i % 50),
+        'city': u'Bedford',
+        'state': u'NH',
+        'zip_code': u'03109-1234',
+        'email': u'customer%d@example.com' % i,
+        'phone': u'(603) 555-%04d' % (i % 10000),
+    }
+    for i in range(1000)
+]
+# a few rows with characters that need the slow path
+ROWS[10]['name'] = u'Caf\xe9\x00 Owner'
+ROWS[500]['city'] = u'Bed\u200bford'
+
+
+def per_object(rows):
+    for row in rows:
+        profile = Profile(**row)
+        profile.sanitize()
+        [remove_control_characters(getattr(profile, rule.attribute))
+         for name, rule in PROFILE_FIELDS]
+
+
+def bulk(rows):
+    sanitize_columns(dict(
+        (name, [row[name] for row in rows]) for name, rule in PROFILE_FIELDS
+    ))
+
+
+def main(repeat=20):
+    for label, func in (('per object', per_object), ('bulk', bulk)):
+        start = time.time()
+        for i in range(repeat):
+            func(ROWS)
+        seconds = (time.time() - start) / (repeat * len(ROWS))
+        print('%-12s %8.2f us/row %12d rows/min' % (
+            label, seconds * 1e6, 60 / seconds
+        ))
+
+
+if __name__ == '__main__':
+    main()
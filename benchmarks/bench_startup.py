@@ -0,0 +1,62 @@
+"""
+Cold start cost of a payment worker: importing orbital_gateway and
+rendering its first request, each measured in a fresh interpreter.
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 50
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+# runs in the child interpreter, prints its timings as JSON
+CHILD = '''
+import json, sys, time
+start = time.time()
+from orbital_gateway.orbital_gateway import Order
+imported = time.time()
+Order(merchant_id='1234', order_id='1', amount='10.00',
+      cc_num='4112344112344113', cc_expiry='1230').render_charge()
+rendered = time.time()
+print(json.dumps({
+    'import_ms': (imported - start) * 1e3,
+    'first_render_ms': (rendered - imported) * 1e3,
+    'heavy_modules': sorted(
+        name for name in ('requests', 'urllib3', 'xml.etree.ElementTree',
+                          'unicodedata', 'logging', 'datetime')
+        if name in sys.modules
+    ),
+}))
+'''
+
+
+def measure(runs):
+    samples = []
+    for i in range(runs):
+        output = subprocess.check_output([sys.executable, '-c', CHILD])
+        samples.append(json.loads(output.decode('utf-8')))
+    return samples
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args(argv)
+    samples = measure(args.runs)
+    for key in ('import_ms', 'first_render_ms'):
+        print('%-16s %8.2f ms median of %d' % (
+            key, median([s[key] for s in samples]), args.runs
+        ))
+    print('loaded after first render: %s' % (
+        ', '.join(samples[-1]['heavy_modules']) or 'none of the heavy modules'
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Per-request serialization cost of Endpoint.parse_xml, before and after the
+compiled template cache.
+
+    python -m benchmarks.bench_templates
+"""
+import os
+import timeit
+import xml.etree.ElementTree as ET
+
+from orbital_gateway.orbital_gateway import remove_control_characters
+from orbital_gateway.xml_templates import TEMPLATE_DIR, load_template
+
+VALUES = {
+    'OrbitalConnectionUsername': 'user',
+    'OrbitalConnectionPassword': 'secret',
+    'BIN': '000001',
+    'MerchantID': '1234',
+    'MessageType': 'AC',
+    'AccountNum': '4112344112344113',
+    'OrderID': '946033583',
+    'Amount': '10000',
+    'AVSzip': '03109',
+    'AVSaddress1': '1 Northeastern Blvd',
+    'AVScity': 'Bedford',
+    'AVSstate': 'NH',
+    'Exp': '1220',
+    'CardSecValInd': '1',
+    'CardSecVal': '411',
+    'TxRefNum': None,
+    'PriorAuthID': None,
+}
+
+
+def legacy(name, values):
+    root = ET.parse(os.path.join(TEMPLATE_DIR, name)).getroot()
+    for key, value in values.items():
+        elem = root.find(".//%s" % key)
+        if elem is not None:
+            elem.text = value
+            if elem.text is not None:
+                elem.text = remove_control_characters(elem.text)
+    return ET.tostring(root)
+
+
+def compiled(name, values):
+    return load_template(name).render(values, clean=remove_control_characters)
+
+
+def main(number=20000):
+    name = 'order_new.xml'
+    assert legacy(name, dict(VALUES)) == compiled(name, dict(VALUES))
+    for label, func in (('ET.parse per call', legacy),
+                        ('compiled template', compiled)):
+        seconds = timeit.timeit(lambda: func(name, VALUES), number=number)
+        print('%-20s %8.2f us/request' % (label, seconds / number * 1e6))
+
+
+if __name__ == '__main__':
+    main()
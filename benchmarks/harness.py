@@ -0,0 +1,130 @@
+"""
+Timing helpers shared by the benchmark suite: run a callable in a single
+thread or over a thread pool, and summarise per call latency as
+p50/p95/p99 plus requests per second. The asyncio runner is in
+harness_aio, it needs Python 3.5.
+"""
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SINGLE = 'single'
+THREADS = 'threads'
+ASYNCIO = 'asyncio'
+if sys.version_info >= (3, 5):
+    MODES = (SINGLE, THREADS, ASYNCIO)
+else:
+    MODES = (SINGLE, THREADS)
+
+clock = getattr(time, 'perf_counter', time.time)
+
+
+def percentile(samples, q):
+    """
+    Nearest rank percentile of already sorted `samples`.
+    """
+    if not samples:
+        return 0.0
+    rank = int(round(q / 100.0 * (len(samples) - 1)))
+    return samples[rank]
+
+
+def summarise(name, mode, latencies, wall):
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        'name': name,
+        'mode': mode,
+        'iterations': count,
+        'p50_us': percentile(latencies, 50) * 1e6,
+        'p95_us': percentile(latencies, 95) * 1e6,
+        'p99_us': percentile(latencies, 99) * 1e6,
+        'mean_us': sum(latencies) / count * 1e6 if count else 0.0,
+        'rps': count / wall if wall else 0.0,
+    }
+
+
+def _timed(func):
+    start = clock()
+    func()
+    return clock() - start
+
+
+def run_single(name, func, iterations, warmup=10):
+    for i in range(warmup):
+        func()
+    start = clock()
+    latencies = [_timed(func) for i in range(iterations)]
+    return summarise(name, SINGLE, latencies, clock() - start)
+
+
+def run_threads(name, func, iterations, workers=8, warmup=10):
+    for i in range(warmup):
+        func()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        start = clock()
+        latencies = list(executor.map(
+            lambda i: _timed(func), range(iterations)
+        ))
+        wall = clock() - start
+    return summarise(name, THREADS, latencies, wall)
+
+
+def git_commit():
+    try:
+        with open(os.devnull, 'w') as devnull:
+            return subprocess.check_output(
+                ['git', 'rev-parse', '--short', 'HEAD'], stderr=devnull,
+            ).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save(results, path):
+    """
+    Write `results` as JSON along with enough context to compare runs.
+    """
+    document = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': multiprocessing.cpu_count(),
+        'results': results,
+    }
+    with open(path, 'w') as fout:
+        json.dump(document, fout, indent=2, sort_keys=True)
+    return document
+
+
+def load(path):
+    with open(path) as fin:
+        return json.load(fin)
+
+
+def compare(baseline, current, threshold=0.10):
+    """
+    Yield a row for every benchmark present in both runs, with the
+    relative p50 change and whether it grew by more than `threshold`.
+    """
+    before = dict(
+        ((r['name'], r['mode']), r) for r in baseline['results']
+    )
+    for result in current['results']:
+        old = before.get((result['name'], result['mode']))
+        if old is None or not old['p50_us']:
+            continue
+        change = result['p50_us'] / old['p50_us'] - 1
+        yield {
+            'name': result['name'],
+            'mode': result['mode'],
+            'baseline_p50_us': old['p50_us'],
+            'p50_us': result['p50_us'],
+            'change': change,
+            'regressed': change > threshold,
+        }
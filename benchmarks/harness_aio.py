@@ -0,0 +1,43 @@
+"""
+The asyncio counterpart of the harness runners, kept apart since async def
+does not compile before Python 3.5.
+"""
+import asyncio
+
+from .harness import ASYNCIO, clock, summarise
+
+
+def run_asyncio(name, coroutine_func, iterations, concurrency=8, warmup=10,
+                cleanup=None):
+    """
+    Await `coroutine_func()` `iterations` times, at most `concurrency` at
+    once, then await `cleanup()` in the same event loop.
+    """
+    async def call():
+        await coroutine_func()
+
+    async def timed(semaphore):
+        async with semaphore:
+            start = clock()
+            await call()
+            return clock() - start
+
+    async def main():
+        for i in range(warmup):
+            await call()
+        semaphore = asyncio.Semaphore(concurrency)
+        start = clock()
+        latencies = await asyncio.gather(
+            *[timed(semaphore) for i in range(iterations)]
+        )
+        wall = clock() - start
+        if cleanup is not None:
+            await cleanup()
+        return latencies, wall
+
+    loop = asyncio.new_event_loop()
+    try:
+        latencies, wall = loop.run_until_complete(main())
+    finally:
+        loop.close()
+    return summarise(name, ASYNCIO, latencies, wall)
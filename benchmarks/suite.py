@@ -0,0 +1,285 @@
+"""
+Throughput and latency benchmarks for the gateway client hot path.
+
+    python -m benchmarks.suite --mode single --output bench.json
+    python -m benchmarks.suite --mode all --compare bench.json
+
+Covers sanitize, convert_amount, amount parsing, card_type, request rendering and
+parse_result for Order, Profile, MarkForCapture and Reversal, an
+authorization replayed from a cassette, and the full HTTP round trip
+against a local Orbital simulator. The single and threads
+modes run every benchmark; the asyncio mode runs the round trips through
+the async endpoints (the rest is CPU bound and has no async variant), on
+Python 3.5 and later. Profile reads are not coalesced, every round trip
+reaches the simulator.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+from orbital_gateway import config, validation
+from orbital_gateway.cards import lookup as card_lookup
+from orbital_gateway.cassette import RecordingTransport, ReplayTransport
+from orbital_gateway.context import MerchantContext
+from orbital_gateway.money import Money, parse_amounts
+from orbital_gateway.orbital_gateway import (
+    MarkForCapture, Order, Profile, Reversal,
+)
+from orbital_gateway.simulator import OrbitalSimulator
+from orbital_gateway.transport import HTTPTransport
+
+from . import harness
+
+CREDENTIALS = {
+    'merchant_id': '1234',
+    'username': 'bench',
+    'password': 'bench',
+}
+
+ORDER = dict(CREDENTIALS, **{
+    'name': 'Test Visa',
+    'address1': 'Apt 2',
+    'address2': '1 Northeastern Blvd',
+    'city': 'Bedford',
+    'state': 'NH',
+    'zip_code': '03109-1234',
+    'phone': '(603) 555-1234',
+    'cc_num': '4112344112344113',
+    'cc_expiry': '1230',
+    'cvv': '411',
+    'order_id': '946033583',
+    'amount': '100.00',
+})
+
+CARDS = ['4112344112344113', '5112345112345114', '341134113411347',
+         '6559906559906557', '3528000000000007']
+
+# a capture batch: 1000 rows over a handful of price points
+BATCH_AMOUNTS = ['%d.99' % (i % 7 * 10 + 9) for i in range(1000)]
+
+
+class Fixture(object):
+    """
+    Simulator server plus one of each operation, authorized up front so
+    captures and reversals have something to refer to.
+    """
+    def __init__(self):
+        self.simulator = OrbitalSimulator(seed=1)
+        self.server = self.simulator.serve()
+        self.transport = HTTPTransport(pool_size=32)
+        self.kwargs = dict(CREDENTIALS, url=self.server.url,
+                           transport=self.transport)
+        auth = Order(**dict(ORDER, amount='1000000.00', **self.kwargs))
+        auth_result = auth.authorize()
+        profile = Profile(**dict(ORDER, **self.kwargs)).create()
+        self.tx_ref_num = auth_result['TxRefNum']
+        self.customer_ref_num = profile['CustomerRefNum']
+        self.responses = {
+            'order': auth.make_request(auth.render_charge()),
+            'profile': self.profile().make_request(self.profile().render_read()),
+            'mark_for_capture': self.capture().make_request(
+                self.capture().render_request()
+            ),
+            'reversal': self.reversal().make_request(
+                self.reversal().render_reversal()
+            ),
+        }
+        self.tmp = tempfile.mkdtemp()
+        recorder = RecordingTransport(
+            self.transport, os.path.join(self.tmp, 'bench.cassette')
+        )
+        self.order(transport=recorder).authorize()
+        recorder.save()
+        self.replay = ReplayTransport(recorder.path, repeat=True)
+
+    def order(self, cls=Order, **kwargs):
+        return cls(**dict(ORDER, **dict(self.kwargs, **kwargs)))
+
+    def profile(self, cls=Profile, **kwargs):
+        return cls(customer_ref_num=self.customer_ref_num,
+                   **dict(self.kwargs, **kwargs))
+
+    def capture(self, cls=MarkForCapture, **kwargs):
+        return cls(order_id='1', amount='1.00', tx_ref_num=self.tx_ref_num,
+                   **dict(self.kwargs, **kwargs))
+
+    def reversal(self, cls=Reversal, **kwargs):
+        return cls(order_id='1', amount='0.01', tx_ref_num=self.tx_ref_num,
+                   tx_ref_idx='0', **dict(self.kwargs, **kwargs))
+
+    def close(self):
+        self.replay.close()
+        shutil.rmtree(self.tmp)
+        self.transport.close()
+        self.server.stop()
+
+
+def cpu_benchmarks(fixture):
+    order = fixture.order()
+    profile = Profile(**dict(ORDER, **fixture.kwargs))
+    capture = fixture.capture()
+    reversal = fixture.reversal()
+    cards = [Order(cc_num=card) for card in CARDS]
+    responses = fixture.responses
+    context = MerchantContext(**fixture.kwargs)
+    fields = dict(
+        (name, value) for name, value in ORDER.items()
+        if name not in CREDENTIALS
+    )
+    validator = validation.default_validator
+    amount = Money.parse('1234.5')
+    order_values = {
+        'MessageType': config.AUTHORIZE, 'OrderID': ORDER['order_id'],
+        'Amount': order.convert_amount(ORDER['amount']),
+        'AccountNum': ORDER['cc_num'], 'Exp': ORDER['cc_expiry'],
+        'CardSecVal': ORDER['cvv'],
+    }
+    return [
+        ('build.order', lambda: fixture.order().render_charge()),
+        ('build.context_order',
+         lambda: context.order(**fields).render_charge()),
+        ('sanitize.order', order.sanitize),
+        ('sanitize.profile', profile.sanitize),
+        ('convert_amount', lambda: order.convert_amount('1234.5')),
+        ('convert_amount.money', lambda: order.convert_amount(amount)),
+        ('parse_amounts.batch', lambda: parse_amounts(BATCH_AMOUNTS)),
+        ('card_type', lambda: [card.card_type for card in cards]),
+        ('card_lookup', lambda: [card_lookup(card) for card in CARDS]),
+        ('validate.order', lambda: validator.validate(
+            validation.ORDER_CARD, order_values
+        )),
+        ('render.order', order.render_charge),
+        ('render.profile_create', profile.render_create),
+        ('render.profile_read', fixture.profile().render_read),
+        ('render.mark_for_capture', capture.render_request),
+        ('render.reversal', reversal.render_reversal),
+        ('parse_result.order', lambda: order.parse_result(responses['order'])),
+        ('parse_result.profile',
+         lambda: profile.parse_result(responses['profile'])),
+        ('parse_result.mark_for_capture',
+         lambda: capture.parse_result(responses['mark_for_capture'])),
+        ('parse_result.reversal',
+         lambda: reversal.parse_result(responses['reversal'])),
+        ('replay.order',
+         lambda: fixture.order(transport=fixture.replay).authorize()),
+    ]
+
+
+def roundtrip_benchmarks(fixture):
+    return [
+        ('roundtrip.order', lambda: fixture.order().authorize()),
+        ('roundtrip.profile',
+         lambda: fixture.profile(coalesce=False).read()),
+        ('roundtrip.mark_for_capture', lambda: fixture.capture().request()),
+        ('roundtrip.reversal', lambda: fixture.reversal().reversal()),
+    ]
+
+
+def async_roundtrip_benchmarks(fixture, transport):
+    from orbital_gateway.aio import (
+        AsyncMarkForCapture, AsyncOrder, AsyncProfile, AsyncReversal,
+    )
+    return [
+        ('roundtrip.order', lambda: fixture.order(
+            AsyncOrder, transport=transport).authorize()),
+        ('roundtrip.profile', lambda: fixture.profile(
+            AsyncProfile, transport=transport, coalesce=False).read()),
+        ('roundtrip.mark_for_capture', lambda: fixture.capture(
+            AsyncMarkForCapture, transport=transport).request()),
+        ('roundtrip.reversal', lambda: fixture.reversal(
+            AsyncReversal, transport=transport).reversal()),
+    ]
+
+
+def run(modes, iterations, workers, name_filter=None):
+    fixture = Fixture()
+    results = []
+
+    def selected(benchmarks):
+        return [(name, func) for name, func in benchmarks
+                if not name_filter or name_filter in name]
+
+    try:
+        for mode in modes:
+            if mode == harness.ASYNCIO:
+                from orbital_gateway.aio import AsyncTransport
+                from .harness_aio import run_asyncio
+                # aiohttp sessions belong to one event loop, and every
+                # benchmark runs in a loop of its own
+                for i, (name, func) in enumerate(selected(
+                        async_roundtrip_benchmarks(fixture, None))):
+                    transport = AsyncTransport(pool_size=workers)
+                    name, func = selected(
+                        async_roundtrip_benchmarks(fixture, transport)
+                    )[i]
+                    results.append(run_asyncio(
+                        name, func, iterations, concurrency=workers,
+                        cleanup=transport.close,
+                    ))
+                continue
+            benchmarks = selected(
+                cpu_benchmarks(fixture) + roundtrip_benchmarks(fixture)
+            )
+            for name, func in benchmarks:
+                if mode == harness.THREADS:
+                    results.append(harness.run_threads(
+                        name, func, iterations, workers=workers
+                    ))
+                else:
+                    results.append(harness.run_single(name, func, iterations))
+    finally:
+        fixture.close()
+    return results
+
+
+def report(results, out=sys.stdout):
+    out.write('%-32s %-8s %10s %10s %10s %10s\n' % (
+        'benchmark', 'mode', 'p50 us', 'p95 us', 'p99 us', 'req/s'
+    ))
+    for r in results:
+        out.write('%-32s %-8s %10.1f %10.1f %10.1f %10.0f\n' % (
+            r['name'], r['mode'], r['p50_us'], r['p95_us'], r['p99_us'],
+            r['rps'],
+        ))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--mode', choices=harness.MODES + ('all',),
+                        default=harness.SINGLE)
+    parser.add_argument('--iterations', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=8,
+                        help='threads, or concurrent tasks in asyncio mode')
+    parser.add_argument('--filter', help='only run benchmarks matching this')
+    parser.add_argument('--output', help='save results as JSON')
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help='JSON results of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='p50 increase counted as a regression')
+    args = parser.parse_args(argv)
+
+    modes = harness.MODES if args.mode == 'all' else (args.mode,)
+    results = run(modes, args.iterations, args.workers, args.filter)
+    report(results)
+    document = {'results': results}
+    if args.output:
+        document = harness.save(results, args.output)
+
+    if args.compare:
+        regressed = False
+        sys.stdout.write('\nagainst %s\n' % args.compare)
+        for row in harness.compare(harness.load(args.compare), document,
+                                   args.threshold):
+            regressed = regressed or row['regressed']
+            sys.stdout.write('%-32s %-8s %+7.1f%%%s\n' % (
+                row['name'], row['mode'], row['change'] * 100,
+                '  REGRESSION' if row['regressed'] else '',
+            ))
+        return 1 if regressed else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,296 @@
+# generated by `python -m orbital_gateway.xml_templates`, do not edit
+TEMPLATES = {
+    'mark_for_capture.xml': (
+        383194918,
+        (
+            '<Request>\n  <MarkForCapture>\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n  </MarkForCapture>\n</Request>',
+        ),
+        (
+            'OrbitalConnectionUsername',
+            'OrbitalConnectionPassword',
+            'OrderID',
+            'Amount',
+            'BIN',
+            'MerchantID',
+            'TerminalID',
+            'TxRefNum',
+        ),
+        (
+            '<OrbitalConnectionUsername />',
+            '<OrbitalConnectionPassword />',
+            '<OrderID />',
+            '<Amount />',
+            '<BIN />',
+            '<MerchantID />',
+            '<TerminalID>001</TerminalID>',
+            '<TxRefNum />',
+        ),
+    ),
+    'order_new.xml': (
+        3696211108,
+        (
+            '<Request>\n  <NewOrder>\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n  </NewOrder>\n</Request>',
+        ),
+        (
+            'OrbitalConnectionUsername',
+            'OrbitalConnectionPassword',
+            'IndustryType',
+            'MessageType',
+            'BIN',
+            'MerchantID',
+            'TerminalID',
+            'CardBrand',
+            'AccountNum',
+            'Exp',
+            'CurrencyCode',
+            'CurrencyExponent',
+            'CardSecValInd',
+            'CardSecVal',
+            'BCRtNum',
+            'CheckDDA',
+            'BankAccountType',
+            'BankPmtDelv',
+            'AVSzip',
+            'AVSaddress1',
+            'AVSaddress2',
+            'AVScity',
+            'AVSstate',
+            'AVSphoneNum',
+            'AVSname',
+            'CustomerProfileFromOrderInd',
+            'CustomerRefNum',
+            'CustomerProfileOrderOverrideInd',
+            'PriorAuthID',
+            'OrderID',
+            'Amount',
+            'TxRefNum',
+        ),
+        (
+            '<OrbitalConnectionUsername />',
+            '<OrbitalConnectionPassword />',
+            '<IndustryType>EC</IndustryType>',
+            '<MessageType>AC</MessageType>',
+            '<BIN />',
+            '<MerchantID />',
+            '<TerminalID>001</TerminalID>',
+            '<CardBrand />',
+            '<AccountNum />',
+            '<Exp />',
+            '<CurrencyCode>840</CurrencyCode>',
+            '<CurrencyExponent>2</CurrencyExponent>',
+            '<CardSecValInd />',
+            '<CardSecVal />',
+            '<BCRtNum />',
+            '<CheckDDA />',
+            '<BankAccountType />',
+            '<BankPmtDelv />',
+            '<AVSzip />',
+            '<AVSaddress1 />',
+            '<AVSaddress2 />',
+            '<AVScity />',
+            '<AVSstate />',
+            '<AVSphoneNum />',
+            '<AVSname />',
+            '<CustomerProfileFromOrderInd />',
+            '<CustomerRefNum />',
+            '<CustomerProfileOrderOverrideInd />',
+            '<PriorAuthID />',
+            '<OrderID />',
+            '<Amount />',
+            '<TxRefNum />',
+        ),
+    ),
+    'profile_CU.xml': (
+        4163840402,
+        (
+            '<Request>\n  <Profile>\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n  </Profile>\n</Request>',
+        ),
+        (
+            'OrbitalConnectionUsername',
+            'OrbitalConnectionPassword',
+            'CustomerBin',
+            'CustomerMerchantID',
+            'CustomerName',
+            'CustomerRefNum',
+            'CustomerAddress1',
+            'CustomerAddress2',
+            'CustomerCity',
+            'CustomerState',
+            'CustomerZIP',
+            'CustomerEmail',
+            'CustomerPhone',
+            'CustomerCountryCode',
+            'CustomerProfileAction',
+            'CustomerProfileOrderOverrideInd',
+            'CustomerProfileFromOrderInd',
+            'CustomerAccountType',
+            'Status',
+            'CCAccountNum',
+            'CCExpireDate',
+            'ECPAccountDDA',
+            'ECPAccountType',
+            'ECPAccountRT',
+            'ECPBankPmtDlv',
+        ),
+        (
+            '<OrbitalConnectionUsername />',
+            '<OrbitalConnectionPassword />',
+            '<CustomerBin />',
+            '<CustomerMerchantID />',
+            '<CustomerName />',
+            '<CustomerRefNum />',
+            '<CustomerAddress1 />',
+            '<CustomerAddress2 />',
+            '<CustomerCity />',
+            '<CustomerState />',
+            '<CustomerZIP />',
+            '<CustomerEmail />',
+            '<CustomerPhone />',
+            '<CustomerCountryCode />',
+            '<CustomerProfileAction />',
+            '<CustomerProfileOrderOverrideInd>NO</CustomerProfileOrderOverrideInd>',
+            '<CustomerProfileFromOrderInd />',
+            '<CustomerAccountType />',
+            '<Status>A</Status>',
+            '<CCAccountNum />',
+            '<CCExpireDate />',
+            '<ECPAccountDDA />',
+            '<ECPAccountType />',
+            '<ECPAccountRT />',
+            '<ECPBankPmtDlv />',
+        ),
+    ),
+    'profile_RD.xml': (
+        541026036,
+        (
+            '<Request>\n  <Profile>\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n  </Profile>\n</Request>',
+        ),
+        (
+            'OrbitalConnectionUsername',
+            'OrbitalConnectionPassword',
+            'CustomerBin',
+            'CustomerMerchantID',
+            'CustomerRefNum',
+            'CustomerProfileAction',
+        ),
+        (
+            '<OrbitalConnectionUsername />',
+            '<OrbitalConnectionPassword />',
+            '<CustomerBin />',
+            '<CustomerMerchantID />',
+            '<CustomerRefNum />',
+            '<CustomerProfileAction />',
+        ),
+    ),
+    'reversal.xml': (
+        1794618645,
+        (
+            '<Request>\n  <Reversal>\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n    ',
+            '\n  </Reversal>\n</Request>',
+        ),
+        (
+            'OrbitalConnectionUsername',
+            'OrbitalConnectionPassword',
+            'TxRefNum',
+            'TxRefIdx',
+            'AdjustedAmt',
+            'OrderID',
+            'BIN',
+            'MerchantID',
+            'TerminalID',
+            'OnlineReversalInd',
+        ),
+        (
+            '<OrbitalConnectionUsername />',
+            '<OrbitalConnectionPassword />',
+            '<TxRefNum />',
+            '<TxRefIdx />',
+            '<AdjustedAmt />',
+            '<OrderID />',
+            '<BIN />',
+            '<MerchantID />',
+            '<TerminalID>001</TerminalID>',
+            '<OnlineReversalInd />',
+        ),
+    ),
+}
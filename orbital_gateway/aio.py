@@ -0,0 +1,369 @@
+"""
+asyncio flavoured Order, Profile, MarkForCapture and Reversal.
+
+The async classes subclass the blocking ones and only replace the network
+round trip, so request rendering and `parse_result` are shared:
+
+    async with AsyncTransport(pool_size=20, max_concurrency=50) as transport:
+        order = AsyncOrder(transport=transport, **order_kwargs)
+        result = await order.authorize()
+
+Requires aiohttp (`pip install orbital_gateway[async]`).
+"""
+import asyncio
+import collections
+import datetime
+import time
+
+import requests
+
+from . import config
+from .limiter import IGNORED, AdaptiveLimit
+from .orbital_gateway import MarkForCapture, Order, Profile, Reversal
+from .retry import Transaction
+from .transport import ConnectFailed, TransportResponse
+
+
+class AsyncSingleFlight(object):
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, coroutine_func):
+        """
+        Await `coroutine_func()`, or the call for `key` already in flight
+        in the same event loop. Cancelling one waiter does not cancel the
+        shared call.
+        """
+        loop = asyncio.get_event_loop()
+        key = (loop, key)
+        future = self._calls.get(key)
+        if future is None:
+            future = self._calls[key] = asyncio.ensure_future(
+                coroutine_func()
+            )
+            future.add_done_callback(lambda f: self._calls.pop(key, None))
+        return await asyncio.shield(future)
+
+    def in_flight(self):
+        return len(self._calls)
+
+
+# process wide group used by AsyncProfile.read
+async_profile_reads = AsyncSingleFlight()
+
+
+class AsyncTransport(object):
+    def __init__(self, pool_size=10, max_concurrency=None, keep_alive=True,
+                 connect_timeout=5.0, read_timeout=30.0):
+        """
+        Non-blocking counterpart of transport.HTTPTransport.
+
+        pool_size       max open connections per gateway host
+        max_concurrency max requests in flight through this transport
+        keep_alive      close connections after each request when False
+        connect_timeout seconds to wait for the connection to open
+        read_timeout    seconds to wait for Orbital to answer
+        """
+        self.pool_size = pool_size
+        self.max_concurrency = max_concurrency
+        self.keep_alive = keep_alive
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._session = None
+        self._semaphore = None
+
+    def _get_session(self):
+        if self._session is None:
+            try:
+                import aiohttp
+            except ImportError:
+                raise ImportError(
+                    'AsyncTransport requires aiohttp, install it with '
+                    '`pip install orbital_gateway[async]`'
+                )
+            connector = aiohttp.TCPConnector(
+                limit_per_host=self.pool_size,
+                force_close=not self.keep_alive,
+            )
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_connection_create_start.append(_connect_start)
+            trace_config.on_connection_create_end.append(_connect_end)
+            self._session = aiohttp.ClientSession(
+                connector=connector, trace_configs=[trace_config]
+            )
+            if self.max_concurrency:
+                self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    def _timeout(self, timeout):
+        import aiohttp
+        connect, read = self.connect_timeout, self.read_timeout
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+        elif timeout is not None:
+            connect, read = min(connect, timeout), min(read, timeout)
+        return aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+
+    async def post(self, url, data, headers, timeout=None):
+        session = self._get_session()
+        if self._semaphore is None:
+            return await self._post(session, url, data, headers, timeout)
+        async with self._semaphore:
+            return await self._post(session, url, data, headers, timeout)
+
+    async def _post(self, session, url, data, headers, timeout):
+        import aiohttp
+        timing = {'connect': 0.0}
+        start = time.time()
+        try:
+            async with session.post(url, data=data, headers=headers,
+                                    timeout=self._timeout(timeout),
+                                    trace_request_ctx=timing) as resp:
+                elapsed = datetime.timedelta(seconds=time.time() - start)
+                text = await resp.text()
+                return TransportResponse(
+                    url, resp.status, text, elapsed, timing['connect']
+                )
+        except aiohttp.ClientConnectorError as e:
+            raise ConnectFailed(e)
+        except asyncio.TimeoutError as e:
+            if isinstance(e, getattr(aiohttp, 'ConnectionTimeoutError', ())):
+                raise requests.exceptions.ConnectTimeout(e)
+            raise requests.exceptions.Timeout(e)
+        except aiohttp.InvalidURL as e:
+            raise requests.exceptions.InvalidURL(e)
+        except aiohttp.ClientError as e:
+            raise requests.exceptions.ConnectionError(e)
+
+    async def warm_up(self, *urls):
+        """
+        Pre-open a pooled connection to each url, returns the urls that
+        could not be reached.
+        """
+        session = self._get_session()
+        failed = []
+        for url in urls:
+            if not url:
+                continue
+            try:
+                async with session.head(url, timeout=self._timeout(None)):
+                    pass
+            except Exception:
+                failed.append(url)
+        return failed
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+            self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+class AsyncAdaptiveTransport(object):
+    def __init__(self, transport, limit=None):
+        """
+        Async counterpart of limiter.AdaptiveTransport. Share `limit` only
+        between transports of one event loop, waiters are woken by the
+        requests of this transport.
+        """
+        self.transport = transport
+        self.limit = limit if limit is not None else AdaptiveLimit()
+        self._waiters = collections.deque()
+
+    async def _acquire(self):
+        start = self.limit.try_acquire()
+        if start is not None:
+            return start
+        self.limit.enqueue()
+        try:
+            while True:
+                waiter = asyncio.get_event_loop().create_future()
+                self._waiters.append(waiter)
+                try:
+                    await waiter
+                except asyncio.CancelledError:
+                    if waiter.done() and not waiter.cancelled():
+                        # woken, pass the slot on
+                        self._wake()
+                    raise
+                start = self.limit.try_acquire()
+                if start is not None:
+                    return start
+        finally:
+            self.limit.enqueue(-1)
+
+    def _wake(self):
+        free = max(self.limit.limit - self.limit.in_flight, 1)
+        while free and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    async def post(self, url, data, headers, timeout=None):
+        start = await self._acquire()
+        outcome = IGNORED
+        try:
+            response = await self.transport.post(url, data, headers, timeout)
+            outcome = self.limit.outcome(response)
+            return response
+        except Exception as e:
+            outcome = self.limit.outcome(error=e)
+            raise
+        finally:
+            self.limit.release(start, outcome)
+            self._wake()
+
+    async def warm_up(self, *urls):
+        return await self.transport.warm_up(*urls)
+
+    async def close(self):
+        await self.transport.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+async def _connect_start(session, context, params):
+    context.start = time.time()
+
+
+async def _connect_end(session, context, params):
+    timing = context.trace_request_ctx
+    if timing is not None:
+        timing['connect'] += time.time() - context.start
+
+
+_default_transports = {}
+
+
+def get_default_async_transport():
+    """
+    Transport used by async endpoints that are not given one, one per
+    running event loop.
+    """
+    loop = asyncio.get_event_loop()
+    transport = _default_transports.get(loop)
+    if transport is None:
+        for other in list(_default_transports):
+            if other.is_closed():
+                del _default_transports[other]
+        transport = _default_transports[loop] = AsyncTransport()
+    return transport
+
+
+class AsyncEndpointMixin(object):
+    @property
+    def transport(self):
+        return self._transport or get_default_async_transport()
+
+    async def warm_up(self):
+        return await self.transport.warm_up(self.url, self.url2)
+
+    async def make_request(self, xml):
+        transaction = Transaction(self, xml)
+        for delay, url, timeout in transaction.attempts():
+            if delay:
+                await asyncio.sleep(delay)
+            if transaction.entry is not None:
+                await asyncio.wrap_future(transaction.entry.prepare())
+            start = time.time()
+            try:
+                result = await self.transport.post(
+                    url, xml, transaction.headers, timeout
+                )
+                result.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                transaction.failed(url, e)
+                continue
+            text = transaction.completed(
+                url, result.text, time.time() - start, result
+            )
+            if text is not None:
+                return text
+
+        return transaction.exhausted()
+
+
+class AsyncProfile(AsyncEndpointMixin, Profile):
+    async def create(self):
+        self.result = await self.make_request(self.render_create())
+        self.invalidate()
+        return self.parse_result(self.result)
+
+    async def _read(self):
+        generation = self.cache_generation()
+        result = await self.make_request(self.render_read())
+        return self.store(self.parse_result(result), generation)
+
+    async def read(self):
+        values = self.cached()
+        if values is not None:
+            return values
+        key = self.read_key()
+        if key is None:
+            return await self._read()
+        return dict(await async_profile_reads.do(key, self._read))
+
+    async def update(self):
+        self.invalidate()
+        try:
+            result = await self.make_request(self.render_update())
+        finally:
+            self.invalidate()
+        return self.parse_result(result)
+
+    async def destroy(self):
+        self.invalidate()
+        try:
+            result = await self.make_request(self.render_destroy())
+        finally:
+            self.invalidate()
+        return self.parse_result(result)
+
+
+class AsyncOrder(AsyncEndpointMixin, Order):
+    async def charge(self):
+        result = await self.make_request(self.render_charge())
+        return self.parse_result(result)
+
+    async def authorize(self):
+        self.message_type = config.AUTHORIZE
+        return await self.charge()
+
+    async def authorize_capture(self):
+        self.message_type = config.AUTHORIZE_CAPTURE
+        return await self.charge()
+
+    async def force_capture(self):
+        self.message_type = config.FORCE_CAPTURE
+        return await self.charge()
+
+    async def refund(self):
+        self.message_type = config.REFUND
+        return await self.charge()
+
+
+class AsyncMarkForCapture(AsyncEndpointMixin, MarkForCapture):
+    async def request(self):
+        result = await self.make_request(self.render_request())
+        return self.parse_result(result)
+
+
+class AsyncReversal(AsyncEndpointMixin, Reversal):
+    async def reversal(self):
+        result = await self.make_request(self.render_reversal())
+        return self.parse_result(result)
+
+    async def void(self):
+        result = await self.make_request(self.render_void())
+        return self.parse_result(result)
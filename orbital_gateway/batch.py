@@ -0,0 +1,194 @@
+"""
+Concurrent submission of captures, refunds, voids, reversals and profile
+creates and reads.
+
+    runner = BatchRunner(workers=16, rate_limit=50)
+    for result in runner.run(specs):
+        ...
+    print(runner.summary)
+
+Each spec is a dict with an `action` key plus the kwargs of the matching
+Endpoint, e.g. {'action': 'capture', 'order_id': ..., 'amount': ...,
+'tx_ref_num': ...}. Specs are pulled from the input lazily and at most
+`max_pending` of them are in flight, so an arbitrarily long stream runs in
+flat memory. Amounts are parsed into money.Money before the request is
+built, once per distinct amount, and a spec with an invalid amount fails
+without being sent.
+"""
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import sys
+import time
+
+import six
+
+from . import config
+from .money import parse_amount
+from .orbital_gateway import MarkForCapture, Order, Profile, Reversal
+from .ratelimit import KeyedRateLimiter
+
+CAPTURE = 'capture'
+REFUND = 'refund'
+VOID = 'void'
+REVERSAL = 'reversal'
+PROFILE_CREATE = 'profile_create'
+PROFILE_READ = 'profile_read'
+
+ACTIONS = {
+    CAPTURE: (MarkForCapture, 'request'),
+    REFUND: (Order, 'refund'),
+    VOID: (Reversal, 'void'),
+    REVERSAL: (Reversal, 'reversal'),
+    PROFILE_CREATE: (Profile, 'create'),
+    PROFILE_READ: (Profile, 'read'),
+}
+
+SUCCESS = 'success'
+DECLINED = 'declined'
+FAILED = 'failed'
+
+
+def classify(response):
+    """
+    SUCCESS when Orbital processed and did not decline the transaction,
+    DECLINED otherwise.
+    """
+    proc_status = response.get('ProcStatus', response.get('ProfileProcStatus'))
+    if proc_status != config.PROCSTATUS_SUCCESS:
+        return DECLINED
+    if response.get('ApprovalStatus') in (None, '', config.APPROVAL_APPROVED):
+        return SUCCESS
+    return DECLINED
+
+
+class BatchResult(object):
+    __slots__ = ('spec', 'status', 'response', 'error', 'elapsed')
+
+    def __init__(self, spec, status, response=None, error=None, elapsed=0.0):
+        self.spec = spec
+        self.status = status
+        self.response = response
+        self.error = error
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return '<BatchResult %s %s>' % (self.spec.get('action'), self.status)
+
+
+class BatchSummary(object):
+    def __init__(self):
+        self.succeeded = 0
+        self.declined = 0
+        self.failed = 0
+        self.elapsed = 0.0
+
+    @property
+    def total(self):
+        return self.succeeded + self.declined + self.failed
+
+    def add(self, result):
+        if result.status == SUCCESS:
+            self.succeeded += 1
+        elif result.status == DECLINED:
+            self.declined += 1
+        else:
+            self.failed += 1
+
+    def __repr__(self):
+        return '<BatchSummary total=%d succeeded=%d declined=%d failed=%d>' % (
+            self.total, self.succeeded, self.declined, self.failed
+        )
+
+
+class BatchRunner(object):
+    def __init__(self, workers=8, max_pending=None, rate_limit=None,
+                 burst=None, endpoint_kwargs=None):
+        """
+        workers         size of the worker pool
+        max_pending     specs submitted but not yet yielded back, defaults
+                        to twice the number of workers
+        rate_limit      max requests per second per merchant id
+        burst           token bucket size for rate_limit
+        endpoint_kwargs passed to every Endpoint (credentials, urls,
+                        transport...), overridden by the spec's own keys
+        """
+        self.workers = workers
+        self.max_pending = max_pending or workers * 2
+        self.limiter = (
+            KeyedRateLimiter(rate_limit, burst) if rate_limit else None
+        )
+        self.endpoint_kwargs = endpoint_kwargs or {}
+        self.summary = BatchSummary()
+        # amount text -> Money, shared by the specs of every run
+        self._amounts = {}
+
+    def execute(self, spec):
+        """
+        Run a single spec, never raises.
+        """
+        start = time.time()
+        try:
+            kwargs = dict(self.endpoint_kwargs)
+            kwargs.update(spec)
+            endpoint_class, method = ACTIONS[kwargs.pop('action')]
+            if kwargs.get('amount') is not None:
+                kwargs['amount'] = parse_amount(
+                    kwargs['amount'], memo=self._amounts
+                )
+            endpoint = endpoint_class(**kwargs)
+            if self.limiter is not None:
+                self.limiter.acquire(endpoint.merchant_id)
+            response = getattr(endpoint, method)()
+        except Exception as e:
+            return BatchResult(spec, FAILED, error=e,
+                               elapsed=time.time() - start)
+        return BatchResult(spec, classify(response), response=response,
+                           elapsed=time.time() - start)
+
+    def run(self, specs):
+        """
+        Submit `specs` to the worker pool and yield a BatchResult for each
+        one as soon as it finishes. `self.summary` is kept up to date.
+        When reading `specs` raises, the specs already submitted are still
+        yielded before the error propagates.
+        """
+        start = time.time()
+        specs = iter(specs)
+        pending = set()
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            exhausted = False
+            failure = None
+            while True:
+                while not exhausted and len(pending) < self.max_pending:
+                    try:
+                        spec = next(specs)
+                    except StopIteration:
+                        exhausted = True
+                    except Exception:
+                        # what was submitted finishes and is yielded first
+                        exhausted = True
+                        failure = sys.exc_info()
+                    else:
+                        pending.add(executor.submit(self.execute, spec))
+                if not pending:
+                    if failure is not None:
+                        six.reraise(*failure)
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    self.summary.add(result)
+                    yield result
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+            self.summary.elapsed += time.time() - start
+
+    def submit(self, specs):
+        """
+        Run every spec and return the summary.
+        """
+        for result in self.run(specs):
+            pass
+        return self.summary
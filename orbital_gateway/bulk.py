@@ -0,0 +1,287 @@
+"""
+Bulk import of customer profiles into Orbital, and export of them.
+
+    importer = ProfileImporter('customers.results.jsonl', workers=16,
+                               rate_limit=50, endpoint_kwargs=credentials)
+    summary = importer.run(read_rows('customers.csv'))
+
+Each row holds our own customer id (the `id` column, see `id_field`) and
+Profile constructor arguments (name, address1, city, cc_num, cc_expiry...)
+in its other columns. Rows are read lazily, cleaned in chunks with
+sanitize_columns() and created through a BatchRunner, so memory stays flat
+however long the input is. Rows Orbital would reject fail validation
+locally and are never sent.
+
+Every finished row is appended to the results file as one JSON line:
+
+    {"row": 41, "id": "c-1041", "status": "success",
+     "customer_ref_num": "653048527", "error": null}
+
+and a checkpoint file next to it records how many leading rows are done.
+Running the same import again after an interruption resumes it: rows
+before the checkpoint, and later rows already in the results file, are
+skipped without being sanitized or sent. Creates still in flight when the
+process dies have no result line and are sent again on resume.
+
+    for result in export_profiles(refs, endpoint_kwargs=credentials):
+        print(result.spec['customer_ref_num'], result.response)
+
+reads profiles back concurrently, account numbers masked.
+"""
+import csv
+import io
+import json
+import os
+
+import six
+
+from .batch import (
+    FAILED, PROFILE_CREATE, PROFILE_READ, SUCCESS, BatchRunner,
+)
+from .cache import mask_profile
+from .sanitize import PROFILE_FIELDS, sanitize_columns
+
+CSV = 'csv'
+JSONL = 'jsonl'
+
+
+def _format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return CSV
+    if extension in ('.jsonl', '.json', '.ndjson'):
+        return JSONL
+    raise ValueError('unknown file format of %s, pass format=' % path)
+
+
+def _encode(value):
+    return value.encode('utf-8') if isinstance(value, six.text_type) else value
+
+
+def _decode(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+def _open_csv(path, mode):
+    # the Python 2 csv module only reads and writes bytes
+    if six.PY2:
+        return io.open(path, mode + 'b')
+    return io.open(path, mode, encoding='utf-8', newline='')
+
+
+def read_rows(path, format=None):
+    """
+    Rows of a CSV (with a header line) or JSON lines file as dicts, read
+    lazily.
+    """
+    format = format or _format(path)
+    if format == CSV:
+        with _open_csv(path, 'r') as f:
+            for row in csv.DictReader(f):
+                if six.PY2:
+                    row = dict(
+                        (_decode(name), _decode(value))
+                        for name, value in row.items()
+                    )
+                yield row
+    else:
+        with io.open(path, encoding='utf-8', newline='') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def write_rows(path, rows, format=None, fieldnames=None):
+    """
+    Write dicts as CSV or JSON lines, returns the number written. CSV
+    columns are `fieldnames`, by default the keys of the first row.
+    """
+    format = format or _format(path)
+    count = 0
+    if format == JSONL:
+        with io.open(path, 'w', encoding='utf-8', newline='') as f:
+            for row in rows:
+                f.write(json.dumps(row, sort_keys=True) + u'\n')
+                count += 1
+        return count
+    with _open_csv(path, 'w') as f:
+        writer = None
+        for row in rows:
+            if writer is None:
+                fieldnames = fieldnames or sorted(row)
+                if six.PY2:
+                    fieldnames = [_encode(name) for name in fieldnames]
+                writer = csv.DictWriter(f, fieldnames, extrasaction='ignore')
+                writer.writeheader()
+            if six.PY2:
+                row = dict(
+                    (_encode(name), _encode(value))
+                    for name, value in row.items()
+                )
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def sanitize_rows(rows):
+    """
+    Clean a list of rows in place with sanitize_columns().
+    """
+    columns = {}
+    for name, rule in PROFILE_FIELDS:
+        values = [row.get(name) for row in rows]
+        if any(value is not None for value in values):
+            columns[name] = values
+    for name, values in sanitize_columns(columns).items():
+        for row, value in zip(rows, values):
+            if name in row:
+                row[name] = value
+    return rows
+
+
+class ProfileImporter(object):
+    def __init__(self, results_path, checkpoint_path=None, id_field='id',
+                 retry_failed=False, chunk_size=512, checkpoint_every=100,
+                 **runner_kwargs):
+        """
+        results_path      JSON lines file the outcome of every row is
+                          appended to
+        checkpoint_path   defaults to results_path + '.checkpoint'
+        id_field          column holding our customer id
+        retry_failed      on resume, send rows that failed again; a failed
+                          create may have reached Orbital, so only use it
+                          with rows carrying their own customer_ref_num
+        chunk_size        rows sanitized together
+        checkpoint_every  finished rows between checkpoint writes
+
+        The rest (workers, max_pending, rate_limit, burst, endpoint_kwargs)
+        goes to the BatchRunner.
+        """
+        self.results_path = results_path
+        self.checkpoint_path = checkpoint_path or results_path + '.checkpoint'
+        self.id_field = id_field
+        self.retry_failed = retry_failed
+        self.chunk_size = chunk_size
+        self.checkpoint_every = checkpoint_every
+        self.runner = BatchRunner(**runner_kwargs)
+        self.completed = 0
+        self._next_row = 0
+        self._pending = {}
+
+    @property
+    def summary(self):
+        return self.runner.summary
+
+    def _resume(self):
+        """
+        Rows already done: the checkpoint, and the later rows with a result.
+        """
+        completed = 0
+        if os.path.exists(self.checkpoint_path):
+            with io.open(self.checkpoint_path, encoding='utf-8') as f:
+                completed = json.load(f)['completed']
+        done = set()
+        if os.path.exists(self.results_path):
+            with io.open(self.results_path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        result = json.loads(line)
+                    except ValueError:
+                        # cut short by the interruption
+                        continue
+                    if result['row'] < completed:
+                        continue
+                    if self.retry_failed and result['status'] == FAILED:
+                        continue
+                    done.add(result['row'])
+        return completed, done
+
+    def _specs(self, rows, completed, done):
+        for chunk in _chunks(enumerate(rows), self.chunk_size):
+            todo = [(i, row) for i, row in chunk
+                    if i >= completed and i not in done]
+            sanitize_rows([row for i, row in todo])
+            for i, row in todo:
+                spec = dict(row, action=PROFILE_CREATE)
+                spec.pop(self.id_field, None)
+                self._pending[id(spec)] = (i, row.get(self.id_field))
+                self._next_row = i + 1
+                yield spec
+            self._next_row = chunk[-1][0] + 1
+
+    def _checkpoint(self):
+        if self._pending:
+            completed = min(i for i, customer_id in self._pending.values())
+        else:
+            completed = self._next_row
+        if completed <= self.completed:
+            return
+        self.completed = completed
+        path = self.checkpoint_path + '.tmp'
+        with io.open(path, 'w', encoding='utf-8') as f:
+            f.write(six.text_type(json.dumps({'completed': completed})))
+        os.rename(path, self.checkpoint_path)
+
+    def run(self, rows):
+        """
+        Create a profile for every row not done yet, returns the
+        BatchSummary of this run.
+        """
+        self.completed, done = self._resume()
+        self._next_row = self.completed
+        self._pending = {}
+        specs = self._specs(rows, self.completed, done)
+        finished = 0
+        with io.open(self.results_path, 'a', encoding='utf-8') as results:
+            try:
+                for result in self.runner.run(specs):
+                    self._record(results, result)
+                    finished += 1
+                    if finished % self.checkpoint_every == 0:
+                        self._checkpoint()
+            finally:
+                self._checkpoint()
+        return self.runner.summary
+
+    def _record(self, results, result):
+        row, customer_id = self._pending.pop(id(result.spec))
+        response = result.response or {}
+        error = result.error
+        if error is None and result.status != SUCCESS:
+            error = response.get('CustomerProfileMessage')
+        results.write(json.dumps({
+            'row': row,
+            'id': customer_id,
+            'status': result.status,
+            'customer_ref_num': response.get('CustomerRefNum'),
+            'error': str(error) if error is not None else None,
+        }, sort_keys=True) + u'\n')
+        results.flush()
+
+
+def export_profiles(refs, mask=True, **runner_kwargs):
+    """
+    Read the profiles of the CustomerRefNums `refs` concurrently. Yields a
+    BatchResult per profile as its read finishes, `response` holding the
+    Profile.read() values, account numbers masked unless `mask` is False.
+    Takes the BatchRunner arguments.
+    """
+    runner = BatchRunner(**runner_kwargs)
+    specs = (
+        {'action': PROFILE_READ, 'customer_ref_num': ref} for ref in refs
+    )
+    for result in runner.run(specs):
+        if mask and result.response is not None:
+            result.response = mask_profile(result.response)
+        yield result
@@ -0,0 +1,187 @@
+"""
+Read-through cache of customer profiles.
+
+    cache = ProfileCache(MemoryCache(max_entries=10000), ttl=300)
+    profile = Profile(customer_ref_num='123', cache=cache, **credentials)
+    profile.read()      # Orbital round trip
+    profile.read()      # served from the cache
+    profile.update()    # invalidates the entry
+
+Entries are keyed by (merchant id, CustomerRefNum). Account numbers are
+masked before they are stored, so a cached profile never holds a full
+card or bank account number; reads through a cache always return the
+masked values, whether they came from Orbital or from the cache.
+
+A read that raced an update() or destroy() of the same profile is not
+stored: every key hashes to one of GENERATION_STRIPES invalidation
+counters, and a read only stores its result when its counter did not move
+while it was in flight. The counters are per process, so a shared store
+is only protected against the updates of this process.
+
+Backends only need get/set/delete of JSON serializable dicts, see
+CacheBackend for plugging in a shared store.
+"""
+import collections
+import threading
+import time
+
+from . import config
+
+# invalidation counters, keys sharing one only cost each other a store
+GENERATION_STRIPES = 256
+
+# field -> number of leading characters kept in the clear
+MASKED_FIELDS = {
+    'CCAccountNum': 6,
+    'ECPAccountDDA': 0,
+}
+
+
+def mask_number(value, keep_first=0, keep_last=4, mask_char='X'):
+    """
+    Mask all but the first `keep_first` and last `keep_last` characters:
+
+        mask_number('4112344112344113', 6) -> '411234XXXXXX4113'
+
+    Short values keep at most their last quarter.
+    """
+    if not value:
+        return value
+    if len(value) < keep_first + keep_last + 4:
+        keep_first, keep_last = 0, min(keep_last, len(value) // 4)
+    hidden = len(value) - keep_first - keep_last
+    return (value[:keep_first] + mask_char * hidden +
+            value[len(value) - keep_last:])
+
+
+def mask_profile(values):
+    masked = dict(values)
+    for name, keep_first in MASKED_FIELDS.items():
+        if masked.get(name):
+            masked[name] = mask_number(masked[name], keep_first)
+    return masked
+
+
+class CacheBackend(object):
+    """
+    Storage behind ProfileCache. Values are dicts of strings, so shared
+    stores can serialize them as JSON. Implementations must be safe to use
+    from several threads.
+    """
+    def get(self, key):
+        """
+        Return the value stored under `key`, None when missing or expired.
+        """
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        """
+        Store `value` under `key` for `ttl` seconds.
+        """
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+
+class MemoryCache(CacheBackend):
+    def __init__(self, max_entries=1024, clock=time.time):
+        """
+        In-process LRU cache with per entry expiry.
+        """
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                expires, value = self._entries.pop(key)
+            except KeyError:
+                return None
+            if expires <= self._clock():
+                return None
+            self._entries[key] = (expires, value)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (self._clock() + ttl, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ProfileCache(object):
+    def __init__(self, backend=None, ttl=300, prefix='orbital:profile'):
+        """
+        backend  CacheBackend, an in-memory one when omitted
+        ttl      seconds a profile is served without asking Orbital
+        prefix   namespace of the keys in a shared backend
+        """
+        self.backend = backend if backend is not None else MemoryCache()
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self._generations = [0] * GENERATION_STRIPES
+        self._lock = threading.Lock()
+
+    def key(self, merchant_id, customer_ref_num):
+        return '%s:%s:%s' % (self.prefix, merchant_id, customer_ref_num)
+
+    def _stripe(self, key):
+        return hash(key) % GENERATION_STRIPES
+
+    def generation(self, merchant_id, customer_ref_num):
+        """
+        Token to pass to set() by a read about to be sent.
+        """
+        stripe = self._stripe(self.key(merchant_id, customer_ref_num))
+        with self._lock:
+            return self._generations[stripe]
+
+    def get(self, merchant_id, customer_ref_num):
+        """
+        Cached profile as a new dict, None on a miss.
+        """
+        value = self.backend.get(self.key(merchant_id, customer_ref_num))
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return dict(value) if value is not None else None
+
+    def set(self, merchant_id, customer_ref_num, values, generation=None):
+        """
+        Mask and store a profile read from Orbital, returns the masked
+        values. Failed reads are not cached, nor reads that started
+        before the last invalidate(), when `generation` is given.
+        """
+        masked = mask_profile(values)
+        if values.get('ProfileProcStatus') == config.PROCSTATUS_SUCCESS:
+            key = self.key(merchant_id, customer_ref_num)
+            with self._lock:
+                if generation is None or \
+                        self._generations[self._stripe(key)] == generation:
+                    self.backend.set(key, masked, self.ttl)
+        return dict(masked)
+
+    def invalidate(self, merchant_id, customer_ref_num):
+        key = self.key(merchant_id, customer_ref_num)
+        with self._lock:
+            self._generations[self._stripe(key)] += 1
+            self.backend.delete(key)
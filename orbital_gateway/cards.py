@@ -0,0 +1,187 @@
+"""
+Card brand detection from a table of BIN (issuer identification number)
+ranges.
+
+    info = cards.lookup('4112344112344113')
+    info.brand          # 'Visa'
+    info.valid          # check digit and length both good
+
+The ranges in data/bin_ranges.csv are loaded once into a sorted array of
+non-overlapping intervals over the first 8 digits of the number, so a
+lookup is one bisect however many ranges the table holds. Where ranges
+overlap the narrowest one wins, which lets the table carry a broad legacy
+range next to the specific ones carved out of it.
+
+A different table is loaded with BinIndex.load(path) and installed with
+set_default_index().
+"""
+import bisect
+import io
+import os
+import re
+import threading
+
+BIN_RANGES = os.path.join(os.path.dirname(__file__), 'data', 'bin_ranges.csv')
+
+# ranges are compared on this many leading digits
+PREFIX_DIGITS = 8
+
+_LEADING_DIGITS = re.compile(r'[0-9]{1,%d}' % PREFIX_DIGITS)
+_DIGITS = re.compile(r'[0-9]+\Z')
+# digit -> sum of the digits of twice its value
+_DOUBLED = (0, 2, 4, 6, 8, 1, 3, 5, 7, 9)
+
+
+def luhn_valid(number):
+    """
+    True when the last digit of `number` is its Luhn check digit.
+    """
+    if not number or not _DIGITS.match(number):
+        return False
+    total = 0
+    for position, digit in enumerate(reversed(number)):
+        digit = ord(digit) - 48
+        total += _DOUBLED[digit] if position & 1 else digit
+    return total % 10 == 0
+
+
+class BinRange(object):
+    __slots__ = ('first', 'last', 'digits', 'brand', 'lengths')
+
+    def __init__(self, first, last, brand, lengths):
+        """
+        first, last  inclusive prefixes of the same length, e.g. '2221'
+                     and '2720'
+        brand        config.CARD_TYPE_* value
+        lengths      valid card number lengths
+        """
+        if len(first) != len(last) or not 0 < len(first) <= PREFIX_DIGITS \
+                or not _DIGITS.match(first) or not _DIGITS.match(last) \
+                or first > last:
+            raise ValueError('invalid BIN range %s-%s' % (first, last))
+        scale = 10 ** (PREFIX_DIGITS - len(first))
+        self.first = int(first) * scale
+        self.last = (int(last) + 1) * scale - 1
+        self.digits = len(first)
+        self.brand = brand
+        self.lengths = tuple(sorted(lengths))
+
+    def __repr__(self):
+        return 'BinRange(%d-%d %s)' % (self.first, self.last, self.brand)
+
+
+class CardInfo(object):
+    __slots__ = ('brand', 'lengths', 'luhn_valid', 'length_valid')
+
+    def __init__(self, brand, lengths, luhn_valid, length_valid):
+        self.brand = brand
+        self.lengths = lengths
+        self.luhn_valid = luhn_valid
+        self.length_valid = length_valid
+
+    @property
+    def valid(self):
+        return self.luhn_valid and self.length_valid
+
+    def __repr__(self):
+        return 'CardInfo(%s, valid=%s)' % (self.brand, self.valid)
+
+
+class BinIndex(object):
+    def __init__(self, ranges):
+        """
+        Index over BinRanges. The ranges are split at every boundary into
+        disjoint intervals, each holding the ranges covering it narrowest
+        first.
+        """
+        ranges = list(ranges)
+        bounds = sorted(
+            set(r.first for r in ranges) | set(r.last + 1 for r in ranges)
+        )
+        self._starts = bounds
+        self._covering = [
+            tuple(sorted(
+                (r for r in ranges if r.first <= start <= r.last),
+                key=lambda r: r.last - r.first,
+            ))
+            for start in bounds
+        ]
+
+    @classmethod
+    def load(cls, path=BIN_RANGES):
+        """
+        Index of a range table: one `first,last,brand,lengths` line per
+        range, lengths space separated, `#` starts a comment.
+        """
+        ranges = []
+        with io.open(path, encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.split('#', 1)[0].strip()
+                if not line:
+                    continue
+                try:
+                    first, last, brand, lengths = [
+                        field.strip() for field in line.split(',')
+                    ]
+                    ranges.append(BinRange(
+                        first, last, brand,
+                        [int(length) for length in lengths.split()],
+                    ))
+                except ValueError as e:
+                    raise ValueError('%s:%d: %s' % (path, line_number, e))
+        return cls(ranges)
+
+    def find(self, number):
+        """
+        Narrowest BinRange holding `number`, None when there is none.
+        """
+        match = _LEADING_DIGITS.match(number or '')
+        if match is None:
+            return None
+        prefix = match.group()
+        key = int(prefix.ljust(PREFIX_DIGITS, '0'))
+        i = bisect.bisect_right(self._starts, key) - 1
+        if i < 0:
+            return None
+        for bin_range in self._covering[i]:
+            # a shorter number can only match on the digits it has
+            if bin_range.digits <= len(prefix):
+                return bin_range
+        return None
+
+    def lookup(self, number):
+        """
+        CardInfo of a card number, None for an unknown brand.
+        """
+        bin_range = self.find(number)
+        if bin_range is None:
+            return None
+        return CardInfo(
+            bin_range.brand, bin_range.lengths, luhn_valid(number),
+            len(number) in bin_range.lengths,
+        )
+
+
+_default_index = None
+_default_lock = threading.Lock()
+
+
+def get_default_index():
+    """
+    Process wide BinIndex of the bundled range table.
+    """
+    global _default_index
+    if _default_index is None:
+        with _default_lock:
+            if _default_index is None:
+                _default_index = BinIndex.load()
+    return _default_index
+
+
+def set_default_index(index):
+    global _default_index
+    _default_index = index
+
+
+def lookup(number):
+    return get_default_index().lookup(number)
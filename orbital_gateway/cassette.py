@@ -0,0 +1,239 @@
+"""
+Record and replay of gateway traffic, for deterministic offline runs.
+
+    with RecordingTransport(HTTPTransport(), 'auth.cassette') as transport:
+        Order(transport=transport, **order_kwargs).authorize()
+
+    transport = ReplayTransport('auth.cassette')
+    Order(transport=transport, **order_kwargs).authorize()
+
+Requests are matched by a SHA-1 of their url and normalized body, XML
+whitespace and connection credentials removed, plus how many times the
+same request was made before. Replay does not depend on the order of
+requests, so concurrent runs replay as well as sequential ones.
+
+A cassette file is a header, a table of fixed size entries sorted by
+request key and the response bodies:
+
+    magic 'ORBCAS01', entry count       >8sI
+    entry: key, occurrence, body offset, body length, HTTP status
+                                        >20sIQIH
+    response bodies, utf-8
+
+It is mmapped and binary searched in place, nothing is parsed up front.
+"""
+import hashlib
+import mmap
+import os
+import re
+import struct
+import threading
+
+from .transport import TransportResponse
+
+MAGIC = b'ORBCAS01'
+_HEADER = struct.Struct('>8sI')
+_ENTRY = struct.Struct('>20sIQIH')
+_KEY = struct.Struct('>20sI')
+
+_CREDENTIALS = re.compile(
+    r'(<OrbitalConnection(?:Username|Password)>)[^<]*(</)'
+)
+_BETWEEN_TAGS = re.compile(r'>\s+<')
+
+
+class CassetteMiss(LookupError):
+    pass
+
+
+def request_key(url, data):
+    """
+    SHA-1 digest matching a request to its recording.
+    """
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+    data = _CREDENTIALS.sub(r'\1\2', data or u'')
+    data = _BETWEEN_TAGS.sub(u'><', data.strip())
+    return hashlib.sha1(
+        (u'%s\n%s' % (url, data)).encode('utf-8')
+    ).digest()
+
+
+def write_cassette(path, interactions):
+    """
+    Write (url, data, status, text) interactions, in the order they were
+    made, to a cassette file. Returns the number of entries.
+    """
+    seen = {}
+    entries = []
+    bodies = []
+    for url, data, status, text in interactions:
+        key = request_key(url, data)
+        occurrence = seen.get(key, 0)
+        seen[key] = occurrence + 1
+        body = (text or u'').encode('utf-8')
+        entries.append((key, occurrence, len(bodies), status))
+        bodies.append(body)
+    entries.sort()
+    offset = _HEADER.size + _ENTRY.size * len(entries)
+    offsets = []
+    for body in bodies:
+        offsets.append(offset)
+        offset += len(body)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, len(entries)))
+        for key, occurrence, index, status in entries:
+            f.write(_ENTRY.pack(
+                key, occurrence, offsets[index], len(bodies[index]), status
+            ))
+        for body in bodies:
+            f.write(body)
+    os.rename(tmp, path)
+    return len(entries)
+
+
+class Cassette(object):
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(
+                self._file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+        except ValueError:
+            self._file.close()
+            raise ValueError('%s is not a cassette' % path)
+        magic, self.count = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError('%s is not a cassette' % path)
+
+    def find(self, key, occurrence=0, repeat=False):
+        """
+        (status, text) recorded for the `occurrence`th request with `key`,
+        None when there is none. With `repeat`, requests beyond the ones
+        recorded get the last recording.
+        """
+        target = (key, occurrence)
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            position = _HEADER.size + middle * _ENTRY.size
+            if _KEY.unpack_from(self._map, position) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count:
+            entry = self._entry(low)
+            if entry[:2] == target:
+                return self._response(entry)
+        if repeat and low > 0:
+            entry = self._entry(low - 1)
+            if entry[0] == key:
+                return self._response(entry)
+        return None
+
+    def _entry(self, index):
+        return _ENTRY.unpack_from(self._map, _HEADER.size + index * _ENTRY.size)
+
+    def _response(self, entry):
+        key, occurrence, offset, length, status = entry
+        return status, self._map[offset:offset + length].decode('utf-8')
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        if getattr(self, '_map', None) is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ReplayTransport(object):
+    def __init__(self, cassette, repeat=False):
+        """
+        Transport answering from `cassette`, a Cassette or the path of one.
+        Raises CassetteMiss for requests that were not recorded. With
+        `repeat`, a request made more often than recorded gets the last
+        recorded response again.
+        """
+        if not isinstance(cassette, Cassette):
+            cassette = Cassette(cassette)
+        self.cassette = cassette
+        self.repeat = repeat
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def post(self, url, data, headers, timeout=None):
+        key = request_key(url, data)
+        with self._lock:
+            occurrence = self._seen.get(key, 0)
+            self._seen[key] = occurrence + 1
+        found = self.cassette.find(key, occurrence, self.repeat)
+        if found is None:
+            raise CassetteMiss(
+                'no recording of request %d of this kind to %s in %s' % (
+                    occurrence + 1, url, self.cassette.path
+                )
+            )
+        status, text = found
+        return TransportResponse(url, status, text)
+
+    def rewind(self):
+        """
+        Replay the cassette from its first request again.
+        """
+        with self._lock:
+            self._seen.clear()
+
+    def warm_up(self, *urls):
+        return []
+
+    def close(self):
+        self.cassette.close()
+
+
+class RecordingTransport(object):
+    def __init__(self, transport, path):
+        """
+        Transport wrapper recording the responses of `transport` and
+        writing them to the cassette at `path` on save() or close().
+        Requests that raise are not recorded.
+        """
+        self.transport = transport
+        self.path = path
+        self.interactions = []
+        self._lock = threading.Lock()
+
+    def post(self, url, data, headers, timeout=None):
+        response = self.transport.post(url, data, headers, timeout)
+        with self._lock:
+            self.interactions.append(
+                (url, data, response.status_code, response.text)
+            )
+        return response
+
+    def save(self):
+        with self._lock:
+            return write_cassette(self.path, self.interactions)
+
+    def warm_up(self, *urls):
+        return self.transport.warm_up(*urls)
+
+    def close(self):
+        self.save()
+        self.transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,3 +1,4 @@
+PROCSTATUS_SUCCESS = '0'
 PROCSTATUS_INVALID_RETRY_TRACE = '9714'
 PROCSTATUS_USER_NOT_FOUND = '9581'
 
@@ -26,12 +27,16 @@ CARD_TYPE_MC = 'MC'
 CARD_TYPE_AMEX = 'Amex'
 CARD_TYPE_DISCOVER = 'Discover'
 CARD_TYPE_JCB = 'JCB'
+CARD_TYPE_DINERS = 'Diners'
+CARD_TYPE_UNIONPAY = 'UnionPay'
 CARD_TYPES = [
     CARD_TYPE_VISA,
     CARD_TYPE_MC,
     CARD_TYPE_AMEX,
     CARD_TYPE_DISCOVER,
     CARD_TYPE_JCB,
+    CARD_TYPE_DINERS,
+    CARD_TYPE_UNIONPAY,
 ]
 
 # message types
@@ -65,4 +70,14 @@ AUTH_PLATFORM_BIN = {
     'pns': '000002'
 }
 
+# ApprovalStatus values
+APPROVAL_DECLINED = '0'
+APPROVAL_APPROVED = '1'
+APPROVAL_ERROR = '2'
 
+# orders are in US dollars, CurrencyCode 840 with 2 decimal places
+CURRENCY_EXPONENT = 2
+
+# card brands release an authorization that was not captured after about
+# a week, seconds
+AUTHORIZATION_TTL = 7 * 24 * 3600
@@ -0,0 +1,199 @@
+"""
+Shared health tracking for the Orbital gateway urls.
+
+Every url gets a circuit breaker and a moving average of its latency. The
+failover schedule tries healthy urls fastest first, skips urls whose
+breaker is open, lets a single probe through once the breaker's reset
+timeout has passed, and sleeps a jittered exponential backoff between
+rounds.
+"""
+import random
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(IOError):
+    """
+    Raised when every gateway url has an open circuit breaker.
+    """
+
+
+class CircuitBreaker(object):
+    def __init__(self, failure_threshold=3, reset_timeout=30.0,
+                 clock=time.time):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        return self._state
+
+    @property
+    def available(self):
+        """
+        Whether allow() would currently let a request through, without
+        taking the half open probe.
+        """
+        if self._state == CLOSED:
+            return True
+        now = self._clock()
+        if self._state == OPEN:
+            return now - self._opened_at >= self.reset_timeout
+        return (self._probe_started is None or
+                now - self._probe_started >= self.reset_timeout)
+
+    def allow(self):
+        """
+        Whether a request may be sent. Once the reset timeout has passed
+        an open breaker goes half open and lets exactly one probe through;
+        a probe that never reports back is replaced after another timeout.
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            now = self._clock()
+            if self._state == OPEN:
+                if now - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = HALF_OPEN
+            elif (self._probe_started is not None and
+                    now - self._probe_started < self.reset_timeout):
+                return False
+            self._probe_started = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or (
+                    self._failures >= self.failure_threshold):
+                self._state = OPEN
+                self._opened_at = self._clock()
+                self._probe_started = None
+
+
+class EndpointHealth(object):
+    def __init__(self, failure_threshold=3, reset_timeout=30.0,
+                 latency_alpha=0.3, backoff_base=0.1, backoff_cap=2.0,
+                 clock=time.time):
+        """
+        failure_threshold consecutive failures that open a url's breaker
+        reset_timeout     seconds an open breaker waits before probing
+        latency_alpha     weight of the newest sample in the latency average
+        backoff_base      first backoff ceiling in seconds, doubled per round
+        backoff_cap       largest backoff ceiling in seconds
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.latency_alpha = latency_alpha
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._clock = clock
+        self._breakers = {}
+        self._latency = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, url):
+        try:
+            return self._breakers[url]
+        except KeyError:
+            pass
+        with self._lock:
+            if url not in self._breakers:
+                self._breakers[url] = CircuitBreaker(
+                    self.failure_threshold, self.reset_timeout, self._clock
+                )
+            return self._breakers[url]
+
+    def latency(self, url):
+        """
+        Moving average of successful round trips to `url`, None until the
+        first one.
+        """
+        return self._latency.get(url)
+
+    def record_success(self, url, elapsed):
+        with self._lock:
+            average = self._latency.get(url)
+            if average is None:
+                self._latency[url] = elapsed
+            else:
+                self._latency[url] = average + self.latency_alpha * (
+                    elapsed - average
+                )
+        self.breaker(url).record_success()
+
+    def record_failure(self, url):
+        self.breaker(url).record_failure()
+
+    def rank(self, urls):
+        """
+        `urls` ordered available breakers first (closed, or due for a half
+        open probe), then by average latency. Urls without samples count as
+        fast as the best known one, so ties keep the configured order.
+        """
+        known = [self._latency[url] for url in urls if url in self._latency]
+        fastest = min(known) if known else 0.0
+
+        def key(url):
+            available = self.breaker(url).available
+            return (not available, self._latency.get(url, fastest))
+        return sorted(urls, key=key)
+
+    def backoff(self, attempt):
+        """
+        Full jitter exponential backoff before round `attempt`.
+        """
+        ceiling = min(self.backoff_cap, self.backoff_base * 2 ** attempt)
+        return random.uniform(0, ceiling)
+
+    def schedule(self, urls, attempts=3):
+        """
+        Yield (delay, url) pairs: sleep `delay` seconds then try `url`, and
+        report the outcome with record_success/record_failure. Stop
+        iterating as soon as a request succeeds.
+        """
+        tried = False
+        for attempt in range(attempts):
+            delay = self.backoff(attempt) if attempt else 0.0
+            for url in self.rank(urls):
+                if self.breaker(url).allow():
+                    tried = True
+                    yield delay, url
+                    delay = 0.0
+        if not tried and urls:
+            raise CircuitOpenError(
+                'circuit open for every gateway url: %s' % ', '.join(urls)
+            )
+
+
+_default_health = None
+_default_lock = threading.Lock()
+
+
+def get_default_health():
+    """
+    Process wide health tracker shared by every Endpoint not given one.
+    """
+    global _default_health
+    if _default_health is None:
+        with _default_lock:
+            if _default_health is None:
+                _default_health = EndpointHealth()
+    return _default_health
@@ -0,0 +1,274 @@
+"""
+Per transaction timing for Orbital requests.
+
+Observers are callables that receive one Timing per logical transaction,
+once it succeeded or gave up:
+
+    from orbital_gateway import instrumentation
+
+    instrumentation.add_observer(instrumentation.LoggingObserver())
+    order = Order(observers=[PrometheusObserver()], **order_kwargs)
+
+Timing breaks the transaction down into rendering the request XML,
+opening the connection, waiting for Orbital's answer and the total, and
+records the retries, the urls tried and the ProcStatus. Nothing is timed
+while no observer is registered, globally or on the endpoint.
+"""
+import functools
+import re
+import threading
+import time
+
+clock = getattr(time, 'perf_counter', time.time)
+
+# logging.INFO, logging is imported when something is logged
+INFO = 20
+
+_PROC_STATUS = re.compile(r'ProcStatus>\s*([^<\s]+)\s*<')
+
+_observers = ()
+_lock = threading.Lock()
+
+
+def add_observer(observer):
+    """
+    Register `observer` for the transactions of every endpoint.
+    """
+    global _observers
+    with _lock:
+        _observers = _observers + (observer,)
+
+
+def remove_observer(observer):
+    global _observers
+    with _lock:
+        _observers = tuple(o for o in _observers if o != observer)
+
+
+def observers_for(endpoint):
+    """
+    Observers of `endpoint`'s own followed by the global ones, empty when
+    instrumentation is off.
+    """
+    if endpoint.observers:
+        return tuple(endpoint.observers) + _observers
+    return _observers
+
+
+def _seconds(value):
+    if value is None:
+        return None
+    if hasattr(value, 'total_seconds'):
+        return value.total_seconds()
+    return value
+
+
+class Timing(object):
+    """
+    Timing breakdown of one logical transaction, in seconds.
+
+    endpoint      class name of the endpoint, e.g. 'Order'
+    operation     'charge', 'create', 'read', 'request', 'reversal', ...
+    message_type  MessageType of orders
+    url           gateway url of the last attempt
+    urls          every url tried, in order
+    retries       attempts after the first one
+    failover      whether the last attempt came after a failed one; the
+                  first attempt is not a failover whichever url the
+                  health ranking sent it to
+    render        building the request XML
+    connect       opening a connection for the last attempt, 0 when a
+                  pooled one was reused
+    ttfb          from sending the last attempt to Orbital's answer
+    total         render included, retries and backoff included
+    proc_status   ProcStatus of the answer, None when there was none
+    error         exception that ended the transaction
+    """
+    __slots__ = (
+        'endpoint', 'operation', 'message_type', 'merchant_id',
+        'trace_number', 'url', 'urls', 'retries', 'failover', 'render',
+        'connect', 'ttfb', 'total', 'proc_status', 'error', '_start',
+    )
+
+    def __init__(self, endpoint, trace_number):
+        render = endpoint._render_time or 0.0
+        endpoint._render_time = None
+        self.endpoint = type(endpoint).__name__
+        self.operation = endpoint._operation
+        self.message_type = getattr(endpoint, 'message_type', None)
+        self.merchant_id = endpoint.merchant_id
+        self.trace_number = trace_number
+        self.url = None
+        self.urls = []
+        self.retries = 0
+        self.failover = False
+        self.render = render
+        self.connect = None
+        self.ttfb = None
+        self.total = None
+        self.proc_status = None
+        self.error = None
+        self._start = clock() - render
+
+    def attempt(self, url, elapsed, response=None):
+        self.url = url
+        self.urls.append(url)
+        self.retries = len(self.urls) - 1
+        self.failover = self.retries > 0
+        self.connect = _seconds(getattr(response, 'connect_time', None))
+        ttfb = _seconds(getattr(response, 'elapsed', None))
+        if ttfb is None:
+            ttfb = elapsed
+        if ttfb is not None and self.connect:
+            ttfb = max(ttfb - self.connect, 0.0)
+        self.ttfb = ttfb
+
+    def finish(self, text=None, error=None):
+        self.total = clock() - self._start
+        self.error = error
+        if text:
+            match = _PROC_STATUS.search(text)
+            if match:
+                self.proc_status = match.group(1)
+        return self
+
+    @property
+    def status(self):
+        """
+        ProcStatus, or 'error' when Orbital never answered.
+        """
+        if self.proc_status is not None:
+            return self.proc_status
+        return 'error'
+
+    def to_dict(self):
+        values = dict(
+            (name, getattr(self, name)) for name in self.__slots__
+            if not name.startswith('_')
+        )
+        values['error'] = repr(self.error) if self.error else None
+        return values
+
+    def __repr__(self):
+        return '<Timing %s.%s %s total=%.4f>' % (
+            self.endpoint, self.operation, self.status, self.total or 0.0
+        )
+
+
+def emit(observers, timing):
+    for observer in observers:
+        try:
+            observer(timing)
+        except Exception:
+            import logging
+            logging.getLogger(__name__).exception(
+                'timing observer %r failed', observer
+            )
+
+
+def rendering(func):
+    """
+    Decorate an endpoint's render_* method to record the operation, and
+    time it when instrumented, for the next make_request.
+    """
+    operation = func.__name__[len('render_'):]
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        self._operation = operation
+        if not observers_for(self):
+            return func(self, *args, **kwargs)
+        start = clock()
+        xml = func(self, *args, **kwargs)
+        self._render_time = clock() - start
+        return xml
+    return wrapper
+
+
+class LoggingObserver(object):
+    def __init__(self, logger=None, level=INFO):
+        """
+        Log one line per transaction, the Timing as a dict is attached to
+        the record as `orbital_timing`.
+        """
+        if logger is None:
+            import logging
+            logger = logging.getLogger('orbital_gateway.timing')
+        self.logger = logger
+        self.level = level
+
+    def __call__(self, timing):
+        if not self.logger.isEnabledFor(self.level):
+            return
+        self.logger.log(
+            self.level,
+            '%s.%s status=%s total=%.4f render=%.4f connect=%s ttfb=%s '
+            'retries=%d url=%s trace=%s',
+            timing.endpoint, timing.operation, timing.status, timing.total,
+            timing.render, _format(timing.connect), _format(timing.ttfb),
+            timing.retries, timing.url, timing.trace_number,
+            extra={'orbital_timing': timing.to_dict()},
+        )
+
+
+def _format(seconds):
+    return '-' if seconds is None else '%.4f' % seconds
+
+
+class PrometheusObserver(object):
+    def __init__(self, registry=None, namespace='orbital', buckets=None):
+        """
+        Export transactions as prometheus_client metrics:
+
+            <namespace>_transactions_total{endpoint,operation,status}
+            <namespace>_retries_total{endpoint,operation}
+            <namespace>_failovers_total{endpoint,url}
+            <namespace>_transaction_seconds{endpoint,operation,phase}
+
+        phase is one of render, connect, ttfb and total. Requires
+        prometheus_client.
+        """
+        try:
+            import prometheus_client
+        except ImportError:
+            raise ImportError(
+                'PrometheusObserver requires prometheus_client, install it '
+                'with `pip install orbital_gateway[prometheus]`'
+            )
+        if registry is None:
+            registry = prometheus_client.REGISTRY
+        histogram_kwargs = {'registry': registry}
+        if buckets is not None:
+            histogram_kwargs['buckets'] = buckets
+        self.transactions = prometheus_client.Counter(
+            '%s_transactions_total' % namespace,
+            'Orbital transactions by ProcStatus',
+            ['endpoint', 'operation', 'status'], registry=registry,
+        )
+        self.retries = prometheus_client.Counter(
+            '%s_retries_total' % namespace,
+            'Orbital request attempts after the first one',
+            ['endpoint', 'operation'], registry=registry,
+        )
+        self.failovers = prometheus_client.Counter(
+            '%s_failovers_total' % namespace,
+            'Orbital transactions answered by a fallback url',
+            ['endpoint', 'url'], registry=registry,
+        )
+        self.seconds = prometheus_client.Histogram(
+            '%s_transaction_seconds' % namespace,
+            'Time spent per phase of an Orbital transaction',
+            ['endpoint', 'operation', 'phase'], **histogram_kwargs
+        )
+
+    def __call__(self, timing):
+        endpoint, operation = timing.endpoint, timing.operation or ''
+        self.transactions.labels(endpoint, operation, timing.status).inc()
+        if timing.retries:
+            self.retries.labels(endpoint, operation).inc(timing.retries)
+        if timing.failover:
+            self.failovers.labels(endpoint, timing.url or '').inc()
+        for phase in ('render', 'connect', 'ttfb', 'total'):
+            value = getattr(timing, phase)
+            if value is not None:
+                self.seconds.labels(endpoint, operation, phase).observe(value)
@@ -0,0 +1,409 @@
+"""
+Write-ahead journal of transactions sent to Orbital.
+
+    journal = Journal('/var/lib/shop/orbital-journal.db')
+    order = Order(journal=journal, **order_kwargs)
+    order.authorize()
+
+Every transaction is written to a local SQLite database, and synced to
+disk, before its first attempt goes out, and its outcome is recorded once
+Orbital answered. A transaction still pending after a crash may or may not
+have been processed; recover() settles it on restart by replaying it under
+its original retry trace number, so Orbital returns the original answer
+instead of charging twice, and optionally reverses it.
+
+Card, bank account and CVV numbers and the connection password are masked
+before they are written, the journal never holds them in the clear.
+
+Writes go through a single writer thread that commits everything queued
+since its last commit in one transaction (group commit), so concurrent
+requests share an fsync instead of paying for one each. When a group
+fails, its writes are committed one by one and only the failing ones
+report an error.
+"""
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+from concurrent.futures import Future
+from six.moves import queue
+
+from . import config
+from .cache import mask_number
+from .orbital_gateway import MarkForCapture, Order, Profile, Reversal
+from .results import ResponseParseError, decode
+from .retry import RetryTraceError
+
+PENDING = 'pending'
+COMPLETED = 'completed'
+FAILED = 'failed'
+REVERSED = 'reversed'
+UNRESOLVED = 'unresolved'
+
+# request field -> (leading, trailing) characters kept in the clear
+MASKED_FIELDS = {
+    'AccountNum': (6, 4),
+    'CCAccountNum': (6, 4),
+    'CheckDDA': (0, 4),
+    'ECPAccountDDA': (0, 4),
+    'CardSecVal': (0, 0),
+    'OrbitalConnectionPassword': (0, 0),
+}
+
+_MASKED = re.compile(
+    r'<(%s)>([^<]*)</' % '|'.join(sorted(MASKED_FIELDS))
+)
+
+# endpoint kwargs a reversal shares with the transaction it reverses
+_CONNECTION_KWARGS = (
+    'merchant_id', 'username', 'password', 'url', 'url2', 'platform',
+    'transport', 'health', 'deadline',
+)
+
+_ENDPOINTS = dict(
+    (cls.__name__, cls) for cls in (MarkForCapture, Order, Profile, Reversal)
+)
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS transactions (
+    id TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    endpoint TEXT NOT NULL,
+    operation TEXT,
+    message_type TEXT,
+    merchant_id TEXT,
+    trace_number TEXT NOT NULL,
+    order_id TEXT,
+    amount TEXT,
+    customer_ref_num TEXT,
+    tx_ref_num TEXT,
+    request TEXT,
+    proc_status TEXT,
+    approval_status TEXT,
+    response_tx_ref_num TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS transactions_state ON transactions (state);
+'''
+
+_COLUMNS = (
+    'id', 'state', 'created', 'updated', 'endpoint', 'operation',
+    'message_type', 'merchant_id', 'trace_number', 'order_id', 'amount',
+    'customer_ref_num', 'tx_ref_num', 'request', 'proc_status',
+    'approval_status', 'response_tx_ref_num', 'error',
+)
+
+
+def _mask_field(match):
+    name, value = match.group(1), match.group(2)
+    keep_first, keep_last = MASKED_FIELDS[name]
+    if not keep_first and not keep_last:
+        value = 'X' * len(value)
+    else:
+        value = mask_number(value, keep_first, keep_last)
+    return '<%s>%s</' % (name, value)
+
+
+def mask_request(xml):
+    """
+    Request XML with account numbers, CVV and password masked.
+    """
+    if isinstance(xml, bytes):
+        xml = xml.decode('utf-8')
+    return _MASKED.sub(_mask_field, xml)
+
+
+class JournalEntry(object):
+    def __init__(self, journal, transaction, xml):
+        """
+        Journal record of one logical transaction, written on the first
+        prepare().
+        """
+        endpoint = transaction.endpoint
+        self.journal = journal
+        self.transaction = transaction
+        self.id = uuid.uuid4().hex
+        self.trace_number = None
+        amount = getattr(endpoint, 'amount', None)
+        self.values = {
+            'id': self.id,
+            'endpoint': type(endpoint).__name__,
+            'operation': endpoint._operation,
+            'message_type': getattr(endpoint, 'message_type', None),
+            'merchant_id': str(endpoint.merchant_id),
+            'order_id': getattr(endpoint, 'order_id', None),
+            # a money.Money as text, it is parsed back on recovery
+            'amount': str(amount) if amount is not None else None,
+            'customer_ref_num': (
+                getattr(endpoint, 'customer_ref_num', None) or
+                getattr(endpoint, 'customer_num', None)
+            ),
+            'tx_ref_num': getattr(endpoint, 'tx_ref_num', None),
+            'request': mask_request(xml),
+        }
+
+    def prepare(self):
+        """
+        Make the current trace number durable before it is sent. Returns
+        a Future done once it is on disk.
+        """
+        trace_number = self.transaction.trace_number
+        if trace_number == self.trace_number:
+            return self.journal._done
+        first = self.trace_number is None
+        self.trace_number = trace_number
+        if first:
+            values = dict(
+                self.values, state=PENDING, trace_number=trace_number
+            )
+            return self.journal._insert(values)
+        return self.journal._update(self.id, trace_number=trace_number)
+
+    def complete(self, text):
+        try:
+            result = decode(text)
+        except ResponseParseError:
+            result = {}
+        return self.journal._update(
+            self.id, state=COMPLETED,
+            proc_status=result.get('ProcStatus') or
+            result.get('ProfileProcStatus'),
+            approval_status=result.get('ApprovalStatus'),
+            response_tx_ref_num=result.get('TxRefNum'),
+        )
+
+    def fail(self):
+        """
+        Nothing was answered. The transaction stays pending for recovery
+        when a request may have reached Orbital.
+        """
+        if self.trace_number is None:
+            return self.journal._done
+        error = self.transaction.error
+        return self.journal._update(
+            self.id,
+            state=PENDING if self.transaction.sent else FAILED,
+            error=repr(error) if error is not None else None,
+        )
+
+
+class Journal(object):
+    def __init__(self, path, max_batch=512):
+        """
+        path       SQLite database, created when missing
+        max_batch  most writes committed together
+        """
+        self.path = path
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._done = Future()
+        self._done.set_result(None)
+        self._closed = False
+        connection = self._connect()
+        connection.executescript(_SCHEMA)
+        connection.commit()
+        self._writer = threading.Thread(
+            target=self._write_loop, args=(connection,),
+            name='orbital-journal',
+        )
+        self._writer.daemon = True
+        self._writer.start()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=FULL')
+        return connection
+
+    def begin(self, transaction, xml):
+        return JournalEntry(self, transaction, xml)
+
+    def _submit(self, sql, params):
+        if self._closed:
+            raise ValueError('journal %s is closed' % self.path)
+        future = Future()
+        self._queue.put((sql, params, future))
+        return future
+
+    def _insert(self, values):
+        now = time.time()
+        values = dict(values, created=now, updated=now)
+        return self._submit(
+            'INSERT INTO transactions (%s) VALUES (%s)' % (
+                ', '.join(values), ', '.join('?' * len(values))
+            ),
+            list(values.values()),
+        )
+
+    def _update(self, entry_id, **values):
+        values['updated'] = time.time()
+        return self._submit(
+            'UPDATE transactions SET %s WHERE id = ?' % ', '.join(
+                '%s = ?' % name for name in values
+            ),
+            list(values.values()) + [entry_id],
+        )
+
+    def _write_loop(self, connection):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+            self._commit(connection, batch)
+        connection.close()
+
+    def _commit(self, connection, batch):
+        try:
+            with connection:
+                for sql, params, future in batch:
+                    connection.execute(sql, params)
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][2].set_exception(e)
+                return
+            # one bad write must not fail the others, find it alone
+            for item in batch:
+                self._commit(connection, [item])
+        else:
+            for sql, params, future in batch:
+                future.set_result(None)
+
+    def resolve(self, entry_id, state, result=None, error=None):
+        """
+        Record how recovery settled a pending entry.
+        """
+        values = {'state': state}
+        if result is not None:
+            values.update(
+                proc_status=result.get('ProcStatus'),
+                approval_status=result.get('ApprovalStatus'),
+                response_tx_ref_num=result.get('TxRefNum'),
+            )
+        if error is not None:
+            values['error'] = repr(error)
+        return self._update(entry_id, **values)
+
+    def entries(self, state=None):
+        """
+        Journal entries as dicts, oldest first.
+        """
+        connection = sqlite3.connect(self.path)
+        try:
+            sql = 'SELECT %s FROM transactions' % ', '.join(_COLUMNS)
+            params = ()
+            if state is not None:
+                sql += ' WHERE state = ?'
+                params = (state,)
+            rows = connection.execute(sql + ' ORDER BY created', params)
+            return [dict(zip(_COLUMNS, row)) for row in rows]
+        finally:
+            connection.close()
+
+    def pending(self):
+        return self.entries(PENDING)
+
+    def flush(self):
+        """
+        Wait until everything written so far is on disk.
+        """
+        self._submit('SELECT 1', ()).result()
+
+    def close(self):
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def recover(journal, rebuild, reverse=False):
+    """
+    Settle the transactions left pending by a crash.
+
+    `rebuild(entry)` returns the constructor kwargs of the original
+    endpoint for a pending entry, card data and credentials included since
+    the journal only holds them masked, or None to leave the entry alone.
+    The request is sent again under the entry's trace number: Orbital
+    answers with the original response when it processed it, or processes
+    it now. With `reverse`, an approved order or capture is then reversed
+    instead of kept.
+
+    Yields (entry, state, result) for every entry it settled.
+    """
+    for entry in journal.pending():
+        kwargs = rebuild(entry)
+        if kwargs is None:
+            continue
+        name = entry['endpoint']
+        for prefix in ('Async', 'Context'):
+            if name.startswith(prefix):
+                name = name[len(prefix):]
+        kwargs = dict(kwargs, trace_number=entry['trace_number'], journal=None)
+        endpoint = _ENDPOINTS[name](**kwargs)
+        if entry['message_type']:
+            endpoint.message_type = entry['message_type']
+        render = getattr(endpoint, 'render_%s' % entry['operation'])
+        try:
+            body = render()
+        except ValueError as e:
+            # fails validation now, e.g. the card expired since the crash
+            journal.resolve(entry['id'], UNRESOLVED, error=e)
+            yield entry, UNRESOLVED, None
+            continue
+        try:
+            result = endpoint.decode_result(endpoint.make_request(body))
+        except RetryTraceError as e:
+            journal.resolve(entry['id'], UNRESOLVED, error=e)
+            yield entry, UNRESOLVED, None
+            continue
+        except (IOError, ResponseParseError):
+            # still unreachable, try again on the next recovery
+            continue
+        state, error = COMPLETED, None
+        if reverse and result.approved and result.tx_ref_num and \
+                isinstance(endpoint, (Order, MarkForCapture)):
+            try:
+                if _reverse(endpoint, result, kwargs):
+                    state = REVERSED
+            except (IOError, ResponseParseError) as e:
+                error = e
+        journal.resolve(entry['id'], state, result=result, error=error)
+        yield entry, state, result
+    journal.flush()
+
+
+def _reverse(endpoint, result, kwargs):
+    reversal = Reversal(
+        tx_ref_num=result.tx_ref_num, order_id=result.order_id or
+        endpoint.order_id, **dict(
+            (name, kwargs[name]) for name in _CONNECTION_KWARGS
+            if name in kwargs
+        )
+    )
+    online = (
+        isinstance(endpoint, Order) and endpoint.reversal and
+        endpoint.message_type == config.AUTHORIZE
+    )
+    xml = reversal.render_reversal() if online else reversal.render_void()
+    return decode(reversal.make_request(xml)).approved
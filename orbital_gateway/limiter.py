@@ -0,0 +1,249 @@
+"""
+Adaptive concurrency limit for requests to Orbital.
+
+    limit = AdaptiveLimit(initial=10, max_limit=100)
+    transport = AdaptiveTransport(HTTPTransport(pool_size=100), limit)
+    order = Order(transport=transport, **order_kwargs)
+
+Requests beyond the current limit wait for a slot. The limit follows AIMD:
+every request answered in time grows it by about one per limit's worth of
+requests while it is in use, and congestion shrinks it by `backoff`, at
+most once per round trip. Congestion is a timeout, a connection error, an
+HTTP 429 or 5xx, a ProcStatus listed in `drop_statuses`, or a latency
+above `tolerance` times the best one of the last `window` requests. The
+best latency is learned while the gateway keeps up, so start `initial`
+below its capacity and let the limit grow.
+
+aio.AsyncAdaptiveTransport does the same for asyncio. `limit.limit`,
+`limit.in_flight` and `limit.queued` are the current state, see
+LimiterMetrics for exporting them to Prometheus.
+"""
+import collections
+import re
+import threading
+import time
+
+import requests
+
+OK = 'ok'
+DROPPED = 'dropped'
+IGNORED = 'ignored'
+
+_PROC_STATUS = re.compile(r'<(?:Profile)?ProcStatus>([^<]*)</')
+
+
+class AdaptiveLimit(object):
+    def __init__(self, initial=10, min_limit=1, max_limit=200, backoff=0.9,
+                 tolerance=2.0, window=100, drop_statuses=(),
+                 clock=time.time):
+        """
+        initial        starting limit
+        min_limit      bounds of the limit
+        max_limit
+        backoff        factor the limit is multiplied with on congestion
+        tolerance      latency above this many times the best recent one
+                       is congestion
+        window         requests the best latency is taken over
+        drop_statuses  ProcStatus values meaning the gateway is throttling
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.drop_statuses = frozenset(drop_statuses)
+        self._clock = clock
+        self._limit = float(min(max(initial, min_limit), max_limit))
+        self._latencies = collections.deque(maxlen=window)
+        self._last_drop = None
+        self.in_flight = 0
+        self.queued = 0
+        self.drops = 0
+        self.requests = 0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    @property
+    def best_latency(self):
+        with self._condition:
+            return min(self._latencies) if self._latencies else None
+
+    def try_acquire(self):
+        """
+        Take a slot when one is free. Returns the start time to hand back
+        to release(), None when the limit is reached.
+        """
+        with self._condition:
+            if self.in_flight >= self.limit:
+                return None
+            self.in_flight += 1
+            return self._clock()
+
+    def acquire(self):
+        """
+        Take a slot, waiting for one as long as needed.
+        """
+        with self._condition:
+            if self.in_flight >= self.limit:
+                self.queued += 1
+                try:
+                    while self.in_flight >= self.limit:
+                        self._condition.wait()
+                finally:
+                    self.queued -= 1
+            self.in_flight += 1
+            return self._clock()
+
+    def enqueue(self, count=1):
+        """
+        Count callers waiting outside of acquire(), e.g. asyncio tasks.
+        """
+        with self._condition:
+            self.queued += count
+
+    def release(self, start, outcome=OK):
+        """
+        Give back the slot taken at `start` and adjust the limit by the
+        request's outcome: OK, DROPPED, or IGNORED for failures that say
+        nothing about the gateway's load.
+        """
+        with self._condition:
+            now = self._clock()
+            busy = self.in_flight + self.queued >= self.limit
+            self.in_flight -= 1
+            if outcome != IGNORED:
+                self.requests += 1
+                self._adjust(start, now - start, outcome == DROPPED, busy)
+            self._condition.notify_all()
+
+    def _adjust(self, start, latency, dropped, busy):
+        if not dropped:
+            best = min(self._latencies) if self._latencies else latency
+            self._latencies.append(latency)
+            dropped = latency > best * self.tolerance
+        if dropped:
+            self.drops += 1
+            # requests sent before the last decrease saw the old limit
+            if self._last_drop is None or start >= self._last_drop:
+                self._limit = max(self.min_limit, self._limit * self.backoff)
+                self._last_drop = self._clock()
+        elif busy:
+            self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+
+    def outcome(self, response=None, error=None):
+        """
+        OK, DROPPED or IGNORED for a transport response or error.
+        """
+        if error is not None:
+            if isinstance(error, (requests.exceptions.Timeout,
+                                  requests.exceptions.ConnectionError)):
+                return DROPPED
+            return IGNORED
+        if response.status_code == 429 or response.status_code >= 500:
+            return DROPPED
+        if self.drop_statuses:
+            match = _PROC_STATUS.search(response.text or '')
+            if match is not None and match.group(1) in self.drop_statuses:
+                return DROPPED
+        return OK
+
+    def snapshot(self):
+        with self._condition:
+            return {
+                'limit': self.limit,
+                'in_flight': self.in_flight,
+                'queued': self.queued,
+                'requests': self.requests,
+                'drops': self.drops,
+            }
+
+    def __repr__(self):
+        return '<AdaptiveLimit limit=%d in_flight=%d queued=%d>' % (
+            self.limit, self.in_flight, self.queued
+        )
+
+
+class AdaptiveTransport(object):
+    def __init__(self, transport, limit=None):
+        """
+        Transport wrapper holding the requests in flight to an
+        AdaptiveLimit, a new default one when `limit` is None.
+        """
+        self.transport = transport
+        self.limit = limit if limit is not None else AdaptiveLimit()
+
+    def post(self, url, data, headers, timeout=None):
+        start = self.limit.acquire()
+        outcome = IGNORED
+        try:
+            response = self.transport.post(url, data, headers, timeout)
+            outcome = self.limit.outcome(response)
+            return response
+        except Exception as e:
+            outcome = self.limit.outcome(error=e)
+            raise
+        finally:
+            self.limit.release(start, outcome)
+
+    def warm_up(self, *urls):
+        return self.transport.warm_up(*urls)
+
+    def close(self):
+        self.transport.close()
+
+
+class LimiterMetrics(object):
+    def __init__(self, limits, registry=None, namespace='orbital'):
+        """
+        Export AdaptiveLimits as prometheus_client metrics:
+
+            <namespace>_concurrency_limit{limiter}
+            <namespace>_concurrency_in_flight{limiter}
+            <namespace>_concurrency_queued{limiter}
+            <namespace>_concurrency_drops_total{limiter}
+
+        `limits` maps limiter names, e.g. merchant ids, to AdaptiveLimits.
+        Requires prometheus_client.
+        """
+        try:
+            import prometheus_client
+        except ImportError:
+            raise ImportError(
+                'LimiterMetrics requires prometheus_client, install it '
+                'with `pip install orbital_gateway[prometheus]`'
+            )
+        self.limits = limits
+        self.namespace = namespace
+        if registry is None:
+            registry = prometheus_client.REGISTRY
+        registry.register(self)
+
+    def collect(self):
+        from prometheus_client.core import (
+            CounterMetricFamily, GaugeMetricFamily,
+        )
+        families = dict(
+            (name, GaugeMetricFamily(
+                '%s_concurrency_%s' % (self.namespace, name), help_text,
+                labels=['limiter'],
+            ))
+            for name, help_text in (
+                ('limit', 'Current adaptive concurrency limit'),
+                ('in_flight', 'Orbital requests in flight'),
+                ('queued', 'Orbital requests waiting for a slot'),
+            )
+        )
+        drops = CounterMetricFamily(
+            '%s_concurrency_drops' % self.namespace,
+            'Requests counted as congestion', labels=['limiter'],
+        )
+        for name, limit in sorted(self.limits.items()):
+            snapshot = limit.snapshot()
+            for key, family in families.items():
+                family.add_metric([name], snapshot[key])
+            drops.add_metric([name], snapshot['drops'])
+        for key in ('limit', 'in_flight', 'queued'):
+            yield families[key]
+        yield drops
@@ -0,0 +1,200 @@
+"""
+Exact amounts, held as an integer count of the currency's minor units.
+
+    amount = Money.parse('1,000.50')
+    amount.minor        # 100050
+    amount.orbital      # '100050', the Orbital Amount field
+    str(amount)         # '1000.50'
+
+Strings, ints (whole units), floats, Decimals and Money are accepted. An
+amount is checked once, when it is parsed: it must not be negative and
+must be exact to the minor unit, so '45.255' is rejected rather than
+rounded. Endpoints take a Money wherever they take an amount, nothing is
+parsed again.
+
+parse_amounts() converts the amounts of a batch, parsing every distinct
+string once.
+"""
+import functools
+import re
+import sys
+
+import six
+
+from . import config
+
+_AMOUNT = re.compile(
+    r'\s*([0-9]{1,3}(?:,[0-9]{3})+|[0-9]*)(?:\.([0-9]*))?\s*\Z'
+)
+
+
+class InvalidAmount(ValueError):
+    pass
+
+
+def _minor_units(text, exponent):
+    match = _AMOUNT.match(text)
+    if match is None or not any(match.groups()):
+        raise InvalidAmount('%r is not an amount' % (text,))
+    whole, fraction = match.groups()
+    fraction = fraction or ''
+    if len(fraction) > exponent:
+        if fraction[exponent:].strip('0'):
+            raise InvalidAmount('%r has more than %d decimal places' % (
+                text, exponent
+            ))
+        fraction = fraction[:exponent]
+    return (
+        int(whole.replace(',', '') or 0) * 10 ** exponent
+        + int(fraction.ljust(exponent, '0') or 0)
+    )
+
+
+def _decimal_minor_units(value, exponent):
+    if not value.is_finite():
+        raise InvalidAmount('%s is not an amount' % value)
+    if value < 0:
+        raise InvalidAmount('%s is negative' % value)
+    scaled = value.scaleb(exponent)
+    if scaled != scaled.to_integral_value():
+        raise InvalidAmount('%s has more than %d decimal places' % (
+            value, exponent
+        ))
+    return int(scaled)
+
+
+@functools.total_ordering
+class Money(object):
+    __slots__ = ('minor', 'exponent')
+
+    def __init__(self, minor, exponent=config.CURRENCY_EXPONENT):
+        """
+        `minor` units of a currency with `exponent` decimal places,
+        Money(4525) is 45.25.
+        """
+        if isinstance(minor, bool) or \
+                not isinstance(minor, six.integer_types):
+            raise TypeError('minor units must be an int, not %r' % (minor,))
+        if minor < 0:
+            raise InvalidAmount('%d minor units is negative' % minor)
+        self.minor = minor
+        self.exponent = exponent
+
+    @classmethod
+    def parse(cls, value, exponent=config.CURRENCY_EXPONENT):
+        """
+        Money of a string like '45.25', '1,000' or ' 5', an int number of
+        whole units, a float, a Decimal or a Money. Raises InvalidAmount
+        for negative amounts and amounts with too many decimal places,
+        TypeError for anything else.
+
+        A float is read from its repr(), the shortest text reading back as
+        the same float, and is never rounded: 45.25 is 45.25, but 0.1 + 0.2
+        is 0.30000000000000004 and raises InvalidAmount, as do floats
+        written with an exponent like 1e+16.
+        """
+        if isinstance(value, Money):
+            if value.exponent != exponent:
+                raise InvalidAmount('%r has %d decimal places, not %d' % (
+                    value, value.exponent, exponent
+                ))
+            return value
+        if isinstance(value, six.string_types):
+            return cls(_minor_units(value, exponent), exponent)
+        if isinstance(value, six.integer_types) and \
+                not isinstance(value, bool):
+            if value < 0:
+                raise InvalidAmount('%d is negative' % value)
+            return cls(value * 10 ** exponent, exponent)
+        if isinstance(value, float):
+            # repr is the shortest text reading back as the same float
+            return cls(_minor_units(repr(value), exponent), exponent)
+        # a Decimal can only exist once decimal was imported
+        decimal = sys.modules.get('decimal')
+        if decimal is not None and isinstance(value, decimal.Decimal):
+            return cls(_decimal_minor_units(value, exponent), exponent)
+        raise TypeError('%r is not an amount' % (value,))
+
+    @property
+    def orbital(self):
+        """
+        The amount with its decimal point implied, as Orbital takes it:
+        45.25 -> '4525', 54 -> '5400', 0.01 -> '001'. Whole units are
+        never dropped, the way amounts have always been sent.
+        """
+        return str(self.minor).rjust(self.exponent + 1, '0')
+
+    def to_decimal(self):
+        import decimal
+        return decimal.Decimal(self.minor).scaleb(-self.exponent)
+
+    def _check(self, other):
+        if not isinstance(other, Money):
+            return False
+        if other.exponent != self.exponent:
+            raise InvalidAmount('cannot mix %d and %d decimal places' % (
+                self.exponent, other.exponent
+            ))
+        return True
+
+    def __add__(self, other):
+        if not self._check(other):
+            return NotImplemented
+        return Money(self.minor + other.minor, self.exponent)
+
+    def __sub__(self, other):
+        if not self._check(other):
+            return NotImplemented
+        return Money(self.minor - other.minor, self.exponent)
+
+    def __eq__(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        return (self.minor, self.exponent) == (other.minor, other.exponent)
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __lt__(self, other):
+        if not self._check(other):
+            return NotImplemented
+        return self.minor < other.minor
+
+    def __hash__(self):
+        return hash((self.minor, self.exponent))
+
+    def __str__(self):
+        if not self.exponent:
+            return str(self.minor)
+        text = self.orbital
+        return '%s.%s' % (text[:-self.exponent], text[-self.exponent:])
+
+    def __repr__(self):
+        return 'Money(%s)' % self
+
+
+def parse_amount(value, exponent=config.CURRENCY_EXPONENT, memo=None):
+    """
+    Money.parse(value), None for None and ''. Strings are looked up in and
+    added to `memo`, a dict for amounts of the same exponent, before they
+    are parsed.
+    """
+    if value is None or value == '':
+        return None
+    if memo is None or not isinstance(value, six.string_types):
+        return Money.parse(value, exponent)
+    amount = memo.get(value)
+    if amount is None:
+        amount = memo[value] = Money.parse(value, exponent)
+    return amount
+
+
+def parse_amounts(values, exponent=config.CURRENCY_EXPONENT, memo=None):
+    """
+    parse_amount() of every one of `values`. A batch repeats a handful of
+    amounts many times over, each distinct one is parsed once.
+    """
+    if memo is None:
+        memo = {}
+    return [parse_amount(value, exponent, memo) for value in values]
@@ -1,56 +1,70 @@
 import os
-import requests
-import six
-import unicodedata
-from uuid import uuid4
-import xml.etree.ElementTree as ET
-
-from . import config
+import time
 
+import six
 
-def remove_control_characters(s):
-    """
-    Remove unicode characters that will endanger xml parsing on Chase's end
-    """
-    u = six.text_type(s)
-    return "".join(ch for ch in u if unicodedata.category(ch)[0] != "C")
+from . import cards, config, validation
+from .health import get_default_health
+from .instrumentation import rendering
+from .money import InvalidAmount, parse_amount
+from .results import decode
+from .sanitize import (
+    ORDER_FIELDS, PROFILE_FIELDS, remove_control_characters,
+    sanitize_address_field, sanitize_fields, sanitize_phone_field,
+)
+from .singleflight import profile_reads
+from .retry import Transaction, trace_numbers
+from .xml_templates import load_template
 
 
-def sanitize_address_field(s):
-    """
-    Address fields hould not include any of the following characters:
-    % | ^ \ /
-    """
-    chars = ["%", "|", "^", "\\", "/"]
-    return "".join(ch for ch in s if ch not in chars)
+def get_default_transport():
+    # requests is only imported once a request is sent
+    from .transport import get_default_transport
+    return get_default_transport()
 
 
-def sanitize_phone_field(s):
-    """
-        Phone Number Format
-        AAAEEENNNNXXXX, where
-        AAA = Area Code
-        EEE = Exchange
-        NNNN = Number
-        XXXX = Extension
-    """
-    chars = ["(", ")", "-", "."]
-    return "".join(ch for ch in s if ch not in chars)
+def _is_transport_error(error):
+    import requests
+    return isinstance(error, requests.exceptions.RequestException)
 
 
 class Endpoint(object):
+    max_attempts = 3
+    deadline = None
+    observers = ()
+    journal = None
+    validator = validation.default_validator
+
     def __init__(self, **kwargs):
         """
         Endpoint takes the following constructor params:
             merchant_id
             username
             password
-            trace_number
+            trace_number  retry trace of the first transaction, generated
+                          when omitted; later transactions get fresh ones
+            deadline      max seconds spent on one transaction, retries
+                          included
+            transport     shared HTTPTransport, defaults to the process
+                          wide one
+            health        shared EndpointHealth, defaults to the process
+                          wide one
+            observers     callables receiving an instrumentation.Timing
+                          per transaction, on top of the global ones
+            journal       journal.Journal recording every transaction
+                          before it is sent
+            validator     validation.Validator checking requests before
+                          they are sent, validation.default_validator by
+                          default, None to skip the checks
         """
         self.merchant_id = os.getenv('ORBITAL_MERCHANT_ID') or kwargs.get('merchant_id', '')
         self.username = os.getenv('ORBITAL_USERNAME') or kwargs.get('username', '')
         self.password = os.getenv('ORBITAL_PASSWORD') or kwargs.get('password', '')
-        self.trace_number = kwargs.get('trace_number', str(uuid4().node))
+        self.trace_number = kwargs.get('trace_number') or trace_numbers.next()
+        self._trace_number_used = False
+        # a supplied trace number may belong to an earlier, unfinished send
+        self.replaying = bool(kwargs.get('trace_number'))
+        self.deadline = kwargs.get('deadline', self.deadline)
         self.url = kwargs.get('url') or os.getenv('ENDPOINT_URL_1')
         self.url2 = kwargs.get('url2') or os.getenv('ENDPOINT_URL_2')
         self.dtd_version = 'application/%s' % config.CURRENT_DTD_VERSION
@@ -68,6 +82,42 @@ class Endpoint(object):
         # Salem - BIN 000001
         # PNS - BIN 000002
         self.platform = kwargs.pop('platform', 'salem')
+        self._transport = kwargs.get('transport')
+        self._health = kwargs.get('health')
+        self.observers = kwargs.get('observers') or self.observers
+        self.journal = kwargs.get('journal', self.journal)
+        self.validator = kwargs.get('validator', self.validator)
+        self._operation = None
+        self._render_time = None
+        self._card = None
+
+    @property
+    def transport(self):
+        return self._transport or get_default_transport()
+
+    @property
+    def health(self):
+        return self._health or get_default_health()
+
+    @property
+    def urls(self):
+        return [url for url in (self.url, self.url2) if url]
+
+    def next_trace_number(self):
+        """
+        Trace number for a new logical transaction.
+        """
+        if self._trace_number_used:
+            self.trace_number = trace_numbers.next()
+            self.replaying = False
+        self._trace_number_used = True
+        return self.trace_number
+
+    def warm_up(self):
+        """
+        Pre-open pooled connections to both gateway urls.
+        """
+        return self.transport.warm_up(self.url, self.url2)
 
     def get_platform_bin(self):
         try:
@@ -78,34 +128,51 @@ class Endpoint(object):
                            'you can choose `Salem` (Stratus) or `PNS`')
 
     def make_request(self, xml):
-        for i in range(3):
+        """
+        Post `xml` to the healthiest gateway url, failing over to the other
+        one with backoff. Retries replay the transaction's trace number so
+        Orbital never processes it twice. Raises the last transport error
+        when every attempt failed.
+        """
+        transaction = Transaction(self, xml)
+        for delay, url, timeout in transaction.attempts():
+            if delay:
+                time.sleep(delay)
+            if transaction.entry is not None:
+                transaction.entry.prepare().result()
+            start = time.time()
             try:
-                result = requests.post(self.url, data=xml, headers=self.headers)
+                result = self.transport.post(
+                    url, xml, transaction.headers, timeout
+                )
                 result.raise_for_status()
-            except requests.exceptions.RequestException:
-                result = requests.post(self.url2, data=xml, headers=self.headers)
-            if result and result.text:
-                return result.text
-
-        return "Could not communicate with Chase"
+            except Exception as e:
+                if not _is_transport_error(e):
+                    raise
+                transaction.failed(url, e)
+                continue
+            text = transaction.completed(
+                url, result.text, time.time() - start, result
+            )
+            if text is not None:
+                return text
+
+        return transaction.exhausted()
 
     def convert_amount(self, amount):
         """
-        Remove decimal, pad zeros for ints.
+        Orbital text of `amount`, a money.Money or anything Money.parse()
+        takes, with the decimal point implied:
         45.25 -> 4525
         54 -> 5400
+        An amount that does not parse, e.g. 45.255, is returned as text
+        for the validator to reject.
         """
-        if not amount:
-            return
-        a = amount.split(".")
-        if len(a) > 1:
-            dec = a[1]
-            if len(dec) == 1:
-                dec = dec + "0"
-            amount = a[0] + dec
-        else:
-            amount = amount + "00"
-        return amount
+        try:
+            amount = parse_amount(amount)
+        except (InvalidAmount, TypeError):
+            return six.text_type(amount)
+        return amount.orbital if amount is not None else None
 
     @property
     def reversal(self):
@@ -114,54 +181,65 @@ class Endpoint(object):
         )
 
     @property
-    def card_type(self):
+    def card_info(self):
+        """
+        cards.CardInfo of cc_num, None for an unknown brand. Looked up once
+        per card number.
+        """
         cc_num = self.cc_num
-        card = None
-        try:
-            if cc_num[0] == "4":
-                card = config.CARD_TYPE_VISA
-            elif cc_num[0] == "5":
-                card = config.CARD_TYPE_MC
-            elif cc_num[:4] == "6011" or cc_num[:2] == "65":
-                card = config.CARD_TYPE_DISCOVER
-            elif cc_num[:2] in ("34", "37"):
-                card = config.CARD_TYPE_AMEX
-            elif cc_num[:4] in ("2131", "1800") or cc_num[:2] == "35":
-                card = config.CARD_TYPE_JCB
-        except IndexError:
-            card = None
-        return card
+        card = self._card
+        if card is None or card[0] != cc_num:
+            card = self._card = (cc_num, cards.lookup(cc_num))
+        return card[1]
+
+    @property
+    def card_type(self):
+        info = self.card_info
+        return info.brand if info is not None else None
+
+    def validate(self, schema, values):
+        """
+        Raise validation.ValidationError when `values` do not fit `schema`.
+        """
+        if self.validator is not None:
+            self.validator.validate(schema, values)
 
     def parse_xml(self, xml_file_name, values, default_value=None):
-        xml_file = os.path.join(
-            os.path.dirname(__file__), 'templates', xml_file_name
-        )
-        tree = ET.parse(xml_file)
-        root = tree.getroot()
+        template = load_template(xml_file_name)
         values['OrbitalConnectionUsername'] = self.username
         values['OrbitalConnectionPassword'] = self.password
         values['BIN'] = self.get_platform_bin()
         values['CustomerBin'] = self.get_platform_bin()
-        for key, value in values.items():
-            elem = root.find(".//%s" % key)
-            if elem is not None:
-                elem.text = value or default_value
-                if elem.text is not None:
-                    elem.text = remove_control_characters(elem.text)
-        return ET.tostring(root)
+        return template.render(
+            values, default_value=default_value,
+            clean=remove_control_characters,
+        )
+
+    def decode_result(self, result):
+        """
+        Typed, immutable view of the response text.
+        """
+        return decode(result)
 
     def parse_result(self, result):
-        root = ET.fromstring(result)
-        resp_elem = root.getchildren()[0]
-        values = {}
-        for child_elem in resp_elem:
-            values[child_elem.tag] = child_elem.text
-        return values
+        return decode(result).to_dict()
 
 
 class Profile(Endpoint):
+    cache = None
+    coalesce = True
+
     def __init__(self, **kwargs):
+        """
+        Profile also takes
+            cache     cache.ProfileCache serving read() and invalidated by
+                      update() and destroy()
+            coalesce  concurrent reads of the same profile share one
+                      Orbital request, True by default
+        """
         super(Profile, self).__init__(**kwargs)
+        self.cache = kwargs.get('cache', self.cache)
+        self.coalesce = kwargs.get('coalesce', self.coalesce)
         self.name = kwargs.get('name')
         self.address1 = kwargs.get('address1')
         self.address2 = kwargs.get('address2')
@@ -199,27 +277,7 @@ class Profile(Endpoint):
             return config.ELECTRONIC_CHECK
 
     def sanitize(self):
-        if self.name is not None:
-            self.name = self.name[:30]
-        if self.address1 is not None:
-            address1 = sanitize_address_field(self.address1)
-            self.address1 = address1[:30]
-        if self.address2 is not None:
-            address2 = sanitize_address_field(self.address2)
-            self.address2 = address2[:30]
-        if self.city is not None:
-            city = sanitize_address_field(self.city)
-            self.city = city[:20]
-        if self.state is not None:
-            state = sanitize_address_field(self.state)
-            self.state = state[:2]
-        if self.zipCode is not None:
-            self.zipCode = self.zipCode[:5]
-        if self.email is not None:
-            self.email = self.email[:50]
-        if self.phone is not None:
-            phone = sanitize_phone_field(self.phone)
-            self.phone = phone[:14]
+        sanitize_fields(self, PROFILE_FIELDS)
 
     def parse_result(self, result):
         values = super(Profile, self).parse_result(result)
@@ -229,7 +287,8 @@ class Profile(Endpoint):
                 values[key] = values[key].title()
         return values
 
-    def create(self):
+    @rendering
+    def render_create(self):
         self.sanitize()
         values = {
             'CustomerMerchantID': self.merchant_id,
@@ -259,23 +318,84 @@ class Profile(Endpoint):
             values['ECPAccountRT'] = self.routing_number
             values['ECPBankPmtDlv'] = self.ecp_delivery_method
 
+        self.validate(validation.PROFILE, values)
         self.xml = self.parse_xml(
             "profile_CU.xml", values, default_value=""
         )
-        self.result = self.make_request(self.xml)
+        return self.xml
+
+    def create(self):
+        self.result = self.make_request(self.render_create())
+        self.invalidate()
         return self.parse_result(self.result)
 
-    def read(self):
+    @rendering
+    def render_read(self):
         values = {
             'CustomerMerchantID': self.merchant_id,
             'CustomerRefNum': self.customer_ref_num,
             'CustomerProfileAction': config.READ_CUSTOMER,
         }
         self.xml = self.parse_xml("profile_RD.xml", values)
-        result = self.make_request(self.xml)
-        return self.parse_result(result)
+        return self.xml
 
-    def update(self):
+    def cached(self):
+        """
+        Cached profile, None on a miss or without a cache.
+        """
+        if self.cache is None or not self.customer_ref_num:
+            return None
+        return self.cache.get(self.merchant_id, self.customer_ref_num)
+
+    def cache_generation(self):
+        if self.cache is None or not self.customer_ref_num:
+            return None
+        return self.cache.generation(self.merchant_id, self.customer_ref_num)
+
+    def store(self, values, generation=None):
+        """
+        Cache `values`, unless the profile was invalidated since
+        `generation`, a cache_generation() taken before the read was sent.
+        """
+        if self.cache is None or not self.customer_ref_num:
+            return values
+        return self.cache.set(
+            self.merchant_id, self.customer_ref_num, values, generation
+        )
+
+    def invalidate(self):
+        if self.cache is not None and self.customer_ref_num:
+            self.cache.invalidate(self.merchant_id, self.customer_ref_num)
+
+    def read_key(self):
+        """
+        Identifies reads that may share one request, None when this one
+        must not. Readers through different caches get differently masked
+        values and never share.
+        """
+        if not self.coalesce or self.replaying or not self.customer_ref_num:
+            return None
+        return (
+            tuple(self.urls), self.merchant_id, self.username,
+            self.password, self.customer_ref_num, self.cache,
+        )
+
+    def _read(self):
+        generation = self.cache_generation()
+        result = self.make_request(self.render_read())
+        return self.store(self.parse_result(result), generation)
+
+    def read(self):
+        values = self.cached()
+        if values is not None:
+            return values
+        key = self.read_key()
+        if key is None:
+            return self._read()
+        return dict(profile_reads.do(key, self._read))
+
+    @rendering
+    def render_update(self):
         self.sanitize()
         values = {
             'CustomerProfileAction': config.UPDATE_CUSTOMER,
@@ -295,82 +415,86 @@ class Profile(Endpoint):
             'CCExpireDate': self.cc_expiry,
             'CustomerAccountType': self.account_type,
         }
+        self.validate(validation.PROFILE, values)
         self.xml = self.parse_xml("profile_CU.xml", values)
-        result = self.make_request(self.xml)
+        return self.xml
+
+    def update(self):
+        self.invalidate()
+        try:
+            result = self.make_request(self.render_update())
+        finally:
+            self.invalidate()
         return self.parse_result(result)
 
-    def destroy(self):
+    @rendering
+    def render_destroy(self):
         values = {
             'CustomerProfileAction': config.DELETE_CUSTOMER,
             'CustomerMerchantID': self.merchant_id,
             'CustomerRefNum': self.customer_ref_num,
         }
         self.xml = self.parse_xml("profile_RD.xml", values)
-        result = self.make_request(self.xml)
+        return self.xml
+
+    def destroy(self):
+        self.invalidate()
+        try:
+            result = self.make_request(self.render_destroy())
+        finally:
+            self.invalidate()
         return self.parse_result(result)
 
 
+# Order attribute, the keyword argument setting it and its default
+ORDER_ATTRIBUTES = (
+    ('message_type', 'message_type', None),  # <MessageType>
+    ('cc_num', 'cc_num', ''),  # <AccountNum> null for echecks
+    ('customer_num', 'customer_num', None),  # <CustomerRefNum>
+    ('order_id', 'order_id', None),  # <OrderID>
+    ('amount', 'amount', None),  # <Amount>
+    ('zipCode', 'zip_code', None),  # <AVSzip>
+    ('address1', 'address1', None),  # <AVSaddress1>
+    ('address2', 'address2', None),  # <AVSaddress2>
+    ('city', 'city', None),  # <AVScity>
+    ('state', 'state', None),  # <AVSstate>
+    ('phone', 'phone', None),  # <AVSphoneNum>
+    ('prior_auth_id', 'prior_auth_id', None),  # <PriorAuthID>
+    ('tx_ref_num', 'tx_ref_num', None),  # <TxRefNum>
+    ('new_customer', 'new_customer', False),
+    # ECHECK FIELDS
+    ('customer_ref_num', 'customer_ref_num', None),
+    ('avs_name', 'name', None),  # <AVSname>
+    ('card_brand', 'card_type', ''),  # <CardBrand>
+    # <BCRtNum> Bank Routing and Transit Number for the Customer
+    ('routing_number', 'routing_number', None),
+    # <CheckDDA> Customer DDA Account Number
+    ('check_account_number', 'check_account_number', None),
+    # <BankAccountType> Deposit Account Type (Defaults to Consumer Checking)
+    ('bank_account_type', 'bank_account_type', config.CONSUMER_CHECKING),
+    # <BankPmtDelv> ECP Payment Delivery method
+    ('ecp_delivery_method', 'ecp_delivery_method',
+     config.BEST_POSSIBLE_METHOD),
+    # CREDIT CARD FIELDS
+    ('cc_expiry', 'cc_expiry', None),  # <Exp>
+    ('cvv_indicator', 'cvv_indicator', None),  # <CardSecValInd>
+    ('cvv', 'cvv', None),  # <CardSecVal>
+)
+
+
 class Order(Endpoint):
 
     def __init__(self, **kwargs):
         super(Order, self).__init__(**kwargs)
-        self.message_type = kwargs.get('message_type')  # <MessageType>
-        self.cc_num = kwargs.get('cc_num', '')  # <AccountNum> null for echecks
-        self.customer_num = kwargs.get('customer_num')  # <CustomerRefNum>
-        self.order_id = kwargs.get('order_id')  # <OrderID>
-        self.amount = kwargs.get('amount')  # <Amount>
-        self.zipCode = kwargs.get('zip_code')  # <AVSzip>
-        self.address1 = kwargs.get('address1')  # <AVSaddress1>
-        self.address2 = kwargs.get('address2')  # <AVSaddress2>
-        self.city = kwargs.get('city')  # <AVScity>
-        self.state = kwargs.get('state')  # <AVSstate>
-        self.phone = kwargs.get('phone')  # <AVSphoneNum>
-        self.prior_auth_id = kwargs.get('prior_auth_id')  # <PriorAuthID>
-        self.tx_ref_num = kwargs.get('tx_ref_num')  # <TxRefNum>
-        self.new_customer = kwargs.get('new_customer', False)
-        # ECHECK FIELDS
-        self.customer_ref_num = kwargs.get('customer_ref_num')
-        self.avs_name = kwargs.get('name')  # <AVSname>
-        self.card_brand = kwargs.get('card_type', '')  # <CardBrand>
-        # <BCRtNum> Bank Routing and Transit Number for the Customer
-        self.routing_number = kwargs.get('routing_number')
-        # <CheckDDA> Customer DDA Account Number
-        self.check_account_number = kwargs.get('check_account_number')
-        # <BankAccountType? > Deposit Account Type (Defaults to Consumer Checking)
-        self.bank_account_type = kwargs.get(
-            'bank_account_type', config.CONSUMER_CHECKING
-        )
-        # <BankPmtDelv > ECP Payment Delivery method
-        self.ecp_delivery_method = kwargs.get(
-            'ecp_delivery_method', config.BEST_POSSIBLE_METHOD
-        )
-        # CREDIT CARD FIELDS
-        self.cc_expiry = kwargs.get('cc_expiry')  # <Exp>
-        self.cvv_indicator = kwargs.get('cvv_indicator')  # <CardSecValInd>
-        self.cvv = kwargs.get('cvv')  # <CardSecVal>
+        for attribute, name, default in ORDER_ATTRIBUTES:
+            setattr(self, attribute, kwargs.get(name, default))
 
     @property
     def echeck(self):
         return self.card_brand == config.ELECTRONIC_CHECK
 
     def sanitize(self):
-        if self.address1 is not None:
-            address1 = sanitize_address_field(self.address1)
-            self.address1 = address1[:30]
-        if self.address2 is not None:
-            address2 = sanitize_address_field(self.address2)
-            self.address2 = address2[:30]
-        if self.city is not None:
-            city = sanitize_address_field(self.city)
-            self.city = city[:20]
-        if self.state is not None:
-            state = sanitize_address_field(self.state)
-            self.state = state[:2]
-        if self.zipCode is not None:
-            self.zipCode = self.zipCode[:5]
-        if self.phone is not None:
-            phone = sanitize_phone_field(self.phone)
-            self.phone = phone[:14]
+        sanitize_fields(self, ORDER_FIELDS)
 
     def card_sec_val_ind(self):
         """
@@ -395,7 +519,8 @@ class Order(Endpoint):
                 return "9"
         return None
 
-    def charge(self):
+    @rendering
+    def render_charge(self):
         self.sanitize()
         values = {
             'MerchantID': self.merchant_id,
@@ -433,12 +558,17 @@ class Order(Endpoint):
             values['CustomerProfileFromOrderInd'] = "A"
             values['CustomerProfileOrderOverrideInd'] = "NO"
 
-        # Validation, TBD
-        if self.message_type not in config.MESSAGE_TYPES:
-            pass
+        if self.echeck:
+            schema = validation.ORDER_ECHECK
+        elif values['MessageType'] in validation.WITHOUT_AUTHORIZATION:
+            schema = validation.ORDER_CARD_WITHOUT_AUTHORIZATION
+        else:
+            schema = validation.ORDER_CARD
+        self.validate(schema, values)
+        return self.parse_xml('order_new.xml', values)
 
-        xml = self.parse_xml('order_new.xml', values)
-        result = self.make_request(xml)
+    def charge(self):
+        result = self.make_request(self.render_charge())
         return self.parse_result(result)
 
     def authorize(self):
@@ -465,15 +595,19 @@ class MarkForCapture(Endpoint):
         self.amount = kwargs.get('amount')
         self.tx_ref_num = kwargs.get('tx_ref_num')
 
-    def request(self):
+    @rendering
+    def render_request(self):
         values = {
             'MerchantID': self.merchant_id,
             'OrderID': self.order_id,
             'Amount': self.convert_amount(self.amount),
             'TxRefNum': self.tx_ref_num,
         }
-        xml = self.parse_xml("mark_for_capture.xml", values)
-        result = self.make_request(xml)
+        self.validate(validation.MARK_FOR_CAPTURE, values)
+        return self.parse_xml("mark_for_capture.xml", values)
+
+    def request(self):
+        result = self.make_request(self.render_request())
         return self.parse_result(result)
 
 
@@ -486,7 +620,8 @@ class Reversal(Endpoint):
         self.order_id = kwargs.get('order_id')  # <OrderID>
         self.online_reversal_ind = kwargs.get('online_reversal_ind')  # <OnlineReversalInd>
 
-    def reversal(self):
+    @rendering
+    def render_reversal(self):
         self.online_reversal_ind = "Y"
         values = {
             'MerchantID': self.merchant_id,
@@ -497,11 +632,15 @@ class Reversal(Endpoint):
         }
         if self.amount:
             values['AdjustedAmt'] = self.convert_amount(self.amount)
-        xml = self.parse_xml("reversal.xml", values)
-        result = self.make_request(xml)
+        self.validate(validation.REVERSAL, values)
+        return self.parse_xml("reversal.xml", values)
+
+    def reversal(self):
+        result = self.make_request(self.render_reversal())
         return self.parse_result(result)
 
-    def void(self):
+    @rendering
+    def render_void(self):
         values = {
             'MerchantID': self.merchant_id,
             'TxRefNum': self.tx_ref_num,
@@ -510,6 +649,9 @@ class Reversal(Endpoint):
         }
         if self.amount:
             values['AdjustedAmt'] = self.convert_amount(self.amount)
-        xml = self.parse_xml("reversal.xml", values)
-        result = self.make_request(xml)
+        self.validate(validation.REVERSAL, values)
+        return self.parse_xml("reversal.xml", values)
+
+    def void(self):
+        result = self.make_request(self.render_void())
         return self.parse_result(result)
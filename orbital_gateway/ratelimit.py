@@ -0,0 +1,94 @@
+import threading
+import time
+
+
+class RateLimiter(object):
+    def __init__(self, rate, burst=None, clock=time.time):
+        """
+        Thread safe token bucket.
+
+        rate    tokens added per second
+        burst   bucket size, defaults to one second worth of tokens
+        """
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(rate, 1))
+        self._clock = clock
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens=1):
+        """
+        Take `tokens` from the bucket and return how many seconds the caller
+        has to wait before using them. Lets sync and asyncio callers share a
+        bucket, each sleeping the way it knows how.
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self, tokens=1):
+        delay = self.reserve(tokens)
+        if delay:
+            time.sleep(delay)
+
+
+class KeyedRateLimiter(object):
+    def __init__(self, rate, burst=None):
+        """
+        One RateLimiter per key, e.g. per merchant id, created on first use.
+        """
+        self.rate = rate
+        self.burst = burst
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, key):
+        try:
+            return self._limiters[key]
+        except KeyError:
+            pass
+        with self._lock:
+            if key not in self._limiters:
+                self._limiters[key] = RateLimiter(self.rate, self.burst)
+            return self._limiters[key]
+
+    def acquire(self, key, tokens=1):
+        self.limiter(key).acquire(tokens)
+
+
+class LimitedTransport(object):
+    def __init__(self, transport, max_concurrency=None, limiter=None):
+        """
+        Transport wrapper keeping at most `max_concurrency` requests in
+        flight and taking a token from `limiter`, a RateLimiter, for every
+        request sent.
+        """
+        self.transport = transport
+        self.max_concurrency = max_concurrency
+        self.limiter = limiter
+        self._slots = (
+            threading.BoundedSemaphore(max_concurrency)
+            if max_concurrency else None
+        )
+
+    def post(self, url, data, headers, timeout=None):
+        if self.limiter is not None:
+            self.limiter.acquire()
+        if self._slots is None:
+            return self.transport.post(url, data, headers, timeout)
+        with self._slots:
+            return self.transport.post(url, data, headers, timeout)
+
+    def warm_up(self, *urls):
+        return self.transport.warm_up(*urls)
+
+    def close(self):
+        self.transport.close()
@@ -0,0 +1,182 @@
+"""
+Long-lived clients for several merchants served from one process.
+
+    registry = ClientRegistry(url=url, url2=url2)
+    registry.register('700000001', username=user1, password=password1,
+                      max_concurrency=20, rate_limit=50)
+    registry.register('700000002', username=user2, password=password2,
+                      platform='pns')
+
+    registry.order('700000001', order_id='1', amount='10.00',
+                   cc_num=cc_num).authorize()
+    registry['700000002'].profile(customer_ref_num=ref).read()
+
+A MerchantClient resolves its credentials, platform BIN and headers once,
+when it is registered, and its endpoints are built without reading the
+environment or rebuilding headers. Every client owns a pooled
+HTTPTransport, so merchants do not compete for connections, and may cap
+its requests in flight and per second, or adapt them to the gateway's
+latency with a limiter.AdaptiveLimit. The ORBITAL_* environment variables
+never override the credentials a merchant was registered with.
+"""
+import threading
+
+from .context import MerchantContext
+from .limiter import AdaptiveTransport
+from .ratelimit import LimitedTransport, RateLimiter
+from .transport import HTTPTransport
+
+
+class UnknownMerchant(KeyError):
+    pass
+
+
+class MerchantClient(MerchantContext):
+    def __init__(self, merchant_id, username='', password='', pool_size=10,
+                 max_concurrency=None, rate_limit=None, burst=None,
+                 adaptive_limit=None, **kwargs):
+        """
+        merchant_id      Orbital credentials of the merchant
+        username
+        password
+        pool_size        connections kept open per gateway url
+        max_concurrency  most requests of this merchant in flight
+        rate_limit       most requests of this merchant per second
+        burst            token bucket size for rate_limit
+        adaptive_limit   limiter.AdaptiveLimit adjusting the requests in
+                         flight to the gateway's latency
+
+        The other Endpoint parameters (url, url2, platform, health,
+        deadline, max_attempts, observers, journal, validator) apply to
+        every endpoint of the client. A `transport` given is used, and not
+        closed, instead of a pool of the client's own.
+        """
+        merchant_id = str(merchant_id)
+        transport = kwargs.pop('transport', None)
+        self.owns_transport = transport is None
+        if transport is None:
+            transport = HTTPTransport(pool_size=pool_size)
+        self.adaptive_limit = adaptive_limit
+        if adaptive_limit is not None:
+            transport = AdaptiveTransport(transport, adaptive_limit)
+        self.limiter = RateLimiter(rate_limit, burst) if rate_limit else None
+        if max_concurrency or self.limiter is not None:
+            transport = LimitedTransport(
+                transport, max_concurrency, self.limiter
+            )
+        super(MerchantClient, self).__init__(
+            merchant_id=merchant_id, username=username, password=password,
+            transport=transport, **kwargs
+        )
+        # requests are routed by merchant id, the environment must not
+        # override the registered credentials
+        self.merchant_id = merchant_id
+        self.username = username
+        self.password = password
+        self.headers['MerchantID'] = merchant_id
+        self.credentials['OrbitalConnectionUsername'] = username
+        self.credentials['OrbitalConnectionPassword'] = password
+
+    @property
+    def key(self):
+        return (self.merchant_id, self.platform.lower())
+
+    def warm_up(self):
+        return self.transport.warm_up(self.url, self.url2)
+
+    def close(self):
+        if self.owns_transport:
+            self.transport.close()
+
+    def __repr__(self):
+        return '<MerchantClient %s %s>' % self.key
+
+
+class ClientRegistry(object):
+    def __init__(self, **defaults):
+        """
+        `defaults` are MerchantClient parameters shared by every merchant,
+        e.g. url, url2 and health, overridden by those given to register().
+        """
+        self.defaults = defaults
+        self._clients = {}
+        self._by_merchant = {}
+        self._lock = threading.Lock()
+
+    def register(self, merchant_id, **kwargs):
+        """
+        Create and return the MerchantClient of a merchant and platform.
+        """
+        client = MerchantClient(merchant_id, **dict(self.defaults, **kwargs))
+        with self._lock:
+            if client.key in self._clients:
+                client.close()
+                raise ValueError(
+                    'merchant %s on %s is already registered' % client.key
+                )
+            self._clients[client.key] = client
+            self._by_merchant.setdefault(client.merchant_id, []).append(
+                client
+            )
+        return client
+
+    def client(self, merchant_id, platform=None):
+        """
+        The client registered for `merchant_id`. `platform` picks one of a
+        merchant registered on both platforms.
+        """
+        merchant_id = str(merchant_id)
+        if platform is not None:
+            try:
+                return self._clients[(merchant_id, platform.lower())]
+            except KeyError:
+                raise UnknownMerchant(
+                    'merchant %s on %s is not registered' % (
+                        merchant_id, platform
+                    )
+                )
+        clients = self._by_merchant.get(merchant_id)
+        if not clients:
+            raise UnknownMerchant(
+                'merchant %s is not registered' % merchant_id
+            )
+        if len(clients) > 1:
+            raise ValueError(
+                'merchant %s is registered on several platforms, pass '
+                'platform=' % merchant_id
+            )
+        return clients[0]
+
+    def order(self, merchant_id, platform=None, **kwargs):
+        return self.client(merchant_id, platform).order(**kwargs)
+
+    def profile(self, merchant_id, platform=None, **kwargs):
+        return self.client(merchant_id, platform).profile(**kwargs)
+
+    def capture(self, merchant_id, platform=None, **kwargs):
+        return self.client(merchant_id, platform).capture(**kwargs)
+
+    def reversal(self, merchant_id, platform=None, **kwargs):
+        return self.client(merchant_id, platform).reversal(**kwargs)
+
+    def __getitem__(self, merchant_id):
+        return self.client(merchant_id)
+
+    def __contains__(self, merchant_id):
+        return str(merchant_id) in self._by_merchant
+
+    def __iter__(self):
+        return iter(list(self._clients.values()))
+
+    def __len__(self):
+        return len(self._clients)
+
+    def close(self):
+        for client in self:
+            client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
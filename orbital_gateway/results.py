@@ -0,0 +1,218 @@
+"""
+Compact decoding of Orbital responses.
+
+Orbital answers with a flat document, a root element holding one response
+element whose children are all text fields:
+
+    <Response><NewOrderResp><ProcStatus>0</ProcStatus>...</NewOrderResp>
+    </Response>
+
+decode() reads it with a single regular expression pass instead of
+building an ElementTree, and returns an immutable OrbitalResult. A
+document that is not flat (attributes, nested elements, comments, CDATA)
+is parsed with ElementTree instead. Field names are shared between every
+response of the same shape, so a result only owns a tuple of its values.
+"""
+import re
+
+import six
+from six.moves import collections_abc
+
+from . import config
+
+# the root and response elements, after an optional XML declaration
+_HEAD = re.compile(r'\s*(?:<\?[^>]*>\s*)?<(\w+)>\s*<(\w+)>')
+# a text field: no attributes, no child elements
+_FIELD = re.compile(r'<(\w+)(?:>([^<]*)</\1>|\s*/>)')
+_ENTITY = re.compile(r'&(#[0-9]+|#x[0-9a-fA-F]+|amp|lt|gt|quot|apos);')
+_NAMED_ENTITIES = {
+    'amp': u'&', 'lt': u'<', 'gt': u'>', 'quot': u'"', 'apos': u"'",
+}
+_MAX_SHAPES = 256
+
+
+class ResponseParseError(SyntaxError):
+    """
+    The gateway answer is not an Orbital response document. Subclasses
+    SyntaxError like ElementTree's ParseError.
+    """
+
+
+def _replace_entity(match):
+    name = match.group(1)
+    if name[0] != '#':
+        return _NAMED_ENTITIES[name]
+    if name[1] == 'x':
+        return six.unichr(int(name[2:], 16))
+    return six.unichr(int(name[1:]))
+
+
+def _unescape(text):
+    if not text:
+        return None
+    if '&' in text:
+        return _ENTITY.sub(_replace_entity, text)
+    return text
+
+
+class _Shape(object):
+    __slots__ = ('names', 'index')
+
+    def __init__(self, names):
+        self.names = names
+        self.index = dict((name, i) for i, name in enumerate(names))
+
+
+_shapes = {}
+
+
+def _shape(names):
+    shape = _shapes.get(names)
+    if shape is None:
+        shape = _Shape(names)
+        if len(_shapes) < _MAX_SHAPES:
+            _shapes[names] = shape
+    return shape
+
+
+def _integer(value):
+    if value is None:
+        return None
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def _code(value):
+    if value is None:
+        return None
+    return value.strip() or None
+
+
+def _field(name, convert):
+    def getter(self):
+        return convert(self.get(name))
+    getter.__name__ = name
+    return property(getter)
+
+
+class OrbitalResult(collections_abc.Mapping):
+    """
+    Immutable Orbital response. Works as a read-only mapping of the raw
+    field text (None for empty fields), like the dicts parse_result
+    returns, and exposes the common fields typed:
+
+        result.proc_status      -> 0
+        result['ProcStatus']    -> '0'
+    """
+    __slots__ = ('response_type', '_shape', '_values')
+
+    def __init__(self, response_type, names, values):
+        object.__setattr__(self, 'response_type', response_type)
+        object.__setattr__(self, '_shape', _shape(tuple(names)))
+        object.__setattr__(self, '_values', tuple(values))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('OrbitalResult is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('OrbitalResult is immutable')
+
+    def __getitem__(self, key):
+        return self._values[self._shape.index[key]]
+
+    def __contains__(self, key):
+        return key in self._shape.index
+
+    def __iter__(self):
+        return iter(self._shape.names)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __repr__(self):
+        return '<OrbitalResult %s ProcStatus=%s>' % (
+            self.response_type, self.get('ProcStatus')
+        )
+
+    def __reduce__(self):
+        return (OrbitalResult, (
+            self.response_type, self._shape.names, self._values
+        ))
+
+    def to_dict(self):
+        return dict(zip(self._shape.names, self._values))
+
+    proc_status = _field('ProcStatus', _integer)
+    approval_status = _field('ApprovalStatus', _integer)
+    profile_proc_status = _field('ProfileProcStatus', _integer)
+    tx_ref_num = _field('TxRefNum', _code)
+    tx_ref_idx = _field('TxRefIdx', _integer)
+    order_id = _field('OrderID', _code)
+    customer_ref_num = _field('CustomerRefNum', _code)
+    resp_code = _field('RespCode', _code)
+    avs_resp_code = _field('AVSRespCode', _code)
+    cvv2_resp_code = _field('CVV2RespCode', _code)
+    auth_code = _field('AuthCode', _code)
+    status_msg = _field('StatusMsg', _code)
+    amount = _field('Amount', _integer)
+    requested_amount = _field('RequestedAmount', _integer)
+    redeemed_amount = _field('RedeemedAmount', _integer)
+    remaining_balance = _field('RemainingBalance', _integer)
+
+    @property
+    def approved(self):
+        """
+        Processed by Orbital and not declined. Profile responses only
+        carry ProfileProcStatus.
+        """
+        status = self.proc_status
+        if status is None and self.response_type == 'ProfileResp':
+            status = self.profile_proc_status
+        if status != int(config.PROCSTATUS_SUCCESS):
+            return False
+        return self.approval_status in (None, int(config.APPROVAL_APPROVED))
+
+
+def _decode_tree(text):
+    import xml.etree.ElementTree as ET
+    try:
+        root = ET.fromstring(text)
+    except ET.ParseError as e:
+        raise ResponseParseError(str(e))
+    if not len(root):
+        raise ResponseParseError('empty Orbital response')
+    resp_elem = root[0]
+    names = [child.tag for child in resp_elem]
+    values = [child.text for child in resp_elem]
+    return resp_elem.tag, names, values
+
+
+def decode(text):
+    """
+    Decode an Orbital response into an OrbitalResult.
+    """
+    if isinstance(text, bytes):
+        text = text.decode('utf-8')
+    head = _HEAD.match(text) if '<!' not in text else None
+    fields = _FIELD.findall(text, head.end()) if head is not None else ()
+    # every tag of a flat document is the head, a field or one of the two
+    # closing tags. Anything else (attributes, nested elements, comments,
+    # CDATA) is left to a real XML parser.
+    if head is None or text.count('<') != (
+        head.group(0).count('<') + 2 * len(fields) + 2 -
+        text.count('/>', head.end())
+    ):
+        response_type, names, values = _decode_tree(text)
+    else:
+        response_type = head.group(2)
+        names = [name for name, value in fields]
+        values = [_unescape(value) for name, value in fields]
+    if len(set(names)) != len(names):
+        merged = dict(zip(names, values))
+        names, values = list(merged), list(merged.values())
+    return OrbitalResult(response_type, names, values)
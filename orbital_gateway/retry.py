@@ -0,0 +1,172 @@
+"""
+Idempotent retries using Orbital's retry trace.
+
+Every logical transaction gets its own Trace-number header and keeps it
+across all of its retries, so Orbital answers a replayed request with the
+original response instead of processing it twice. The Transaction object
+holds that state and the retry decisions, the sync and async make_request
+only drive the I/O.
+"""
+import random
+import re
+import threading
+import time
+
+from . import config
+from .health import CircuitOpenError
+from .instrumentation import Timing, emit, observers_for
+
+MAX_TRACE_NUMBER = 9999999999999999
+
+_INVALID_RETRY_TRACE = re.compile(
+    r'ProcStatus>\s*%s\s*<' % config.PROCSTATUS_INVALID_RETRY_TRACE
+)
+
+
+class RetryTraceError(Exception):
+    """
+    Orbital rejected the retry trace of a transaction that may already
+    have been processed. Reconcile it before sending it again.
+    """
+    def __init__(self, trace_number, message=None):
+        super(RetryTraceError, self).__init__(
+            message or 'ProcStatus %s for trace number %s' % (
+                config.PROCSTATUS_INVALID_RETRY_TRACE, trace_number
+            )
+        )
+        self.trace_number = trace_number
+
+
+class DeadlineExceeded(IOError):
+    """
+    A transaction hit its deadline before getting an answer.
+    """
+
+
+class TraceNumbers(object):
+    def __init__(self):
+        """
+        Process unique trace numbers within Orbital's 1-9999999999999999
+        range: a random starting point, then sequential.
+        """
+        self._lock = threading.Lock()
+        self._next = random.SystemRandom().randint(1, MAX_TRACE_NUMBER // 2)
+
+    def next(self):
+        with self._lock:
+            value = self._next
+            self._next = value + 1 if value < MAX_TRACE_NUMBER else 1
+        return str(value)
+
+
+trace_numbers = TraceNumbers()
+
+
+def is_invalid_retry_trace(text):
+    return _INVALID_RETRY_TRACE.search(text) is not None
+
+
+class Transaction(object):
+    def __init__(self, endpoint, xml=None):
+        """
+        One logical request of `endpoint` across all of its attempts,
+        journaled when the endpoint has a journal.
+        """
+        self.endpoint = endpoint
+        self.health = endpoint.health
+        self.start = time.time()
+        self.deadline = (
+            self.start + endpoint.deadline if endpoint.deadline else None
+        )
+        self.trace_number = endpoint.next_trace_number()
+        self.headers = dict(endpoint.headers)
+        self.headers['Trace-number'] = self.trace_number
+        self.attempts_made = 0
+        self.sent = endpoint.replaying
+        self.error = None
+        self.observers = observers_for(endpoint)
+        self.timing = None
+        if self.observers:
+            self.timing = Timing(endpoint, self.trace_number)
+        self.entry = None
+        if endpoint.journal is not None and xml is not None:
+            self.entry = endpoint.journal.begin(self, xml)
+
+    @property
+    def retries(self):
+        return max(self.attempts_made - 1, 0)
+
+    def attempts(self):
+        """
+        Yield (delay, url, timeout) for every attempt. Stops early when the
+        next attempt could not finish before the deadline.
+        """
+        schedule = self.health.schedule(
+            self.endpoint.urls, self.endpoint.max_attempts
+        )
+        try:
+            for delay, url in schedule:
+                timeout = None
+                if self.deadline is not None:
+                    timeout = self.deadline - time.time() - delay
+                    if timeout <= 0:
+                        self.error = self.error or DeadlineExceeded(
+                            'transaction %s ran out of time' %
+                            self.trace_number
+                        )
+                        return
+                self.attempts_made += 1
+                yield delay, url, timeout
+        except CircuitOpenError as e:
+            self._finish(error=e)
+            raise
+
+    def failed(self, url, error):
+        self.health.record_failure(url)
+        if self.timing is not None:
+            self.timing.attempt(url, None)
+        self.error = error
+        from .transport import request_was_sent
+        if request_was_sent(error):
+            self.sent = True
+
+    def completed(self, url, text, elapsed, response=None):
+        """
+        Return the response text, or None when the transaction should go
+        on to its next attempt.
+        """
+        if self.timing is not None:
+            self.timing.attempt(url, elapsed, response)
+        if not text:
+            self.health.record_failure(url)
+            self.sent = True
+            return None
+        self.health.record_success(url, elapsed)
+        if is_invalid_retry_trace(text):
+            if self.sent:
+                error = RetryTraceError(self.trace_number)
+                self._finish(text, error)
+                raise error
+            # nothing reached Orbital under the old trace, a new one is safe
+            self.trace_number = self.endpoint.next_trace_number()
+            self.headers['Trace-number'] = self.trace_number
+            return None
+        self._finish(text)
+        if self.entry is not None:
+            self.entry.complete(text)
+        return text
+
+    def exhausted(self):
+        self._finish(error=self.error)
+        if self.entry is not None:
+            self.entry.fail()
+        if self.error is not None:
+            raise self.error
+        return "Could not communicate with Chase"
+
+    def _finish(self, text=None, error=None):
+        timing, self.timing = self.timing, None
+        if timing is not None:
+            timing.trace_number = self.trace_number
+            emit(self.observers, timing.finish(text, error))
+
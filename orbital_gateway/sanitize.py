@@ -0,0 +1,168 @@
+"""
+Field cleaning rules shared by the endpoints and a bulk form of them for
+imports.
+
+    columns = sanitize_columns({
+        'name': names, 'address1': streets, 'city': cities,
+        'zip_code': zips, 'phone': phones, 'email': emails,
+    })
+
+cleans whole columns of Profile constructor arguments at once. Every value
+comes out exactly as Profile.sanitize() leaves it, and with `clean` (the
+default) as it is written into the request, control characters removed.
+Columns are processed with one translate() and one printable check over
+the joined column instead of a call per value and character.
+"""
+import re
+
+import six
+
+# printable ASCII never holds a control character
+_PRINTABLE_ASCII = re.compile(r'[\x20-\x7e]*\Z')
+
+# joins a column for the batch translate, checked to be absent
+_SEPARATOR = u'\x00'
+
+ADDRESS_CHARS = u"%|^\\/"
+PHONE_CHARS = u"().-"
+
+
+def _deletion_table(chars):
+    return dict((ord(ch), None) for ch in chars)
+
+
+_ADDRESS_TABLE = _deletion_table(ADDRESS_CHARS)
+_PHONE_TABLE = _deletion_table(PHONE_CHARS)
+
+
+def _delete_chars(s, chars, table):
+    if isinstance(s, six.text_type):
+        return s.translate(table)
+    return "".join(ch for ch in s if ch not in chars)
+
+
+def remove_control_characters(s):
+    """
+    Remove unicode characters that will endanger xml parsing on Chase's end
+    """
+    u = six.text_type(s)
+    if _PRINTABLE_ASCII.match(u):
+        return u
+    import unicodedata
+    return "".join(ch for ch in u if unicodedata.category(ch)[0] != "C")
+
+
+def sanitize_address_field(s):
+    r"""
+    Address fields hould not include any of the following characters:
+    % | ^ \ /
+    """
+    return _delete_chars(s, ADDRESS_CHARS, _ADDRESS_TABLE)
+
+
+def sanitize_phone_field(s):
+    """
+        Phone Number Format
+        AAAEEENNNNXXXX, where
+        AAA = Area Code
+        EEE = Exchange
+        NNNN = Number
+        XXXX = Extension
+    """
+    return _delete_chars(s, PHONE_CHARS, _PHONE_TABLE)
+
+
+class FieldRule(object):
+    __slots__ = ('attribute', 'max_length', 'chars', 'table')
+
+    def __init__(self, attribute, max_length, chars=u''):
+        """
+        attribute   endpoint attribute holding the field
+        max_length  longest value Orbital takes, longer ones are cut
+        chars       characters removed first
+        """
+        self.attribute = attribute
+        self.max_length = max_length
+        self.chars = chars
+        self.table = _deletion_table(chars)
+
+    def apply(self, value):
+        if self.chars:
+            value = _delete_chars(value, self.chars, self.table)
+        return value[:self.max_length]
+
+    def apply_column(self, values, clean=True):
+        """
+        apply() to every value of a column, then remove_control_characters()
+        with `clean`. None stays None.
+        """
+        values = list(values)
+        present = [value for value in values if value is not None]
+        if all(isinstance(value, six.text_type) for value in present):
+            cleaned = self._apply_text(present, clean)
+        else:
+            cleaned = [self.apply(value) for value in present]
+            if clean:
+                cleaned = [remove_control_characters(value)
+                           for value in cleaned]
+        if len(present) == len(values):
+            return cleaned
+        cleaned = iter(cleaned)
+        return [None if value is None else next(cleaned) for value in values]
+
+    def _apply_text(self, values, clean):
+        if self.chars:
+            joined = _SEPARATOR.join(values)
+            if joined.count(_SEPARATOR) == len(values) - 1:
+                values = joined.translate(self.table).split(_SEPARATOR)
+            else:
+                values = [value.translate(self.table) for value in values]
+        max_length = self.max_length
+        values = [value[:max_length] for value in values]
+        if clean and not _PRINTABLE_ASCII.match(u''.join(values)):
+            values = [remove_control_characters(value) for value in values]
+        return values
+
+
+# constructor argument -> rule, in the order Profile.sanitize() applies them
+PROFILE_FIELDS = (
+    ('name', FieldRule('name', 30)),
+    ('address1', FieldRule('address1', 30, ADDRESS_CHARS)),
+    ('address2', FieldRule('address2', 30, ADDRESS_CHARS)),
+    ('city', FieldRule('city', 20, ADDRESS_CHARS)),
+    ('state', FieldRule('state', 2, ADDRESS_CHARS)),
+    ('zip_code', FieldRule('zipCode', 5)),
+    ('email', FieldRule('email', 50)),
+    ('phone', FieldRule('phone', 14, PHONE_CHARS)),
+)
+
+ORDER_FIELDS = tuple(
+    (name, rule) for name, rule in PROFILE_FIELDS
+    if name not in ('name', 'email')
+)
+
+
+def sanitize_fields(endpoint, fields):
+    """
+    Clean the attributes of `endpoint` in place under `fields`.
+    """
+    for name, rule in fields:
+        value = getattr(endpoint, rule.attribute)
+        if value is not None:
+            setattr(endpoint, rule.attribute, rule.apply(value))
+
+
+def sanitize_columns(columns, fields=PROFILE_FIELDS, clean=True):
+    """
+    Cleaned copy of `columns`, a dict of constructor argument -> sequence
+    of values. Columns without a rule are passed through as lists.
+    """
+    rules = dict(fields)
+    cleaned = {}
+    for name, values in columns.items():
+        rule = rules.get(name)
+        if rule is None:
+            cleaned[name] = list(values)
+        else:
+            cleaned[name] = rule.apply_column(values, clean)
+    return cleaned
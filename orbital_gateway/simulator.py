@@ -0,0 +1,494 @@
+"""
+Local Orbital gateway simulator for load and failover testing.
+
+Speaks the PTI68 request/response documents for NewOrder, MarkForCapture,
+Reversal and Profile, keeps authorizations and profiles in memory, and
+honours retry traces (a repeated Trace-number replays the original answer,
+a reused one with a different body gets ProcStatus 9714).
+
+In process, with no sockets:
+
+    simulator = OrbitalSimulator(latency=lognormal(0.05, 0.4), seed=1)
+    order = Order(url='sim://1', transport=SimulatorTransport(simulator),
+                  **order_kwargs)
+
+Or over localhost HTTP, one server per gateway url:
+
+    with simulator.serve() as primary, simulator.serve() as backup:
+        primary.outage = OUTAGE_HANG
+        order = Order(url=primary.url, url2=backup.url, **order_kwargs)
+
+`python -m orbital_gateway.simulator --port 8080` runs a standalone one.
+"""
+import collections
+import hashlib
+import math
+import random
+import threading
+import time
+
+import requests
+from six.moves import BaseHTTPServer, socketserver
+
+from . import cards, config
+from .results import ResponseParseError, decode
+from .transport import ConnectFailed, TransportResponse
+from .xml_templates import escape_text
+
+OUTAGE_DOWN = 'down'    # connection dropped without an answer
+OUTAGE_ERROR = 'error'  # HTTP 503
+OUTAGE_HANG = 'hang'    # answer only after `hang_seconds`
+
+PROCSTATUS_TX_NOT_FOUND = '881'
+PROCSTATUS_MALFORMED = '9999'
+
+DO_NOT_HONOR = ('05', 'Do Not Honor')
+
+CARD_BRANDS = {
+    config.CARD_TYPE_VISA: 'VI',
+    config.CARD_TYPE_MC: 'MC',
+    config.CARD_TYPE_AMEX: 'AX',
+    config.CARD_TYPE_DISCOVER: 'DI',
+    config.CARD_TYPE_JCB: 'JC',
+}
+
+
+def fixed(seconds):
+    return lambda rng: seconds
+
+
+def uniform(low, high):
+    return lambda rng: rng.uniform(low, high)
+
+
+def lognormal(median, sigma):
+    """
+    Long tailed latency: `median` seconds, spread by `sigma`.
+    """
+    mu = math.log(median)
+    return lambda rng: rng.lognormvariate(mu, sigma)
+
+
+def _document(response_type, fields):
+    body = ''.join(
+        u'<%s>%s</%s>' % (name, escape_text(value or u''), name)
+        for name, value in fields
+    )
+    return (
+        u'<?xml version="1.0" encoding="UTF-8"?><Response><%s>%s</%s>'
+        u'</Response>' % (response_type, body, response_type)
+    )
+
+
+def _card_brand(account_num):
+    info = cards.lookup(account_num)
+    return CARD_BRANDS.get(info.brand, '') if info is not None else ''
+
+
+class OrbitalSimulator(object):
+    def __init__(self, latency=None, error_rate=0.0, declines=None,
+                 hang_seconds=30.0, seed=None, max_traces=100000):
+        """
+        latency       callable taking a random.Random and returning seconds,
+                      see fixed(), uniform() and lognormal()
+        error_rate    share of requests answered with HTTP 500
+        declines      {card number: (RespCode, StatusMsg)} to decline
+        hang_seconds  how long OUTAGE_HANG endpoints wait before answering
+        seed          seed for latency, errors and generated ids
+        max_traces    retry traces remembered, the least recently used
+                      ones are forgotten first
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.declines = dict(declines or {})
+        self.hang_seconds = hang_seconds
+        self.random = random.Random(seed)
+        self.transactions = {}
+        self.profiles = {}
+        self.max_traces = max_traces
+        self.traces = collections.OrderedDict()
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._next_customer = 100000000
+        self._lock = threading.Lock()
+
+    def delay(self):
+        if self.latency is None:
+            return 0.0
+        with self._lock:
+            return max(self.latency(self.random), 0.0)
+
+    def respond(self, body, headers=None):
+        """
+        Answer one request like the gateway would, latency included.
+        Returns (http status, response text).
+        """
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            failed = self.error_rate and self.random.random() < self.error_rate
+        try:
+            delay = self.delay()
+            if delay:
+                time.sleep(delay)
+            if failed:
+                return 500, u'Internal Server Error'
+            return 200, self.handle(body, headers or {})
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def handle(self, body, headers):
+        if isinstance(body, bytes):
+            body = body.decode('utf-8')
+        try:
+            request = decode(body)
+        except ResponseParseError:
+            request = None
+        trace = headers.get('Trace-number')
+        key = digest = None
+        if trace:
+            key = (headers.get('MerchantID'), trace)
+            digest = hashlib.sha1(body.encode('utf-8')).hexdigest()
+        # the trace lookup, the handler and storing its answer are one step,
+        # a concurrent retry of the same trace waits for the first answer
+        with self._lock:
+            if key is not None:
+                seen = self.traces.pop(key, None)
+                if seen is not None:
+                    self.traces[key] = seen
+                    if seen[0] == digest:
+                        return seen[1]
+                    return _document('QuickResp', [
+                        ('ProcStatus', config.PROCSTATUS_INVALID_RETRY_TRACE),
+                        ('StatusMsg', u'Invalid retry trace number'),
+                    ])
+            if request is None:
+                return _document('QuickResp', [
+                    ('ProcStatus', PROCSTATUS_MALFORMED),
+                    ('StatusMsg', u'Malformed request'),
+                ])
+            handler = getattr(self, '_%s' % request.response_type, None)
+            if handler is None:
+                response = _document('QuickResp', [
+                    ('ProcStatus', PROCSTATUS_MALFORMED),
+                    ('StatusMsg', u'Unsupported request %s' %
+                     request.response_type),
+                ])
+            else:
+                response = handler(request)
+            if key is not None:
+                self.traces[key] = (digest, response)
+                while len(self.traces) > self.max_traces:
+                    self.traces.popitem(last=False)
+        return response
+
+    def _id(self, size=40):
+        return u'%0*X' % (size, self.random.getrandbits(size * 4))
+
+    def _NewOrder(self, request):
+        account_num = request.get('AccountNum')
+        customer_ref_num = request.get('CustomerRefNum')
+        message_type = request.get('MessageType')
+        profile = self.profiles.get(customer_ref_num)
+        if not account_num and profile is not None:
+            account_num = profile.get('CCAccountNum')
+        original = self.transactions.get(request.get('TxRefNum'))
+        if not account_num and original is not None:
+            account_num = original['account_num']
+        fields = [
+            ('MessageType', message_type),
+            ('MerchantID', request.get('MerchantID')),
+            ('TerminalID', request.get('TerminalID')),
+            ('CardBrand', request.get('CardBrand') or _card_brand(account_num)),
+            ('AccountNum', account_num),
+            ('OrderID', request.get('OrderID')),
+        ]
+        if message_type not in config.MESSAGE_TYPES:
+            return _document('NewOrderResp', fields + [
+                ('ProcStatus', PROCSTATUS_MALFORMED),
+                ('StatusMsg', u'Invalid MessageType'),
+            ])
+        decline = self.declines.get(account_num)
+        tx_ref_num = self._id()
+        if (request.get('CustomerProfileFromOrderInd') ==
+                config.AUTO_GENERATE and not decline):
+            customer_ref_num = self._create_profile({
+                'CCAccountNum': account_num,
+                'CCExpireDate': request.get('Exp'),
+                'CustomerName': request.get('AVSname'),
+                'CustomerZIP': request.get('AVSzip'),
+            })
+        if decline:
+            resp_code, status_msg = decline
+            approval = config.APPROVAL_DECLINED
+            auth_code = u''
+        else:
+            resp_code, status_msg = u'00', u'Approved'
+            approval = config.APPROVAL_APPROVED
+            auth_code = u'tst%03d' % self.random.randint(0, 999)
+            self.transactions[tx_ref_num] = {
+                'account_num': account_num,
+                'amount': int(request.get('Amount') or 0),
+                'message_type': message_type,
+                'captured': message_type != config.AUTHORIZE,
+                'voided': False,
+            }
+        return _document('NewOrderResp', fields + [
+            ('TxRefNum', tx_ref_num),
+            ('TxRefIdx', u'0' if message_type != config.REFUND else u'1'),
+            ('ProcStatus', config.PROCSTATUS_SUCCESS),
+            ('ApprovalStatus', approval),
+            ('RespCode', resp_code),
+            ('AVSRespCode', u'B'),
+            ('CVV2RespCode', u'M' if request.get('CardSecVal') else u''),
+            ('AuthCode', auth_code),
+            ('StatusMsg', status_msg),
+            ('CustomerRefNum', customer_ref_num),
+            ('ProfileProcStatus',
+             config.PROCSTATUS_SUCCESS if customer_ref_num else u''),
+            ('RespTime', time.strftime('%H%M%S')),
+        ])
+
+    def _MarkForCapture(self, request):
+        tx_ref_num = request.get('TxRefNum')
+        fields = [
+            ('MerchantID', request.get('MerchantID')),
+            ('TerminalID', request.get('TerminalID')),
+            ('OrderID', request.get('OrderID')),
+            ('TxRefNum', tx_ref_num),
+        ]
+        transaction = self.transactions.get(tx_ref_num)
+        if transaction is None or transaction['voided']:
+            return _document('MarkForCaptureResp', fields + [
+                ('ProcStatus', PROCSTATUS_TX_NOT_FOUND),
+                ('StatusMsg', u'Transaction not found'),
+            ])
+        amount = int(request.get('Amount') or transaction['amount'])
+        transaction['captured'] = True
+        transaction['amount'] = min(amount, transaction['amount'])
+        return _document('MarkForCaptureResp', fields + [
+            ('TxRefIdx', u'1'),
+            ('Amount', u'%d' % transaction['amount']),
+            ('ProcStatus', config.PROCSTATUS_SUCCESS),
+            ('StatusMsg', u''),
+            ('ApprovalStatus', config.APPROVAL_APPROVED),
+            ('RespCode', u'00'),
+            ('RespTime', time.strftime('%H%M%S')),
+        ])
+
+    def _Reversal(self, request):
+        tx_ref_num = request.get('TxRefNum')
+        fields = [
+            ('MerchantID', request.get('MerchantID')),
+            ('TerminalID', request.get('TerminalID')),
+            ('TxRefNum', tx_ref_num),
+            ('TxRefIdx', request.get('TxRefIdx')),
+            ('OrderID', request.get('OrderID')),
+        ]
+        transaction = self.transactions.get(tx_ref_num)
+        if transaction is None or transaction['voided']:
+            return _document('ReversalResp', fields + [
+                ('ProcStatus', PROCSTATUS_TX_NOT_FOUND),
+                ('StatusMsg', u'Transaction not found'),
+            ])
+        adjusted = request.get('AdjustedAmt')
+        if adjusted:
+            transaction['amount'] -= min(int(adjusted), transaction['amount'])
+        else:
+            transaction['amount'] = 0
+        transaction['voided'] = transaction['amount'] == 0
+        return _document('ReversalResp', fields + [
+            ('OutstandingAmt', u'%d' % transaction['amount']),
+            ('ProcStatus', config.PROCSTATUS_SUCCESS),
+            ('StatusMsg', u''),
+            ('RespTime', time.strftime('%H%M%S')),
+        ])
+
+    PROFILE_FIELDS = (
+        'CustomerName', 'CustomerAddress1', 'CustomerAddress2',
+        'CustomerCity', 'CustomerState', 'CustomerZIP', 'CustomerEmail',
+        'CustomerPhone', 'CustomerCountryCode', 'CustomerAccountType',
+        'CCAccountNum', 'CCExpireDate', 'ECPAccountDDA', 'ECPAccountType',
+        'ECPAccountRT', 'ECPBankPmtDlv',
+    )
+
+    def _create_profile(self, fields, customer_ref_num=None):
+        if not customer_ref_num:
+            self._next_customer += 1
+            customer_ref_num = u'%d' % self._next_customer
+        self.profiles[customer_ref_num] = dict(
+            (name, value) for name, value in fields.items() if value
+        )
+        return customer_ref_num
+
+    def _Profile(self, request):
+        action = request.get('CustomerProfileAction')
+        customer_ref_num = request.get('CustomerRefNum')
+        profile = self.profiles.get(customer_ref_num)
+        if action == config.CREATE_CUSTOMER:
+            customer_ref_num = self._create_profile(
+                dict((name, request.get(name)) for name in self.PROFILE_FIELDS),
+                customer_ref_num,
+            )
+            profile = self.profiles[customer_ref_num]
+        elif profile is None:
+            return _document('ProfileResp', [
+                ('CustomerBin', request.get('CustomerBin')),
+                ('CustomerMerchantID', request.get('CustomerMerchantID')),
+                ('CustomerRefNum', customer_ref_num),
+                ('CustomerProfileAction', action),
+                ('ProfileProcStatus', config.PROCSTATUS_USER_NOT_FOUND),
+                ('CustomerProfileMessage', u'Profile not found'),
+            ])
+        elif action == config.UPDATE_CUSTOMER:
+            for name in self.PROFILE_FIELDS:
+                if request.get(name):
+                    profile[name] = request.get(name)
+        elif action == config.DELETE_CUSTOMER:
+            del self.profiles[customer_ref_num]
+        return _document('ProfileResp', [
+            ('CustomerBin', request.get('CustomerBin')),
+            ('CustomerMerchantID', request.get('CustomerMerchantID')),
+            ('CustomerRefNum', customer_ref_num),
+            ('CustomerProfileAction', action),
+            ('ProfileProcStatus', config.PROCSTATUS_SUCCESS),
+            ('CustomerProfileMessage', u'Profile Request Processed'),
+        ] + [(name, profile.get(name)) for name in self.PROFILE_FIELDS])
+
+    def serve(self, host='127.0.0.1', port=0):
+        """
+        Start a localhost HTTP endpoint backed by this simulator.
+        """
+        return SimulatorServer(self, host, port).start()
+
+
+class SimulatorTransport(object):
+    def __init__(self, simulator, read_timeout=30.0):
+        """
+        Transport that hands requests straight to `simulator`. `outages`
+        maps urls to one of the OUTAGE_* modes.
+        """
+        self.simulator = simulator
+        self.read_timeout = read_timeout
+        self.outages = {}
+
+    def post(self, url, data, headers, timeout=None):
+        if isinstance(timeout, tuple):
+            timeout = timeout[1]
+        timeout = min(timeout or self.read_timeout, self.read_timeout)
+        outage = self.outages.get(url)
+        if outage == OUTAGE_DOWN:
+            raise ConnectFailed('simulated outage of %s' % url)
+        if outage == OUTAGE_ERROR:
+            return TransportResponse(url, 503, u'Service Unavailable')
+        if outage == OUTAGE_HANG:
+            time.sleep(min(timeout, self.simulator.hang_seconds))
+            raise requests.exceptions.ReadTimeout('simulated hang of %s' % url)
+        status, text = self.simulator.respond(data, headers)
+        return TransportResponse(url, status, text)
+
+    def warm_up(self, *urls):
+        return []
+
+    def close(self):
+        pass
+
+
+class SimulatorServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, simulator, host='127.0.0.1', port=0):
+        BaseHTTPServer.HTTPServer.__init__(
+            self, (host, port), SimulatorHandler
+        )
+        self.simulator = simulator
+        self.outage = None
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return 'http://%s:%d/authorize' % (host, port)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class SimulatorHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # headers and body go out in separate writes, without this every
+    # keep-alive request waits on the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if server.outage == OUTAGE_DOWN:
+            self.close_connection = True
+            return
+        if server.outage == OUTAGE_ERROR:
+            status, text = 503, u'Service Unavailable'
+        else:
+            if server.outage == OUTAGE_HANG:
+                time.sleep(server.simulator.hang_seconds)
+            status, text = server.simulator.respond(body, self.headers)
+        payload = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; charset=UTF-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='median latency in seconds')
+    parser.add_argument('--sigma', type=float, default=0.0,
+                        help='lognormal spread of the latency')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--decline', action='append', default=[],
+                        metavar='CARD', help='card number to decline')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+    latency = None
+    if args.latency and args.sigma:
+        latency = lognormal(args.latency, args.sigma)
+    elif args.latency:
+        latency = fixed(args.latency)
+    simulator = OrbitalSimulator(
+        latency=latency, error_rate=args.error_rate, seed=args.seed,
+        declines=dict((card, DO_NOT_HONOR) for card in args.decline),
+    )
+    server = SimulatorServer(simulator, args.host, args.port)
+    print('Orbital simulator listening on %s' % server.url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Coalescing of concurrent identical read-only requests.
+
+While a call for a key is in flight, later callers asking for the same key
+wait for it and share its result instead of sending their own request:
+
+    reads = SingleFlight()
+    values = reads.do(('1234', customer_ref_num), fetch)
+
+aio.AsyncSingleFlight does the same for coroutines. Results are shared as
+is, callers that mutate them should copy them first.
+"""
+import threading
+
+
+class _Call(object):
+    __slots__ = ('event', 'value', 'error', 'waiters')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight(object):
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        """
+        Return `func()`, or the result of the call for `key` that is
+        already in flight in another thread. Its exception is raised in
+        every waiting thread.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        try:
+            call.value = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.value
+
+    def in_flight(self):
+        return len(self._calls)
+
+
+# process wide group used by Profile.read
+profile_reads = SingleFlight()
@@ -0,0 +1,11 @@
+import sys
+
+# async def is a SyntaxError before Python 3.5, these modules would not
+# even compile
+collect_ignore = []
+if sys.version_info < (3, 5):
+    collect_ignore += [
+        'test_aio.py',
+        'test_limiter_aio.py',
+        'test_singleflight_aio.py',
+    ]
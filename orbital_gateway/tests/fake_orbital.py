@@ -0,0 +1,78 @@
+import threading
+import time
+
+from six.moves import BaseHTTPServer, socketserver
+
+NEW_ORDER_RESPONSE = (
+    '<?xml version="1.0" encoding="UTF-8"?><Response><NewOrderResp>'
+    '<MessageType>A</MessageType><MerchantID>1234</MerchantID>'
+    '<TxRefNum>57E9B37668E45028A6FB3E10EF1F8CBD3B59535A</TxRefNum>'
+    '<TxRefIdx>0</TxRefIdx><ProcStatus>0</ProcStatus>'
+    '<ApprovalStatus>1</ApprovalStatus><RespCode>00</RespCode>'
+    '<StatusMsg>Approved</StatusMsg></NewOrderResp></Response>'
+)
+
+
+class FakeOrbitalServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    Local stand in for an Orbital endpoint that answers every POST with a
+    canned body after an optional delay. `body` may also be a callable
+    taking the request body and returning the response.
+    """
+    daemon_threads = True
+
+    def __init__(self, body=NEW_ORDER_RESPONSE, delay=0):
+        BaseHTTPServer.HTTPServer.__init__(
+            self, ('127.0.0.1', 0), FakeOrbitalHandler
+        )
+        self.body = body
+        self.delay = delay
+        self.status = 200
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%d/authorize' % self.server_port
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+
+class FakeOrbitalHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        with server.lock:
+            server.requests.append((dict(self.headers), body))
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            if server.delay:
+                time.sleep(server.delay)
+            payload = server.body
+            if callable(payload):
+                payload = payload(body)
+            payload = payload.encode('ascii')
+            self.send_response(server.status)
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
@@ -1,7 +1,14 @@
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from copy import deepcopy
+from functools import partial
+import argparse
 import csv
 import datetime
 import random
+import threading
+import time
+
 import six
 
 from .. import orbital_gateway
@@ -42,207 +49,324 @@ def mop_lookup(obj):
         }
 
 
+# section name and the sections whose results it uses
+SECTIONS = (
+    ('section_a', ()),
+    ('section_b', ()),
+    ('section_c', ('section_b',)),
+    ('section_d', ()),
+    ('section_e_1', ()),
+    ('section_e_2', ()),
+    ('section_f', ()),
+    ('section_g', ()),
+    ('section_h', ('section_g',)),
+    ('section_i', ('section_g',)),
+    ('section_j', ()),
+    ('section_k', ('section_g',)),
+)
+
+
 class Certification(object):
-    def __init__(self, customer_sequence=None, order_sequence=None):
+    def __init__(self, customer_sequence=None, order_sequence=None,
+                 endpoint_kwargs=None):
         """
         run all chase certification tests and print results to file
+
+        endpoint_kwargs are passed to every endpoint, e.g. url and transport
         """
         self.customer_sequence = customer_sequence if customer_sequence else uniqueids()
         self.order_sequence = order_sequence if order_sequence else uniqueids()
+        self.endpoint_kwargs = endpoint_kwargs or {}
+        # one dict per row, filled in when the row's request succeeds
         self.section_b_results = list()
         self.section_g_results = list()
+        self.timings = OrderedDict()
+        self._lock = threading.Lock()
 
-    def run_all(self, output_file='results.txt'):
-        test_sections = [
-            self.section_a,
-            self.section_b,
-            self.section_c,
-            self.section_d,
-            self.section_e_1,
-            self.section_e_2,
-            self.section_f,
-            self.section_g,
-            self.section_h,
-            self.section_i,
-            self.section_j,
-            self.section_k,
-            #self.failover()
-        ]
+    def next_order_id(self):
+        with self._lock:
+            return six.next(self.order_sequence)
+
+    def next_customer_id(self):
+        with self._lock:
+            return six.next(self.customer_sequence)
+
+    def endpoint(self, cls, **kwargs):
+        return cls(**dict(self.endpoint_kwargs, **kwargs))
+
+    def run_all(self, output_file='results.txt', parallelism=1):
+        """
+        Run the sections and append their results to `output_file` as CSV,
+        in section and line order whatever `parallelism` is. With a
+        parallelism above 1, the rows of the sections whose dependencies
+        are done run concurrently on that many threads. Returns the seconds
+        each section took, also kept in `self.timings`.
+        """
+        if parallelism > 1:
+            sections = self._run_parallel(parallelism)
+        else:
+            sections = self._run_serial()
         with open(output_file, 'a') as fout:
-            for test_section in test_sections:
-                fieldnames = list()
-                fout.write(test_section.__doc__ + '\n')
-                for line_number, result in test_section():
-                    if line_number is 1:
-                        fieldnames = sorted(result.keys())
-                        writer = csv.DictWriter(fout, fieldnames=fieldnames)
-                        writer.writeheader()
-                    writer.writerow(result)
+            for name, results in sections:
+                self._write(fout, getattr(self, name).__doc__, results)
+        return self.timings
+
+    def _write(self, fout, title, results):
+        fout.write(title + '\n')
+        writer = None
+        for line_number, result in results:
+            if writer is None:
+                writer = csv.DictWriter(fout, fieldnames=sorted(result.keys()))
+                writer.writeheader()
+            writer.writerow(result)
+        fout.flush()
+
+    def _run_serial(self):
+        for name, requires in SECTIONS:
+            start = time.time()
+            results = [
+                (line, task()) for line, task in getattr(self, name)()
+            ]
+            self.timings[name] = time.time() - start
+            yield name, results
+
+    def _run_parallel(self, parallelism):
+        """
+        Yield the results of each section in SECTIONS order as soon as it
+        and the sections before it are done.
+        """
+        started = {}
+        elapsed = {}
+        results = {}
+        remaining = {}
+        pending = {}
+        written = 0
+        executor = ThreadPoolExecutor(max_workers=parallelism)
+        try:
+            while written < len(SECTIONS):
+                for name, requires in SECTIONS:
+                    if name in started:
+                        continue
+                    if any(results.get(r) is None or remaining[r]
+                           for r in requires):
+                        continue
+                    started[name] = time.time()
+                    tasks = list(getattr(self, name)())
+                    results[name] = [None] * len(tasks)
+                    remaining[name] = len(tasks)
+                    for i, (line, task) in enumerate(tasks):
+                        future = executor.submit(task)
+                        pending[future] = (name, i, line)
+                    if not tasks:
+                        elapsed[name] = 0.0
+                while written < len(SECTIONS):
+                    name = SECTIONS[written][0]
+                    if remaining.get(name) != 0:
+                        break
+                    self.timings[name] = elapsed[name]
+                    yield name, results[name]
+                    written += 1
+                if not pending:
+                    continue
+                done, not_done = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, i, line = pending.pop(future)
+                    results[name][i] = (line, future.result())
+                    remaining[name] -= 1
+                    if not remaining[name]:
+                        elapsed[name] = time.time() - started[name]
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def _authorize(self, profile, capture=False):
+        order = self.endpoint(orbital_gateway.Order, **profile)
+        if capture:
+            result = order.authorize_capture()
+        else:
+            result = order.authorize()
+        result.update(mop_lookup(order))
+        result.update({'amount': order.amount, 'cvv': order.cvv})
+        return result
+
+    def _authorize_for_capture(self, profile, txn):
+        result = self._authorize(profile)
+        # add detail to section_b_results for later tests
+        txn_ref_num = result.get('TxRefNum')
+        if txn_ref_num:
+            txn.update({
+                'mop': result['MOP'],
+                'tx_ref_num': txn_ref_num,
+                'amount': profile['amount'],
+                'order_id': profile['order_id'],
+            })
+        return result
+
+    def _refund_by_tx_ref_num(self, profile, customer_id):
+        order = self.endpoint(orbital_gateway.Order, **profile)
+        auth_response = order.authorize()
+        refund = self.endpoint(
+            orbital_gateway.Order,
+            tx_ref_num=auth_response['TxRefNum'],
+            order_id=profile['order_id'],
+            amount=profile['amount'],
+            customer_ref_num=customer_id,
+        )
+        result = refund.refund()
+        result.update(mop_lookup(order))
+        result.update({'amount': order.amount, 'cvv': order.cvv})
+        return result
+
+    def _refund_by_card(self, profile):
+        order = self.endpoint(orbital_gateway.Order, **profile)
+        order.authorize()
+        refund = self.endpoint(orbital_gateway.Order, **profile)
+        result = refund.refund()
+        result.update(mop_lookup(order))
+        result.update({'amount': order.amount, 'cvv': order.cvv})
+        return result
+
+    def _void(self, profile):
+        order = self.endpoint(orbital_gateway.Order, **profile)
+        auth_response = order.authorize()
+        reversal = self.endpoint(
+            orbital_gateway.Reversal,
+            tx_ref_num=auth_response['TxRefNum'],
+            tx_ref_idx='0',
+            order_id=profile['order_id'],
+            amount=profile['amount'],
+        )
+        if order.reversal:
+            response = reversal.reversal()
+        else:
+            response = reversal.void()
+        response.update(mop_lookup(order))
+        response['amount'] = order.amount
+        return response
+
+    def _create_profile(self, profile_args, created):
+        profile = self.endpoint(orbital_gateway.Profile, **profile_args)
+        result = profile.create()
+        created.update({
+            'name': result['CustomerName'],
+            'customer_ref_num': result['CustomerRefNum'],
+            'amount': profile_args['amount'],
+        })
+        result.update({
+            'timestamp': timestamp(), 'profile_name': profile.name,
+        })
+        return result
+
+    def _update_profile(self, profile_args):
+        profile = self.endpoint(orbital_gateway.Profile, **profile_args)
+        result = profile.update()
+        result.update({
+            'timestamp': timestamp(), 'profile_name': profile.name,
+        })
+        return result
+
+    def _charge_profile(self, profile_args):
+        order = self.endpoint(orbital_gateway.Order, **profile_args)
+        return order.authorize_capture()
+
+    def _create_and_destroy_profile(self, profile_args):
+        profile = self.endpoint(orbital_gateway.Profile, **profile_args)
+        result = profile.create()
+        profile = self.endpoint(
+            orbital_gateway.Profile, customer_ref_num=result['CustomerRefNum']
+        )
+        return profile.destroy()
+
+    def _created_profiles(self):
+        """
+        Copies of the section G profiles that were created, for the
+        sections using them to not see each other's changes.
+        """
+        return [dict(p) for p in self.section_g_results if p]
 
     def section_a(self):
         """SECTION A: Authorization for Account Verification Testing"""
         for line, profile in enumerate(deepcopy(td.TEST_PROFILES), 1):
-            oid = six.next(self.order_sequence)
-            profile['order_id'] = oid
-            order = orbital_gateway.Order(**profile)
-            result = order.authorize()
-            result.update(mop_lookup(order))
-            result.update({'amount': order.amount, 'cvv': order.cvv})
-            yield line, result
+            profile['order_id'] = self.next_order_id()
+            yield line, partial(self._authorize, profile)
 
     def section_b(self):
         """SECTION B: Authorization Testing"""
         for line, profile in enumerate(deepcopy(td.TEST_PROFILES), 1):
-            oid = six.next(self.order_sequence)
-            customer_id = six.next(self.customer_sequence)
-            profile['order_id'] = oid
+            profile['order_id'] = self.next_order_id()
             profile['amount'] = "100.00"
-            profile['customer_ref_num'] = customer_id
-            order = orbital_gateway.Order(**profile)
-            result = order.authorize()
-            result.update(mop_lookup(order))
-            result.update({'amount': order.amount, 'cvv': order.cvv})
-
-            # add detail to section_b_results for later tests
-            txn_ref_num = result.get('TxRefNum')
-            if txn_ref_num:
-                self.section_b_results.append({
-                    'mop': result['MOP'],
-                    'tx_ref_num': txn_ref_num,
-                    'amount': profile['amount'],
-                    'order_id': oid
-                })
-            yield line, result
+            profile['customer_ref_num'] = self.next_customer_id()
+            txn = {}
+            self.section_b_results.append(txn)
+            yield line, partial(self._authorize_for_capture, profile, txn)
 
     def section_c(self):
         """SECTION C: Capture Testing"""
-        for line, txn in enumerate(self.section_b_results, 1):
-            capture = orbital_gateway.MarkForCapture(**txn)
-            result = capture.request()
-            yield line, result
+        txns = [txn for txn in self.section_b_results if txn]
+        for line, txn in enumerate(txns, 1):
+            capture = self.endpoint(orbital_gateway.MarkForCapture, **txn)
+            yield line, capture.request
 
     def section_d(self):
         """SECTION D: Auth/Capture Testing"""
         for line, profile in enumerate(deepcopy(td.TEST_PROFILES), 1):
-            oid = six.next(self.order_sequence)
-            customer_id = six.next(self.customer_sequence)
-            profile['order_id'] = oid
+            profile['order_id'] = self.next_order_id()
             profile['amount'] = "100.00"
-            profile['customer_ref_num'] = customer_id
-            order = orbital_gateway.Order(**profile)
-            result = order.authorize_capture()
-            result.update(mop_lookup(order))
-            result.update({'amount': order.amount, 'cvv': order.cvv})
-            yield line, result
+            profile['customer_ref_num'] = self.next_customer_id()
+            yield line, partial(self._authorize, profile, capture=True)
 
     def section_e_1(self):
         """SECTION E1: Refund Testing using a TxnRefNum"""
         for line, profile in enumerate(deepcopy(td.TEST_PROFILES), 1):
-            oid = six.next(self.order_sequence)
-            customer_id = six.next(self.customer_sequence)
-            profile['order_id'] = oid
+            profile['order_id'] = self.next_order_id()
+            customer_id = self.next_customer_id()
             profile['amount'] = "10.00"
-            order = orbital_gateway.Order(**profile)
-            auth_response = order.authorize()
-            refund_args = {
-                'tx_ref_num': auth_response['TxRefNum'],
-                'order_id': oid,
-                'amount': profile['amount'],
-                'customer_ref_num': customer_id,
-            }
-            refund = orbital_gateway.Order(**refund_args)
-            result = refund.refund()
-            result.update(mop_lookup(order))
-            result.update({'amount': order.amount, 'cvv': order.cvv})
-            yield line, result
+            yield line, partial(
+                self._refund_by_tx_ref_num, profile, customer_id
+            )
 
     def section_e_2(self):
         """SECTION E2: Refund Testing using a Credit Card Number"""
         for line, profile in enumerate(deepcopy(td.TEST_PROFILES), 1):
             if not profile.get('card_type') == "EC":
-                oid = six.next(self.order_sequence)
-                customer_id = six.next(self.customer_sequence)
-                profile['order_id'] = oid
+                profile['order_id'] = self.next_order_id()
                 profile['amount'] = "10.00"
-                profile['customer_ref_num'] = customer_id
-                order = orbital_gateway.Order(**profile)
-                order.authorize()
-                refund = orbital_gateway.Order(**profile)
-                result = refund.refund()
-                result.update(mop_lookup(order))
-                result.update({'amount': order.amount, 'cvv': order.cvv})
-                yield line, result
+                profile['customer_ref_num'] = self.next_customer_id()
+                yield line, partial(self._refund_by_card, profile)
 
     def section_f(self):
         """SECTION F: Authorization to Void/Reversal Testing"""
         for line, profile in enumerate(deepcopy(td.TEST_PROFILES), 1):
-            oid = six.next(self.order_sequence)
-            customer_id = six.next(self.customer_sequence)
-            profile['order_id'] = oid
+            profile['order_id'] = self.next_order_id()
             profile['amount'] = "10.00"
-            profile['customer_ref_num'] = customer_id
-            order = orbital_gateway.Order(**profile)
-            auth_response = order.authorize()
-            void_args = {
-                'tx_ref_num': auth_response['TxRefNum'],
-                'tx_ref_idx': '0',
-                'order_id': oid,
-                'amount': profile['amount'],
-            }
-            reversal = orbital_gateway.Reversal(**void_args)
-            if order.reversal:
-                response = reversal.reversal()
-            else:
-                response = reversal.void()
-            response.update(mop_lookup(order))
-            response['amount'] = order.amount
-            yield line, response
+            profile['customer_ref_num'] = self.next_customer_id()
+            yield line, partial(self._void, profile)
 
     def section_g(self):
         """SECTION G: Create a Customer Profile Testing"""
         for line, profile_args in enumerate(deepcopy(td.TEST_PROFILES), 1):
-            profile = orbital_gateway.Profile(**profile_args)
-            result = profile.create()
-            self.section_g_results.append({
-                'name': result['CustomerName'],
-                'customer_ref_num': result['CustomerRefNum'],
-                'amount': profile_args['amount'],
-            })
-            result.update({
-                'timestamp': timestamp(), 'profile_name': profile.name,
-            })
-            yield line, result
+            created = {}
+            self.section_g_results.append(created)
+            yield line, partial(self._create_profile, profile_args, created)
 
     def section_h(self):
         """SECTION H: Update a Customer Profile Testing"""
-        for line, profile_args in enumerate(self.section_g_results, 1):
-            profile = orbital_gateway.Profile(**profile_args)
-            result = profile.update()
-            result.update({
-                'timestamp': timestamp(), 'profile_name': profile.name,
-            })
-            yield line, result
+        for line, profile_args in enumerate(self._created_profiles(), 1):
+            yield line, partial(self._update_profile, profile_args)
 
     def section_i(self):
         """SECTION I: Using a Customer Profile Testing"""
-        for line, profile_args in enumerate(self.section_g_results, 1):
+        for line, profile_args in enumerate(self._created_profiles(), 1):
             profile_args['amount'] = "10.00"
             profile_args['customer_num'] = profile_args.pop('customer_ref_num')
-            profile_args['order_id'] = six.next(self.order_sequence)
-            order = orbital_gateway.Order(**profile_args)
-            result = order.authorize_capture()
-            yield line, result
+            profile_args['order_id'] = self.next_order_id()
+            yield line, partial(self._charge_profile, profile_args)
 
     def section_j(self):
         """SECTION J: Delete Customer Profile Testing"""
         for line, profile_args in enumerate(deepcopy(td.TEST_PROFILES), 1):
-            profile = orbital_gateway.Profile(**profile_args)
-            result = profile.create()
-            customer_ref_num = result['CustomerRefNum']
-            name = result['CustomerName']
-            profile = orbital_gateway.Profile(customer_ref_num=customer_ref_num)
-            destroy_response = profile.destroy()
-            yield line, destroy_response
+            yield line, partial(self._create_and_destroy_profile, profile_args)
 
     def section_k(self):
         """SECTION K: Negative Testing"""
@@ -254,34 +378,39 @@ class Certification(object):
             "999.00",  # Visa
         ]
         profiles = [
-            i for i in self.section_g_results
+            i for i in self._created_profiles()
             if 'echeck' not in i['name'].lower()
         ]
         for d, c in zip(profiles, charges):
             d['amount'] = c
 
         for line, profile_args in enumerate(profiles, 1):
-            profile_args['order_id'] = six.next(self.order_sequence)
-            order = orbital_gateway.Order(**profile_args)
-            response = order.authorize_capture()
-            yield line, response
+            profile_args['customer_num'] = profile_args.pop('customer_ref_num')
+            profile_args['order_id'] = self.next_order_id()
+            yield line, partial(self._charge_profile, profile_args)
 
     def failover(self):
         """5.11 Failover Testing Test Cases"""
         for line, profile in enumerate(deepcopy(td.TEST_PROFILES), 1):
             if not profile.get('card_type') == "EC":
-                oid = six.next(self.order_sequence)
-                profile['order_id'] = oid
+                profile['order_id'] = self.next_order_id()
                 profile['amount'] = "105.00"
                 profile['url'] = 'https://bad-url'
-                order = orbital_gateway.Order(**profile)
-                result = order.authorize()
-                result.update(mop_lookup(order))
-                result.update({'amount': order.amount, 'cvv': order.cvv})
-                yield line, result
+                yield line, partial(self._authorize, profile)
 
 
-if __name__ == '__main__':
-    c = Certification()
-    c.run_all()
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Run the Orbital certification sections.'
+    )
+    parser.add_argument('--output', default='results.txt')
+    parser.add_argument('--parallelism', type=int, default=1,
+                        help='requests in flight at once')
+    args = parser.parse_args(argv)
+    timings = Certification().run_all(args.output, args.parallelism)
+    for name, seconds in timings.items():
+        print('%-12s %8.2fs' % (name, seconds))
 
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import asyncio
+import unittest
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from ..orbital_gateway import Order
+from .fake_orbital import FakeOrbitalServer
+
+if aiohttp is not None:
+    from ..aio import AsyncMarkForCapture, AsyncOrder, AsyncTransport
+
+ORDER = {
+    'merchant_id': '1234',
+    'order_id': '946033583',
+    'amount': '10.00',
+    'cc_num': '4112344112344113',
+    'cvv': '411',
+}
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+@unittest.skipIf(aiohttp is None, 'aiohttp is not installed')
+class TestAsyncEndpoints(unittest.TestCase):
+    def test_matches_sync_path(self):
+        async def authorize(url):
+            async with AsyncTransport() as transport:
+                order = AsyncOrder(url=url, transport=transport, **ORDER)
+                return await order.authorize()
+
+        with FakeOrbitalServer() as server:
+            result = run(authorize(server.url))
+            expected = Order(url=server.url, **ORDER).authorize()
+            (async_headers, async_body), (sync_headers, sync_body) = (
+                server.requests
+            )
+        self.assertEqual(result, expected)
+        self.assertEqual(result['ProcStatus'], '0')
+        self.assertEqual(async_body, sync_body)
+
+    def test_failover_to_url2(self):
+        async def capture(url2):
+            async with AsyncTransport(connect_timeout=1) as transport:
+                capture = AsyncMarkForCapture(
+                    url='http://127.0.0.1:1/authorize', url2=url2,
+                    transport=transport, order_id='1', amount='1.00',
+                    tx_ref_num='ABC',
+                )
+                return await capture.request()
+
+        with FakeOrbitalServer() as server:
+            result = run(capture(server.url))
+        self.assertEqual(result['ApprovalStatus'], '1')
+
+    def test_concurrency_cap(self):
+        async def authorize_many(url):
+            async with AsyncTransport(max_concurrency=3) as transport:
+                return await asyncio.gather(*[
+                    AsyncOrder(url=url, transport=transport, **ORDER).authorize()
+                    for i in range(12)
+                ])
+
+        with FakeOrbitalServer(delay=0.05) as server:
+            results = run(authorize_many(server.url))
+            self.assertEqual(server.max_in_flight, 3)
+        self.assertEqual(len(results), 12)
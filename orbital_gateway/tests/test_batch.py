@@ -0,0 +1,87 @@
+import time
+import unittest
+
+from ..batch import BatchRunner, DECLINED, FAILED, SUCCESS
+from ..money import InvalidAmount
+from .fake_orbital import FakeOrbitalServer, NEW_ORDER_RESPONSE
+
+DECLINE_RESPONSE = NEW_ORDER_RESPONSE.replace(
+    '<ApprovalStatus>1</ApprovalStatus>', '<ApprovalStatus>0</ApprovalStatus>'
+)
+
+
+def captures(count, pulled=None):
+    for i in range(count):
+        if pulled is not None:
+            pulled.append(i)
+        yield {
+            'action': 'capture', 'order_id': str(i), 'amount': '1.00',
+            'tx_ref_num': 'ABC%d' % i,
+        }
+
+
+class TestBatchRunner(unittest.TestCase):
+    def test_streams_results_and_summary(self):
+        def respond(body):
+            if b'<OrderID>3</OrderID>' in body:
+                return DECLINE_RESPONSE
+            return NEW_ORDER_RESPONSE
+
+        with FakeOrbitalServer(body=respond) as server:
+            runner = BatchRunner(workers=4, endpoint_kwargs={'url': server.url})
+            results = list(runner.run(captures(20)))
+        self.assertEqual(len(results), 20)
+        self.assertEqual(
+            [r.spec['order_id'] for r in results if r.status == DECLINED], ['3']
+        )
+        self.assertEqual(runner.summary.succeeded, 19)
+        self.assertEqual(runner.summary.declined, 1)
+        self.assertEqual(runner.summary.failed, 0)
+
+    def test_transport_failure(self):
+        runner = BatchRunner(workers=2, endpoint_kwargs={
+            'url': 'http://127.0.0.1:1/authorize',
+            'url2': 'http://127.0.0.1:1/authorize',
+        })
+        summary = runner.submit([
+            {'action': 'void', 'tx_ref_num': 'ABC', 'order_id': '1'},
+        ])
+        self.assertEqual(summary.failed, 1)
+
+    def test_unknown_action_fails(self):
+        result, = BatchRunner().run([{'action': 'nope'}])
+        self.assertEqual(result.status, FAILED)
+        self.assertIsInstance(result.error, KeyError)
+
+    def test_backpressure(self):
+        pulled = []
+        with FakeOrbitalServer() as server:
+            runner = BatchRunner(
+                workers=2, max_pending=3, endpoint_kwargs={'url': server.url}
+            )
+            for yielded, result in enumerate(runner.run(captures(30, pulled)), 1):
+                self.assertEqual(result.status, SUCCESS)
+                self.assertLessEqual(len(pulled), yielded + 3)
+
+    def test_rate_limit_per_merchant(self):
+        with FakeOrbitalServer() as server:
+            runner = BatchRunner(workers=8, rate_limit=20, burst=1,
+                                 endpoint_kwargs={'url': server.url})
+            start = time.time()
+            runner.submit(captures(10))
+            elapsed = time.time() - start
+        self.assertGreaterEqual(elapsed, 0.4)
+        self.assertEqual(runner.summary.succeeded, 10)
+
+    def test_invalid_amount_is_not_sent(self):
+        with FakeOrbitalServer() as server:
+            runner = BatchRunner(workers=2, endpoint_kwargs={'url': server.url})
+            specs = list(captures(3))
+            specs[1]['amount'] = '1.005'
+            results = sorted(runner.run(specs),
+                             key=lambda r: r.spec['order_id'])
+        self.assertEqual([r.status for r in results],
+                         [SUCCESS, FAILED, SUCCESS])
+        self.assertIsInstance(results[1].error, InvalidAmount)
+        self.assertEqual(results[1].spec['amount'], '1.005')
+        self.assertEqual(list(runner._amounts), ['1.00'])
@@ -0,0 +1,120 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from ..batch import FAILED, SUCCESS
+from ..bulk import ProfileImporter, export_profiles, read_rows, write_rows
+from ..simulator import OrbitalSimulator, SimulatorTransport
+from .orbital_gateway_test_data import VISA_LOOKUP
+
+
+def customer_rows(count):
+    for i in range(count):
+        yield {
+            'id': 'c-%d' % i, 'name': u'Customer %d' % i,
+            'address1': u'%d Main St / Apt 2' % i, 'city': u'Bedford',
+            'state': u'NH', 'zip_code': u'03109-1234',
+            'phone': u'(603) 555-1234', 'cc_num': VISA_LOOKUP['cc_num'],
+            'cc_expiry': u'1230',
+        }
+
+
+class Interrupted(Exception):
+    pass
+
+
+def interrupted(rows, after):
+    for i, row in enumerate(rows):
+        if i == after:
+            raise Interrupted()
+        yield row
+
+
+class TestProfileImport(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.results = os.path.join(self.directory, 'results.jsonl')
+        self.simulator = OrbitalSimulator(seed=1)
+        self.endpoint_kwargs = {
+            'merchant_id': '1234', 'url': 'sim://primary',
+            'transport': SimulatorTransport(self.simulator),
+        }
+
+    def importer(self, **kwargs):
+        return ProfileImporter(
+            self.results, workers=4, endpoint_kwargs=self.endpoint_kwargs,
+            checkpoint_every=3, **kwargs
+        )
+
+    def results_by_id(self):
+        return dict(
+            (result['id'], result) for result in read_rows(self.results)
+        )
+
+    def test_import(self):
+        rows = list(customer_rows(20))
+        rows[5]['cc_num'] = '4112344112344114'
+        summary = self.importer(chunk_size=8).run(rows)
+        self.assertEqual((summary.succeeded, summary.failed), (19, 1))
+        results = self.results_by_id()
+        self.assertEqual(len(results), 20)
+        self.assertEqual(results['c-5']['status'], FAILED)
+        self.assertIn('Luhn', results['c-5']['error'])
+        ref = results['c-0']['customer_ref_num']
+        self.assertEqual(results['c-0']['status'], SUCCESS)
+        profile = self.simulator.profiles[ref]
+        self.assertEqual(profile['CustomerAddress1'], u'0 Main St  Apt 2')
+        self.assertEqual(len(self.simulator.profiles), 19)
+
+    def test_resume(self):
+        with self.assertRaises(Interrupted):
+            self.importer(chunk_size=4).run(
+                interrupted(customer_rows(30), 17)
+            )
+        created = len(self.simulator.profiles)
+        self.assertGreater(created, 0)
+        self.importer().run(customer_rows(30))
+        results = list(read_rows(self.results))
+        self.assertEqual(sorted(result['row'] for result in results),
+                         list(range(30)))
+        self.assertEqual(len(self.simulator.profiles), 30)
+        with io.open(self.results + '.checkpoint') as f:
+            self.assertEqual(json.load(f), {'completed': 30})
+
+    def test_finished_import_sends_nothing(self):
+        self.importer().run(customer_rows(5))
+        summary = self.importer().run(customer_rows(5))
+        self.assertEqual(summary.total, 0)
+        self.assertEqual(len(self.simulator.profiles), 5)
+
+    def test_export(self):
+        self.importer().run(customer_rows(4))
+        refs = [r['customer_ref_num'] for r in read_rows(self.results)]
+        results = list(export_profiles(
+            refs + ['missing'], workers=2,
+            endpoint_kwargs=self.endpoint_kwargs,
+        ))
+        read = dict(
+            (r.spec['customer_ref_num'], r) for r in results
+        )
+        self.assertEqual(read['missing'].status, 'declined')
+        profile = read[refs[0]].response
+        self.assertEqual(profile['CCAccountNum'], '411234XXXXXX4113')
+        self.assertEqual(profile['CustomerCity'], 'Bedford')
+
+    def test_csv_round_trip(self):
+        path = os.path.join(self.directory, 'customers.csv')
+        rows = list(customer_rows(3))
+        self.assertEqual(write_rows(path, rows), 3)
+        self.assertEqual([dict(row) for row in read_rows(path)], rows)
+
+    def test_round_trip_keeps_text(self):
+        rows = [{u'id': u'c-1', u'name': u'Zo\xeb', u'city': u'Montr\xe9al'}]
+        for name in ('customers.csv', 'customers.jsonl'):
+            path = os.path.join(self.directory, name)
+            write_rows(path, rows)
+            self.assertEqual([dict(row) for row in read_rows(path)], rows)
@@ -0,0 +1,125 @@
+import unittest
+
+from .. import config
+from ..cache import MemoryCache, ProfileCache, mask_number
+from ..health import EndpointHealth
+from ..orbital_gateway import Profile
+from ..simulator import OrbitalSimulator, SimulatorTransport
+from .orbital_gateway_test_data import VISA_LOOKUP
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestMemoryCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = MemoryCache(max_entries=2)
+        cache.set('a', {'x': '1'}, 60)
+        cache.set('b', {'x': '2'}, 60)
+        cache.get('a')
+        cache.set('c', {'x': '3'}, 60)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), {'x': '1'})
+        self.assertEqual(len(cache), 2)
+
+    def test_expiry(self):
+        clock = FakeClock()
+        cache = MemoryCache(clock=clock)
+        cache.set('a', {'x': '1'}, 10)
+        clock.now += 9
+        self.assertIsNotNone(cache.get('a'))
+        clock.now += 1
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+
+
+class TestMasking(unittest.TestCase):
+    def test_mask_number(self):
+        self.assertEqual(mask_number('4112344112344113', 6), '411234XXXXXX4113')
+        self.assertEqual(mask_number('123456789'), 'XXXXX6789')
+        self.assertEqual(mask_number('1234', 6), 'XXX4')
+        self.assertEqual(mask_number(None), None)
+
+
+class TestProfileCache(unittest.TestCase):
+    def setUp(self):
+        self.simulator = OrbitalSimulator(seed=1)
+        self.cache = ProfileCache(ttl=60)
+        self.kwargs = {
+            'url': 'sim://primary', 'merchant_id': '1234',
+            'transport': SimulatorTransport(self.simulator),
+            'health': EndpointHealth(), 'cache': self.cache,
+        }
+        created = Profile(**dict(VISA_LOOKUP, **self.kwargs)).create()
+        self.customer_ref_num = created['CustomerRefNum']
+
+    def profile(self, **kwargs):
+        kwargs.update(self.kwargs)
+        return Profile(customer_ref_num=self.customer_ref_num, **kwargs)
+
+    def test_read_through(self):
+        first = self.profile().read()
+        requests = self.simulator.requests
+        second = self.profile().read()
+        self.assertEqual(self.simulator.requests, requests)
+        self.assertEqual(first, second)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_account_number_is_masked(self):
+        cc_num = VISA_LOOKUP['cc_num']
+        for values in (self.profile().read(), self.profile().read()):
+            self.assertEqual(
+                values['CCAccountNum'], cc_num[:6] + 'XXXXXX' + cc_num[-4:]
+            )
+        stored = self.cache.backend.get(
+            self.cache.key('1234', self.customer_ref_num)
+        )
+        self.assertNotIn(cc_num, repr(stored))
+
+    def test_callers_get_copies(self):
+        self.profile().read()['CustomerName'] = 'changed'
+        self.assertNotEqual(self.profile().read()['CustomerName'], 'changed')
+
+    def test_update_invalidates(self):
+        self.profile().read()
+        self.profile(name='New Name').update()
+        values = self.profile().read()
+        self.assertEqual(values['CustomerName'], 'New Name')
+
+    def test_destroy_invalidates(self):
+        self.profile().read()
+        self.profile().destroy()
+        values = self.profile().read()
+        self.assertEqual(
+            values['ProfileProcStatus'], config.PROCSTATUS_USER_NOT_FOUND
+        )
+        self.assertIsNone(self.cache.get('1234', self.customer_ref_num))
+
+    def test_read_racing_an_update_is_not_stored(self):
+        cache = self.cache
+        customer_ref_num = self.customer_ref_num
+
+        class UpdatedWhileReading(SimulatorTransport):
+            def post(self, url, data, headers, timeout=None):
+                response = super(UpdatedWhileReading, self).post(
+                    url, data, headers, timeout
+                )
+                # an update() finishing while the read is on the wire
+                cache.invalidate('1234', customer_ref_num)
+                return response
+
+        Profile(customer_ref_num=customer_ref_num, **dict(
+            self.kwargs, transport=UpdatedWhileReading(self.simulator)
+        )).read()
+        self.assertIsNone(self.cache.get('1234', self.customer_ref_num))
+        self.profile().read()
+        self.assertIsNotNone(self.cache.get('1234', self.customer_ref_num))
+
+    def test_keyed_by_merchant(self):
+        self.profile().read()
+        self.assertIsNone(self.cache.get('5678', self.customer_ref_num))
@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from .. import cards, config
+from ..cards import BinIndex, BinRange, luhn_valid
+from ..context import MerchantContext
+from ..orbital_gateway import Order
+
+
+class TestBinIndex(unittest.TestCase):
+    def assertBrand(self, number, brand):
+        info = cards.lookup(number)
+        self.assertEqual(info.brand if info else None, brand, number)
+
+    def test_brands(self):
+        for number, brand in [
+            ('4112344112344113', config.CARD_TYPE_VISA),
+            ('5454545454545454', config.CARD_TYPE_MC),
+            ('2221000000000009', config.CARD_TYPE_MC),
+            ('2720990000000007', config.CARD_TYPE_MC),
+            ('371449635398431', config.CARD_TYPE_AMEX),
+            ('6011000995500000', config.CARD_TYPE_DISCOVER),
+            ('6445644564456445', config.CARD_TYPE_DISCOVER),
+            ('6221260000000000', config.CARD_TYPE_DISCOVER),
+            ('3566002020140006', config.CARD_TYPE_JCB),
+            ('180000000000002', config.CARD_TYPE_JCB),
+            ('30569309025904', config.CARD_TYPE_DINERS),
+            ('38520000023237', config.CARD_TYPE_DINERS),
+            ('6250941006528599', config.CARD_TYPE_UNIONPAY),
+            ('8171999927660000', config.CARD_TYPE_UNIONPAY),
+        ]:
+            self.assertBrand(number, brand)
+
+    def test_unknown(self):
+        for number in ('', None, '2220990000000000', '2721000000000000',
+                       '9999999999999999', 'XXXX', '3', '81'):
+            self.assertBrand(number, None)
+
+    def test_short_prefixes(self):
+        self.assertBrand('4', config.CARD_TYPE_VISA)
+        self.assertBrand('35', config.CARD_TYPE_JCB)
+        self.assertBrand('6011', config.CARD_TYPE_DISCOVER)
+
+    def test_validity(self):
+        info = cards.lookup('4112344112344113')
+        self.assertTrue(info.valid)
+        self.assertEqual(info.lengths, (13, 16, 19))
+        info = cards.lookup('4112344112344114')
+        self.assertFalse(info.luhn_valid)
+        self.assertTrue(info.length_valid)
+        info = cards.lookup('37144963539843')
+        self.assertFalse(info.length_valid)
+
+    def test_luhn(self):
+        self.assertTrue(luhn_valid('79927398713'))
+        self.assertFalse(luhn_valid('79927398710'))
+        self.assertFalse(luhn_valid('7992 7398 713'))
+        self.assertFalse(luhn_valid(''))
+
+    def test_narrowest_range_wins(self):
+        index = BinIndex([
+            BinRange('6', '6', 'Wide', [16]),
+            BinRange('6200', '6299', 'Narrow', [16]),
+        ])
+        self.assertEqual(index.lookup('6199000000000000').brand, 'Wide')
+        self.assertEqual(index.lookup('6250000000000000').brand, 'Narrow')
+        self.assertEqual(index.lookup('6300000000000000').brand, 'Wide')
+        self.assertIsNone(index.lookup('7000000000000000'))
+
+    def test_load(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'ranges.csv')
+        with open(path, 'w') as f:
+            f.write('# test table\n9,9,Private,16  # house cards\n')
+        index = BinIndex.load(path)
+        self.assertEqual(index.lookup('9000000000000000').brand, 'Private')
+        with open(path, 'w') as f:
+            f.write('9,99,Private,16\n')
+        with self.assertRaises(ValueError):
+            BinIndex.load(path)
+
+
+class TestEndpointCardType(unittest.TestCase):
+    def test_follows_card_number(self):
+        order = Order(cc_num='4112344112344113')
+        self.assertEqual(order.card_type, config.CARD_TYPE_VISA)
+        self.assertIs(order.card_info, order.card_info)
+        order.cc_num = '2221000000000009'
+        self.assertEqual(order.card_type, config.CARD_TYPE_MC)
+        order.cc_num = ''
+        self.assertIsNone(order.card_type)
+
+    def test_context_order(self):
+        context = MerchantContext(merchant_id='1234', url='sim://primary')
+        order = context.order(cc_num='30569309025904')
+        self.assertEqual(order.card_type, config.CARD_TYPE_DINERS)
@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from ..cassette import (
+    Cassette, CassetteMiss, RecordingTransport, ReplayTransport, request_key,
+    write_cassette,
+)
+from ..orbital_gateway import Order, Profile
+from ..simulator import OrbitalSimulator, SimulatorTransport
+from .orbital_gateway_test_data import VISA_LOOKUP
+
+URL = 'sim://primary'
+
+
+class TestCassette(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.path = os.path.join(self.tmp, 'test.cassette')
+
+    def order(self, transport, **kwargs):
+        params = dict(VISA_LOOKUP, url=URL, transport=transport,
+                      merchant_id='1234', order_id='1')
+        params.update(kwargs)
+        return Order(**params)
+
+    def test_request_key(self):
+        self.assertEqual(
+            request_key(URL, b'<A>\n  <OrbitalConnectionPassword>x</'
+                             b'OrbitalConnectionPassword>\n</A>'),
+            request_key(URL, u'<A><OrbitalConnectionPassword>y</'
+                             u'OrbitalConnectionPassword></A>'),
+        )
+        self.assertNotEqual(request_key(URL, u'<A>1</A>'),
+                            request_key(URL, u'<A>2</A>'))
+        self.assertNotEqual(request_key(URL, u'<A/>'),
+                            request_key('sim://backup', u'<A/>'))
+
+    def test_lookup(self):
+        write_cassette(self.path, [
+            (URL, u'<A/>', 200, u'first'),
+            (URL, u'<B/>', 500, u'error'),
+            (URL, u'<A/>', 200, u'second \xe9'),
+        ])
+        with Cassette(self.path) as cassette:
+            self.assertEqual(len(cassette), 3)
+            key = request_key(URL, u'<A/>')
+            self.assertEqual(cassette.find(key), (200, u'first'))
+            self.assertEqual(cassette.find(key, 1), (200, u'second \xe9'))
+            self.assertIsNone(cassette.find(key, 2))
+            self.assertEqual(cassette.find(key, 5, repeat=True),
+                             (200, u'second \xe9'))
+            self.assertEqual(
+                cassette.find(request_key(URL, u'<B/>')), (500, u'error')
+            )
+            self.assertIsNone(cassette.find(request_key(URL, u'<C/>')))
+            self.assertIsNone(
+                cassette.find(request_key(URL, u'<C/>'), 1, repeat=True)
+            )
+
+    def test_not_a_cassette(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'interactions: []\n')
+        with self.assertRaises(ValueError):
+            Cassette(self.path)
+
+    def test_record_and_replay(self):
+        simulator = OrbitalSimulator(seed=1)
+        with RecordingTransport(
+            SimulatorTransport(simulator), self.path
+        ) as recorder:
+            recorded = [
+                self.order(recorder, order_id=str(i)).authorize()
+                for i in range(5)
+            ]
+            profile = Profile(url=URL, transport=recorder, merchant_id='1234',
+                              **VISA_LOOKUP).create()
+            read = Profile(url=URL, transport=recorder, merchant_id='1234',
+                           customer_ref_num=profile['CustomerRefNum'])
+            recorded.append(read.read())
+            recorded.append(read.read())
+
+        replay = ReplayTransport(self.path)
+        self.addCleanup(replay.close)
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            replayed = list(pool.map(
+                lambda i: self.order(replay, order_id=str(i)).authorize(),
+                reversed(range(5)),
+            ))
+        self.assertEqual(replayed[::-1], recorded[:5])
+        read = Profile(url=URL, transport=replay, merchant_id='1234',
+                       customer_ref_num=profile['CustomerRefNum'])
+        self.assertEqual(read.read(), recorded[5])
+        self.assertEqual(read.read(), recorded[6])
+        with self.assertRaises(CassetteMiss):
+            read.read()
+        self.assertEqual(simulator.requests, 8)
@@ -1,13 +1,12 @@
+import csv
 import os
+import shutil
+import tempfile
 import unittest
 
-from six import add_move, MovedModule
-add_move(MovedModule('test_support', 'test.test_support', 'test.support'))
-from six.moves import test_support
-import vcr
-
-from ..orbital_gateway import Order, Profile, Reversal
-from .live_orbital_gateway_certification import Certification
+from ..cassette import ReplayTransport
+from ..simulator import OrbitalSimulator, SimulatorTransport, fixed
+from .live_orbital_gateway_certification import SECTIONS, Certification
 
 
 TEST_DATA_DIR = os.path.dirname(__file__)
@@ -20,25 +19,125 @@ def create_sequence(current_value):
         current_value += 1
 
 
+def read_results(path):
+    with open(path) as f:
+        return list(csv.reader(f))
+
+
 class TestProfileFunctions(unittest.TestCase):
     def setUp(self):
         # setup test env vars
-        self.env = test_support.EnvironmentVarGuard()
-        self.env.set('ORBITAL_PASSWORD', 'potato')
-        self.env.set('ORBITAL_MERCHANT_ID', '1234')
-        self.env.set('ORBITAL_USERNAME', 'yeah')
+        environ = dict(os.environ)
+        self.addCleanup(os.environ.update, environ)
+        self.addCleanup(os.environ.clear)
+        os.environ.update({
+            'ORBITAL_PASSWORD': 'potato',
+            'ORBITAL_MERCHANT_ID': '1234',
+            'ORBITAL_USERNAME': 'yeah',
+            'ENDPOINT_URL_1': 'https://orbitalvar1.chasepaymentech.com/authorize',
+            'ENDPOINT_URL_2': 'https://orbitalvar2.chasepaymentech.com/authorize',
+        })
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.cassette = os.path.join(
+            TEST_DATA_DIR, 'certification_requests.cassette'
+        )
 
-        self.c = Certification(
+    def run_all(self, parallelism=1):
+        transport = ReplayTransport(self.cassette)
+        self.addCleanup(transport.close)
+        c = Certification(
             # these just happened to be the unique sequence at the time of the
-            # vcrpy recording
+            # recording
             customer_sequence=create_sequence(653048486),
             order_sequence=create_sequence(946033583),
+            endpoint_kwargs={'transport': transport},
         )
-        self.cassette = os.path.join(
-            TEST_DATA_DIR, 'certification_requests.yaml'
-        )
+        output = os.path.join(self.tmp, 'results%d.txt' % parallelism)
+        c.run_all(output, parallelism)
+        return read_results(output)
 
     def test_cassette(self):
-        with vcr.use_cassette(self.cassette):
-            self.c.run_all()
+        rows = self.run_all()
+        titles = [row for row in rows if len(row) == 1]
+        self.assertEqual(len(titles), len(SECTIONS))
+        header = None
+        for row in rows:
+            if len(row) == 1:
+                header = None
+            elif header is None:
+                header = row
+            else:
+                result = dict(zip(header, row))
+                status = result.get('ProcStatus') or result['ProfileProcStatus']
+                self.assertEqual(status, '0', result)
+
+    def test_parallel_replay(self):
+        serial = self.run_all()
+        parallel = self.run_all(parallelism=8)
+        self.assertEqual(len(parallel), len(serial))
+        header = []
+        for serial_row, parallel_row in zip(serial, parallel):
+            if len(serial_row) == 1 or not header:
+                header = serial_row if len(serial_row) > 1 else []
+            if 'timestamp' in header:
+                # profile sections stamp their results
+                i = header.index('timestamp')
+                serial_row = serial_row[:i] + serial_row[i + 1:]
+                parallel_row = parallel_row[:i] + parallel_row[i + 1:]
+            self.assertEqual(parallel_row, serial_row)
+
+
+# differ between runs of the simulator
+VOLATILE = {
+    'AuthCode', 'CustomerRefNum', 'OrderID', 'RespTime', 'TxRefNum',
+    'timestamp',
+}
+
+
+class TestCertificationRunner(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def run_all(self, parallelism):
+        simulator = OrbitalSimulator(seed=1, latency=fixed(0.002))
+        certification = Certification(
+            customer_sequence=create_sequence(653048486),
+            order_sequence=create_sequence(946033583),
+            endpoint_kwargs={
+                'url': 'sim://primary', 'merchant_id': '1234',
+                'transport': SimulatorTransport(simulator),
+            },
+        )
+        output = os.path.join(self.tmp, 'results%d.txt' % parallelism)
+        timings = certification.run_all(output, parallelism)
+        self.assertEqual(list(timings), [name for name, r in SECTIONS])
+        return read_results(output), simulator
+
+    def stable(self, rows):
+        stable = []
+        header = None
+        for row in rows:
+            if len(row) == 1:
+                header = None
+                stable.append(row)
+            elif header is None:
+                header = row
+                stable.append(row)
+            else:
+                stable.append([value for name, value in zip(header, row)
+                               if name not in VOLATILE])
+        return stable
 
+    def test_parallel_matches_serial(self):
+        serial, serial_simulator = self.run_all(1)
+        parallel, parallel_simulator = self.run_all(8)
+        self.assertEqual(self.stable(parallel), self.stable(serial))
+        self.assertEqual(parallel_simulator.requests,
+                         serial_simulator.requests)
+        self.assertEqual(serial_simulator.max_in_flight, 1)
+        self.assertGreater(parallel_simulator.max_in_flight, 1)
+        titles = [row[0] for row in serial if len(row) == 1]
+        self.assertEqual(len(titles), len(SECTIONS))
+        self.assertTrue(titles[2].startswith('SECTION C'))
@@ -0,0 +1,100 @@
+import unittest
+
+from .. import config
+from ..context import MerchantContext
+from ..health import EndpointHealth
+from ..orbital_gateway import (
+    ORDER_ATTRIBUTES, Order, remove_control_characters, sanitize_address_field,
+    sanitize_phone_field,
+)
+from ..simulator import OrbitalSimulator, SimulatorTransport
+from .orbital_gateway_test_data import VISA_LOOKUP
+
+CREDENTIALS = {
+    'merchant_id': '1234',
+    'username': 'user',
+    'password': 'secret',
+    'url': 'sim://primary',
+}
+
+ECHECK = {
+    'name': 'Test Check',
+    'card_type': config.ELECTRONIC_CHECK,
+    'routing_number': '072403004',
+    'check_account_number': '12345678',
+    'order_id': '7',
+    'amount': '12.50',
+}
+
+
+class TestMerchantContext(unittest.TestCase):
+    def setUp(self):
+        self.context = MerchantContext(**CREDENTIALS)
+
+    def assertSameRequest(self, fields):
+        order = Order(**dict(fields, **CREDENTIALS))
+        fast = self.context.order(**fields)
+        self.assertEqual(fast.render_charge(), order.render_charge())
+
+    def test_same_request_as_order(self):
+        self.assertSameRequest(dict(
+            VISA_LOOKUP, order_id='1', amount='10.5', cc_expiry='1230',
+            cvv='411', message_type=config.AUTHORIZE,
+            address1='1 Main St. / Apt 2', phone='(603) 555-1234',
+        ))
+        self.assertSameRequest(ECHECK)
+
+    def test_orders_hold_no_dict(self):
+        order = self.context.order(order_id='1', **VISA_LOOKUP)
+        order.render_charge()
+        self.assertEqual(getattr(order, '__dict__', {}), {})
+
+    def test_same_fields_as_order(self):
+        fields = dict(
+            (name, 'value %d' % index)
+            for index, (attribute, name, default) in enumerate(ORDER_ATTRIBUTES)
+        )
+        for kwargs in (fields, {}):
+            fast = self.context.order(**kwargs)
+            order = Order(**dict(kwargs, **CREDENTIALS))
+            for attribute, name, default in ORDER_ATTRIBUTES:
+                self.assertEqual(
+                    getattr(fast, attribute), getattr(order, attribute)
+                )
+
+    def test_round_trip(self):
+        simulator = OrbitalSimulator(seed=1)
+        context = MerchantContext(
+            transport=SimulatorTransport(simulator),
+            health=EndpointHealth(), **CREDENTIALS
+        )
+        first = context.order(**dict(VISA_LOOKUP, order_id='1'))
+        second = context.order(**dict(VISA_LOOKUP, order_id='2'))
+        self.assertEqual(
+            first.authorize()['ApprovalStatus'], config.APPROVAL_APPROVED
+        )
+        second.authorize()
+        self.assertNotEqual(first.trace_number, second.trace_number)
+        self.assertEqual(len(simulator.transactions), 2)
+
+    def test_pinned_trace_number(self):
+        order = self.context.order(trace_number='42', **VISA_LOOKUP)
+        self.assertEqual(order.next_trace_number(), '42')
+        self.assertTrue(order.replaying)
+        self.assertNotEqual(order.next_trace_number(), '42')
+
+
+class TestSanitizers(unittest.TestCase):
+    def test_address(self):
+        self.assertEqual(sanitize_address_field(u'a%b|c^d\\e/f'), u'abcdef')
+
+    def test_phone(self):
+        self.assertEqual(sanitize_phone_field(u'(603) 555-12.34'),
+                         u'603 5551234')
+
+    def test_control_characters(self):
+        self.assertEqual(remove_control_characters(u'plain text'),
+                         u'plain text')
+        self.assertEqual(remove_control_characters(u'a\x00b\u200bc\tw\xe9'),
+                         u'abcw\xe9')
+        self.assertEqual(remove_control_characters(5), u'5')
@@ -0,0 +1,125 @@
+import time
+import unittest
+
+from ..health import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, EndpointHealth,
+)
+from ..orbital_gateway import MarkForCapture
+from ..transport import HTTPTransport
+from .fake_orbital import FakeOrbitalServer
+
+DEAD_URL = 'http://127.0.0.1:1/authorize'
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(
+            failure_threshold=2, reset_timeout=10, clock=self.clock
+        )
+
+    def test_opens_after_threshold(self):
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_half_open_single_probe(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now += 10
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_probe_reopens(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now += 10
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow())
+
+
+class TestEndpointHealth(unittest.TestCase):
+    def test_rank_prefers_fast_closed_urls(self):
+        health = EndpointHealth()
+        health.record_success('a', 0.5)
+        health.record_success('b', 0.1)
+        self.assertEqual(health.rank(['a', 'b']), ['b', 'a'])
+        for i in range(3):
+            health.record_failure('b')
+        self.assertEqual(health.rank(['a', 'b']), ['a', 'b'])
+
+    def test_unknown_latency_keeps_configured_order(self):
+        health = EndpointHealth()
+        self.assertEqual(health.rank(['a', 'b']), ['a', 'b'])
+
+    def test_backoff_is_bounded(self):
+        health = EndpointHealth(backoff_base=0.1, backoff_cap=0.3)
+        for attempt in range(6):
+            self.assertLessEqual(health.backoff(attempt), 0.3)
+
+    def test_all_open_raises(self):
+        health = EndpointHealth(failure_threshold=1)
+        health.record_failure('a')
+        with self.assertRaises(CircuitOpenError):
+            list(health.schedule(['a']))
+
+
+class TestFailover(unittest.TestCase):
+    def setUp(self):
+        self.health = EndpointHealth(
+            failure_threshold=1, reset_timeout=0.3, backoff_base=0.01
+        )
+        self.transport = HTTPTransport(connect_timeout=0.5, read_timeout=0.2)
+
+    def capture(self, url, url2):
+        return MarkForCapture(
+            url=url, url2=url2, health=self.health, transport=self.transport,
+            order_id='1', amount='1.00', tx_ref_num='ABC',
+        )
+
+    def test_slow_primary_is_skipped_once_open(self):
+        with FakeOrbitalServer(delay=0.5) as slow, FakeOrbitalServer() as fast:
+            self.assertEqual(
+                self.capture(slow.url, fast.url).request()['ProcStatus'], '0'
+            )
+            start = time.time()
+            for i in range(5):
+                self.capture(slow.url, fast.url).request()
+            self.assertLess(time.time() - start, 0.5)
+            self.assertEqual(len(slow.requests), 1)
+            self.assertEqual(len(fast.requests), 6)
+
+    def test_half_open_probe_recovers_primary(self):
+        with FakeOrbitalServer() as primary, FakeOrbitalServer() as backup:
+            primary.status = 500
+            self.capture(primary.url, backup.url).request()
+            self.assertEqual(self.health.breaker(primary.url).state, OPEN)
+            primary.status = 200
+            time.sleep(0.3)
+            self.capture(primary.url, backup.url).request()
+            self.assertEqual(self.health.breaker(primary.url).state, CLOSED)
+            self.assertEqual(len(primary.requests), 2)
+
+    def test_both_dead(self):
+        with FakeOrbitalServer() as server:
+            server.status = 503
+            with self.assertRaises(Exception):
+                self.capture(DEAD_URL, server.url).request()
+            with self.assertRaises(CircuitOpenError):
+                self.capture(DEAD_URL, server.url).request()
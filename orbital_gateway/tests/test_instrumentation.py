@@ -0,0 +1,135 @@
+import unittest
+
+from .. import instrumentation
+from ..health import EndpointHealth
+from ..orbital_gateway import MarkForCapture
+from ..transport import HTTPTransport
+from .fake_orbital import FakeOrbitalServer
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.timings = []
+        self.health = EndpointHealth(backoff_base=0.01)
+        self.transport = HTTPTransport()
+
+    def tearDown(self):
+        self.transport.close()
+
+    def capture(self, *urls, **kwargs):
+        kwargs.setdefault('observers', [self.timings.append])
+        return MarkForCapture(
+            url=urls[0], url2=urls[1] if len(urls) > 1 else None,
+            health=self.health, transport=self.transport,
+            order_id='1', amount='1.00', tx_ref_num='ABC', **kwargs
+        )
+
+    def test_timing_breakdown(self):
+        with FakeOrbitalServer() as server:
+            self.capture(server.url).request()
+        timing, = self.timings
+        self.assertEqual(timing.endpoint, 'MarkForCapture')
+        self.assertEqual(timing.operation, 'request')
+        self.assertEqual(timing.proc_status, '0')
+        self.assertEqual(timing.url, server.url)
+        self.assertEqual(timing.retries, 0)
+        self.assertFalse(timing.failover)
+        self.assertGreater(timing.render, 0)
+        self.assertGreater(timing.connect, 0)
+        self.assertGreater(timing.ttfb, 0)
+        self.assertGreaterEqual(
+            timing.total, timing.render + timing.connect + timing.ttfb
+        )
+
+    def test_pooled_connection_has_no_connect_time(self):
+        with FakeOrbitalServer() as server:
+            self.capture(server.url).request()
+            self.capture(server.url).request()
+        self.assertEqual(self.timings[1].connect, 0)
+
+    def test_failover_and_retries(self):
+        with FakeOrbitalServer() as failing, FakeOrbitalServer() as backup:
+            failing.status = 500
+            self.capture(failing.url, backup.url).request()
+        timing, = self.timings
+        self.assertEqual(timing.urls, [failing.url, backup.url])
+        self.assertEqual(timing.retries, 1)
+        self.assertTrue(timing.failover)
+        self.assertEqual(timing.status, '0')
+
+    def test_first_attempt_to_url2_is_not_a_failover(self):
+        with FakeOrbitalServer() as slow, FakeOrbitalServer() as fast:
+            self.health.record_success(slow.url, 1.0)
+            self.health.record_success(fast.url, 0.001)
+            self.capture(slow.url, fast.url).request()
+        timing, = self.timings
+        self.assertEqual(timing.urls, [fast.url])
+        self.assertFalse(timing.failover)
+
+    def test_error_is_recorded(self):
+        capture = self.capture('http://127.0.0.1:1/authorize')
+        with self.assertRaises(IOError):
+            capture.request()
+        timing, = self.timings
+        self.assertEqual(timing.status, 'error')
+        self.assertIsNotNone(timing.error)
+        self.assertEqual(timing.retries, 2)
+
+    def test_global_observers(self):
+        instrumentation.add_observer(self.timings.append)
+        try:
+            with FakeOrbitalServer() as server:
+                self.capture(server.url, observers=None).request()
+        finally:
+            instrumentation.remove_observer(self.timings.append)
+        self.assertEqual(len(self.timings), 1)
+        self.assertEqual(instrumentation._observers, ())
+
+    def test_disabled_records_nothing(self):
+        with FakeOrbitalServer() as server:
+            capture = self.capture(server.url, observers=None)
+            capture.render_request()
+            self.assertIsNone(capture._render_time)
+            capture.request()
+
+    def test_failing_observer_does_not_fail_the_request(self):
+        def broken(timing):
+            raise ValueError('broken')
+        with FakeOrbitalServer() as server:
+            with self.assertLogs('orbital_gateway.instrumentation'):
+                result = self.capture(server.url, observers=[broken]).request()
+        self.assertEqual(result['ProcStatus'], '0')
+
+    def test_logging_observer(self):
+        observer = instrumentation.LoggingObserver()
+        with FakeOrbitalServer() as server:
+            with self.assertLogs('orbital_gateway.timing') as logs:
+                self.capture(server.url, observers=[observer]).request()
+        record, = logs.records
+        self.assertIn('MarkForCapture.request status=0', record.getMessage())
+        self.assertEqual(record.orbital_timing['proc_status'], '0')
+
+    @unittest.skipIf(prometheus_client is None, 'requires prometheus_client')
+    def test_prometheus_observer(self):
+        registry = prometheus_client.CollectorRegistry()
+        observer = instrumentation.PrometheusObserver(registry=registry)
+        with FakeOrbitalServer() as failing, FakeOrbitalServer() as backup:
+            failing.status = 500
+            self.capture(
+                failing.url, backup.url, observers=[observer]
+            ).request()
+        labels = {'endpoint': 'MarkForCapture', 'operation': 'request'}
+        self.assertEqual(registry.get_sample_value(
+            'orbital_transactions_total', dict(labels, status='0')
+        ), 1)
+        self.assertEqual(registry.get_sample_value(
+            'orbital_retries_total', labels
+        ), 1)
+        self.assertEqual(registry.get_sample_value(
+            'orbital_transaction_seconds_count', dict(labels, phase='total')
+        ), 1)
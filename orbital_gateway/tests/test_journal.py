@@ -0,0 +1,259 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+
+from .. import config
+from ..batch import BatchRunner
+from ..context import MerchantContext
+from ..health import EndpointHealth
+from ..journal import (
+    COMPLETED, FAILED, PENDING, REVERSED, UNRESOLVED, Journal, mask_request,
+    recover,
+)
+from ..money import Money
+from ..orbital_gateway import Order
+from ..simulator import (
+    OUTAGE_DOWN, OrbitalSimulator, SimulatorTransport,
+)
+from .orbital_gateway_test_data import VISA_LOOKUP
+
+SIM_URL = 'sim://primary'
+
+
+class LostResponseTransport(SimulatorTransport):
+    """
+    Orbital processes the request but the answer never arrives.
+    """
+    def post(self, url, data, headers, timeout=None):
+        super(LostResponseTransport, self).post(url, data, headers, timeout)
+        raise requests.exceptions.ReadTimeout('answer lost')
+
+
+class JournalTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.journal = Journal(os.path.join(self.directory, 'journal.db'))
+        self.simulator = OrbitalSimulator(seed=1)
+        self.transport = SimulatorTransport(self.simulator)
+        self.kwargs = dict(VISA_LOOKUP, **{
+            'url': SIM_URL, 'merchant_id': '1234', 'password': 'secret',
+            'order_id': '1', 'amount': '10.00', 'cvv': '411',
+            'cc_expiry': '1230',
+            'health': EndpointHealth(backoff_base=0.001),
+        })
+
+    def tearDown(self):
+        self.journal.close()
+        shutil.rmtree(self.directory)
+
+    def order(self, transport=None, **kwargs):
+        kwargs.update(self.kwargs)
+        return Order(
+            journal=self.journal, transport=transport or self.transport,
+            **kwargs
+        )
+
+    def lose_response(self):
+        order = self.order(LostResponseTransport(self.simulator))
+        with self.assertRaises(requests.exceptions.ReadTimeout):
+            order.authorize()
+        self.journal.flush()
+        entry, = self.journal.pending()
+        return entry
+
+
+class TestJournal(JournalTestCase):
+    def test_records_outcome(self):
+        result = self.order().authorize()
+        self.journal.flush()
+        entry, = self.journal.entries()
+        self.assertEqual(entry['state'], COMPLETED)
+        self.assertEqual(entry['operation'], 'charge')
+        self.assertEqual(entry['message_type'], config.AUTHORIZE)
+        self.assertEqual(entry['proc_status'], config.PROCSTATUS_SUCCESS)
+        self.assertEqual(entry['response_tx_ref_num'], result['TxRefNum'])
+        self.assertEqual(entry['trace_number'], self.simulator_traces()[0])
+
+    def simulator_traces(self):
+        return [trace for merchant, trace in self.simulator.traces]
+
+    def test_sensitive_fields_are_masked(self):
+        self.order().authorize()
+        self.journal.flush()
+        entry, = self.journal.entries()
+        self.assertNotIn(VISA_LOOKUP['cc_num'], entry['request'])
+        self.assertNotIn('secret', entry['request'])
+        self.assertIn('<AccountNum>411234XXXXXX4113</AccountNum>',
+                      entry['request'])
+        self.assertIn('<CardSecVal>XXX</CardSecVal>', entry['request'])
+
+    def test_written_before_sending(self):
+        journal = self.journal
+        seen = []
+
+        class CheckingTransport(SimulatorTransport):
+            def post(self, url, data, headers, timeout=None):
+                seen.extend(journal.pending())
+                return super(CheckingTransport, self).post(
+                    url, data, headers, timeout
+                )
+
+        self.order(CheckingTransport(self.simulator)).authorize()
+        self.assertEqual(len(seen), 1)
+        self.assertEqual(seen[0]['state'], PENDING)
+
+    def test_unsent_failure_is_not_pending(self):
+        transport = SimulatorTransport(self.simulator)
+        transport.outages[SIM_URL] = OUTAGE_DOWN
+        with self.assertRaises(IOError):
+            self.order(transport).authorize()
+        self.journal.flush()
+        entry, = self.journal.entries()
+        self.assertEqual(entry['state'], FAILED)
+
+    def test_lost_response_stays_pending(self):
+        entry = self.lose_response()
+        self.assertIn('ReadTimeout', entry['error'])
+        self.assertEqual(len(self.simulator.transactions), 1)
+
+    def test_concurrent_transactions(self):
+        def authorize(i):
+            return self.order(order_id=str(i)).authorize()
+
+        with ThreadPoolExecutor(16) as executor:
+            list(executor.map(authorize, range(64)))
+        self.journal.flush()
+        entries = self.journal.entries()
+        self.assertEqual(len(entries), 64)
+        self.assertTrue(all(e['state'] == COMPLETED for e in entries))
+
+    def test_money_amounts(self):
+        Order(journal=self.journal, transport=self.transport, **dict(
+            self.kwargs, amount=Money.parse('1.00')
+        )).authorize()
+        runner = BatchRunner(endpoint_kwargs={
+            'url': SIM_URL, 'merchant_id': '1234', 'journal': self.journal,
+            'transport': self.transport,
+        })
+        tx_ref_num, = self.simulator.transactions
+        result, = runner.run([{
+            'action': 'capture', 'order_id': '1', 'amount': '0.50',
+            'tx_ref_num': tx_ref_num,
+        }])
+        self.assertIsNone(result.error)
+        self.journal.flush()
+        self.assertEqual(
+            [(e['endpoint'], e['amount'], e['state'])
+             for e in self.journal.entries()],
+            [('Order', '1.00', COMPLETED),
+             ('MarkForCapture', '0.50', COMPLETED)],
+        )
+
+    def test_failed_write_does_not_fail_its_group(self):
+        connection = self.journal._connect()
+        self.addCleanup(connection.close)
+        sql = (
+            'INSERT INTO transactions (id, state, created, updated, '
+            "endpoint, trace_number) VALUES (?, ?, 0, 0, 'Order', '1')"
+        )
+        batch = [
+            (sql, ('a', PENDING), Future()),
+            (sql, ('a', PENDING), Future()),    # duplicate id
+            (sql, ('b', PENDING), Future()),
+        ]
+        self.journal._commit(connection, batch)
+        first, duplicate, last = [future for sql, params, future in batch]
+        self.assertIsNone(first.result())
+        self.assertIsInstance(duplicate.exception(), sqlite3.IntegrityError)
+        self.assertIsNone(last.result())
+        self.assertEqual(
+            sorted(entry['id'] for entry in self.journal.entries()),
+            ['a', 'b'],
+        )
+
+    def test_mask_request(self):
+        self.assertEqual(
+            mask_request(b'<CheckDDA>123456789</CheckDDA>'),
+            u'<CheckDDA>XXXXX6789</CheckDDA>',
+        )
+
+
+class TestRecovery(JournalTestCase):
+    def rebuild(self, entry):
+        # a restarted process starts with every circuit closed
+        return dict(
+            self.kwargs, transport=self.transport, health=EndpointHealth()
+        )
+
+    def test_replays_under_the_original_trace(self):
+        entry = self.lose_response()
+        (recovered, state, result), = recover(self.journal, self.rebuild)
+        self.assertEqual(recovered['id'], entry['id'])
+        self.assertEqual(state, COMPLETED)
+        self.assertTrue(result.approved)
+        # answered from the original transaction, not charged again
+        self.assertEqual(len(self.simulator.transactions), 1)
+        self.assertIn(result.tx_ref_num, self.simulator.transactions)
+        self.assertEqual(self.journal.pending(), [])
+
+    def test_reverse(self):
+        self.lose_response()
+        (entry, state, result), = recover(
+            self.journal, self.rebuild, reverse=True
+        )
+        self.assertEqual(state, REVERSED)
+        transaction = self.simulator.transactions[result.tx_ref_num]
+        self.assertTrue(transaction['voided'])
+        reversed_entry, = self.journal.entries(REVERSED)
+        self.assertEqual(reversed_entry['id'], entry['id'])
+
+    def test_context_endpoints(self):
+        connection = ('url', 'merchant_id', 'password', 'health')
+        context = MerchantContext(
+            journal=self.journal,
+            transport=LostResponseTransport(self.simulator),
+            **dict((name, self.kwargs[name]) for name in connection)
+        )
+        order = context.order(**dict(
+            (name, value) for name, value in self.kwargs.items()
+            if name not in connection
+        ))
+        with self.assertRaises(requests.exceptions.ReadTimeout):
+            order.authorize()
+        (entry, state, result), = recover(self.journal, self.rebuild)
+        self.assertEqual(entry['endpoint'], 'ContextOrder')
+        self.assertEqual(state, COMPLETED)
+
+    def test_invalid_entry_does_not_stop_recovery(self):
+        self.lose_response()
+        self.kwargs.update(order_id='2', health=EndpointHealth())
+        with self.assertRaises(requests.exceptions.ReadTimeout):
+            self.order(LostResponseTransport(self.simulator)).authorize()
+        self.journal.flush()
+        first, second = self.journal.pending()
+
+        def rebuild(entry):
+            kwargs = self.rebuild(entry)
+            if entry['id'] == first['id']:
+                kwargs['cc_expiry'] = '0101'
+            return kwargs
+
+        recovered = [
+            (entry['id'], state) for entry, state, result
+            in recover(self.journal, rebuild)
+        ]
+        self.assertEqual(recovered, [
+            (first['id'], UNRESOLVED), (second['id'], COMPLETED),
+        ])
+        self.assertEqual(self.journal.pending(), [])
+
+    def test_skips_entries_without_data(self):
+        self.lose_response()
+        self.assertEqual(list(recover(self.journal, lambda entry: None)), [])
+        self.assertEqual(len(self.journal.pending()), 1)
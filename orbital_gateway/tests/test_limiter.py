@@ -0,0 +1,145 @@
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from ..limiter import (
+    DROPPED, IGNORED, OK, AdaptiveLimit, AdaptiveTransport, LimiterMetrics,
+)
+from ..orbital_gateway import Order
+from ..simulator import OrbitalSimulator, SimulatorTransport
+from ..transport import TransportResponse
+from .orbital_gateway_test_data import VISA_LOOKUP
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def congested(in_flight, capacity=8, base=0.005):
+    """
+    Latency of a gateway queueing the requests beyond its capacity.
+    """
+    return base * max(1, in_flight - capacity + 1)
+
+
+class TestAdaptiveLimit(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.limit = AdaptiveLimit(initial=4, max_limit=6, clock=self.clock)
+
+    def request(self, latency=0.1, outcome=OK):
+        start = self.limit.try_acquire()
+        self.clock.now += latency
+        self.limit.release(start, outcome)
+
+    def test_grows_only_when_in_use(self):
+        for i in range(20):
+            self.request()
+        self.assertEqual(self.limit.limit, 4)
+        for i in range(40):
+            starts = [self.limit.try_acquire() for j in range(self.limit.limit)]
+            self.assertIsNone(self.limit.try_acquire())
+            self.clock.now += 0.1
+            for start in starts:
+                self.limit.release(start)
+        self.assertEqual(self.limit.limit, 6)
+
+    def test_backs_off_once_per_round_trip(self):
+        starts = [self.limit.try_acquire() for i in range(4)]
+        self.clock.now += 0.1
+        for start in starts:
+            self.limit.release(start, DROPPED)
+        self.assertEqual(self.limit.limit, 3)
+        self.assertEqual(self.limit.drops, 4)
+        self.request(outcome=DROPPED)
+        self.assertEqual(self.limit.limit, 3)
+        self.assertEqual(self.limit.snapshot(), {
+            'limit': 3, 'in_flight': 0, 'queued': 0,
+            'requests': 5, 'drops': 5,
+        })
+
+    def test_slow_requests_are_congestion(self):
+        for i in range(10):
+            self.request(0.1)
+        self.request(0.15)
+        self.assertEqual(self.limit.drops, 0)
+        self.request(0.5)
+        self.assertEqual(self.limit.drops, 1)
+        self.assertAlmostEqual(self.limit.best_latency, 0.1)
+        self.request(10, IGNORED)
+        self.assertEqual(self.limit.requests, 12)
+
+    def test_outcomes(self):
+        limit = AdaptiveLimit(drop_statuses=['9714'])
+        response = lambda status, text='': TransportResponse('u', status, text)
+        self.assertEqual(limit.outcome(response(200, '<ProcStatus>0</')), OK)
+        self.assertEqual(limit.outcome(response(503)), DROPPED)
+        self.assertEqual(limit.outcome(response(429)), DROPPED)
+        self.assertEqual(
+            limit.outcome(response(200, '<ProfileProcStatus>9714</')), DROPPED
+        )
+        self.assertEqual(
+            limit.outcome(error=requests.exceptions.ReadTimeout()), DROPPED
+        )
+        self.assertEqual(limit.outcome(error=ValueError()), IGNORED)
+
+
+class TestAdaptiveTransport(unittest.TestCase):
+    def test_converges_under_congestion(self):
+        simulator = OrbitalSimulator(seed=1)
+        simulator.latency = lambda random: congested(simulator.in_flight)
+        limit = AdaptiveLimit(initial=4, max_limit=32)
+        transport = AdaptiveTransport(SimulatorTransport(simulator), limit)
+
+        def authorize(i):
+            return Order(
+                url='sim://primary', transport=transport, merchant_id='1234',
+                order_id=str(i), **VISA_LOOKUP
+            ).authorize()
+
+        with ThreadPoolExecutor(max_workers=24) as pool:
+            results = list(pool.map(authorize, range(400)))
+        self.assertTrue(all(r['ProcStatus'] == '0' for r in results))
+        self.assertGreater(limit.drops, 0)
+        self.assertLessEqual(limit.limit, 12)
+        self.assertGreater(simulator.max_in_flight, 4)
+        self.assertEqual((limit.in_flight, limit.queued), (0, 0))
+
+    def test_errors_release_the_slot(self):
+        transport = AdaptiveTransport(SimulatorTransport(OrbitalSimulator()))
+        transport.transport.outages['sim://down'] = 'down'
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            transport.post('sim://down', '', {})
+        self.assertEqual(transport.limit.in_flight, 0)
+        self.assertEqual(transport.limit.drops, 1)
+
+    @unittest.skipIf(prometheus_client is None, 'requires prometheus_client')
+    def test_metrics(self):
+        registry = prometheus_client.CollectorRegistry()
+        limit = AdaptiveLimit(initial=5)
+        LimiterMetrics({'700000001': limit}, registry=registry)
+        limit.try_acquire()
+        labels = {'limiter': '700000001'}
+        self.assertEqual(registry.get_sample_value(
+            'orbital_concurrency_limit', labels
+        ), 5)
+        self.assertEqual(registry.get_sample_value(
+            'orbital_concurrency_in_flight', labels
+        ), 1)
+        self.assertEqual(registry.get_sample_value(
+            'orbital_concurrency_queued', labels
+        ), 0)
+        self.assertEqual(registry.get_sample_value(
+            'orbital_concurrency_drops_total', labels
+        ), 0)
@@ -0,0 +1,62 @@
+import asyncio
+import unittest
+
+from ..aio import AsyncAdaptiveTransport, AsyncOrder
+from ..limiter import AdaptiveLimit
+from ..simulator import OrbitalSimulator
+from ..transport import TransportResponse
+from .orbital_gateway_test_data import VISA_LOOKUP
+from .test_limiter import congested
+
+
+class AsyncSimulatorTransport(object):
+    def __init__(self, simulator):
+        self.simulator = simulator
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def post(self, url, data, headers, timeout=None):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(congested(self.in_flight))
+            return TransportResponse(
+                url, 200, self.simulator.handle(data, headers)
+            )
+        finally:
+            self.in_flight -= 1
+
+    async def warm_up(self, *urls):
+        return []
+
+    async def close(self):
+        pass
+
+
+class TestAsyncAdaptiveTransport(unittest.TestCase):
+    def test_async_converges_under_congestion(self):
+        limit = AdaptiveLimit(initial=4, max_limit=32)
+        stub = AsyncSimulatorTransport(OrbitalSimulator(seed=1))
+        transport = AsyncAdaptiveTransport(stub, limit)
+
+        async def authorize_many():
+            return await asyncio.gather(*[
+                AsyncOrder(
+                    url='sim://primary', transport=transport,
+                    merchant_id='1234', order_id=str(i),
+                    **VISA_LOOKUP
+                ).authorize()
+                for i in range(300)
+            ])
+
+        loop = asyncio.new_event_loop()
+        try:
+            results = loop.run_until_complete(authorize_many())
+        finally:
+            loop.close()
+        self.assertEqual(len(results), 300)
+        self.assertTrue(all(r['ProcStatus'] == '0' for r in results))
+        self.assertGreater(limit.drops, 0)
+        self.assertLessEqual(limit.limit, 12)
+        self.assertGreater(stub.max_in_flight, 4)
+        self.assertEqual((limit.in_flight, limit.queued), (0, 0))
@@ -0,0 +1,87 @@
+import decimal
+import unittest
+
+from ..money import InvalidAmount, Money, parse_amount, parse_amounts
+from ..orbital_gateway import MarkForCapture, Order, Reversal
+from ..validation import ValidationError
+
+
+class TestMoney(unittest.TestCase):
+    def test_parse(self):
+        for value, minor in [
+            ('45.25', 4525), ('54', 5400), ('45.2', 4520), ('1,000.00', 100000),
+            ('  5', 500), ('5.', 500), ('.5', 50), ('0.01', 1), ('45.250', 4525),
+            (7, 700), (decimal.Decimal('45.25'), 4525),
+            (decimal.Decimal('1E+1'), 1000), (45.25, 4525),
+            (Money(4525), 4525),
+        ]:
+            self.assertEqual(Money.parse(value).minor, minor, value)
+
+    def test_invalid(self):
+        for value in ['45.255', '1,00.00', '-5', ' ', '.', '1.0x', '$5', -1,
+                      decimal.Decimal('0.001'), decimal.Decimal('NaN'),
+                      decimal.Decimal('-1'), 0.1 + 0.2, 1e16, float('nan')]:
+            with self.assertRaises(InvalidAmount):
+                Money.parse(value)
+        for value in [True, None, [1]]:
+            with self.assertRaises(TypeError):
+                Money.parse(value)
+        with self.assertRaises(InvalidAmount):
+            Money.parse(Money(5, exponent=0))
+
+    def test_render(self):
+        self.assertEqual(Money(4525).orbital, '4525')
+        self.assertEqual(Money(1).orbital, '001')
+        self.assertEqual(Money(0).orbital, '000')
+        self.assertEqual(str(Money(1)), '0.01')
+        self.assertEqual(str(Money(123, exponent=0)), '123')
+        self.assertEqual(repr(Money(100050)), 'Money(1000.50)')
+        self.assertEqual(Money(4525).to_decimal(), decimal.Decimal('45.25'))
+
+    def test_arithmetic(self):
+        self.assertEqual(Money(500) + Money(25), Money(525))
+        self.assertEqual(Money(500) - Money(25), Money(475))
+        self.assertLess(Money(25), Money(500))
+        self.assertNotEqual(Money(500), Money(500, exponent=3))
+        self.assertNotEqual(Money(500), '5.00')
+        with self.assertRaises(InvalidAmount):
+            Money(25) - Money(500)
+        self.assertEqual(len({Money(5), Money.parse('0.05')}), 1)
+
+    def test_parse_amounts(self):
+        memo = {}
+        amounts = parse_amounts(['1.00', '1.00', None, '', 2], memo=memo)
+        self.assertEqual(amounts, [Money(100), Money(100), None, None,
+                                   Money(200)])
+        self.assertIs(amounts[0], amounts[1])
+        self.assertEqual(list(memo), ['1.00'])
+        self.assertIs(parse_amount('1.00', memo=memo), amounts[0])
+
+
+class TestEndpointAmounts(unittest.TestCase):
+    def test_convert_amount(self):
+        order = Order()
+        self.assertEqual(order.convert_amount('1,000.5'), '100050')
+        self.assertEqual(order.convert_amount(Money(4525)), '4525')
+        self.assertIsNone(order.convert_amount(None))
+        self.assertEqual(order.convert_amount('45.255'), '45.255')
+
+    def test_rejected(self):
+        endpoints = [
+            Order(order_id='1', cc_num='4112344112344113', amount='45.255'),
+            MarkForCapture(order_id='1', tx_ref_num='A', amount='45.255'),
+            Reversal(order_id='1', tx_ref_num='A', amount='-1'),
+        ]
+        renders = [endpoints[0].render_charge, endpoints[1].render_request,
+                   endpoints[2].render_reversal]
+        for render, field in zip(renders, ['Amount', 'Amount', 'AdjustedAmt']):
+            with self.assertRaises(ValidationError) as context:
+                render()
+            self.assertEqual(context.exception.fields, [field])
+
+    def test_rendered(self):
+        capture = MarkForCapture(order_id='1', tx_ref_num='A',
+                                 amount=decimal.Decimal('12.30'))
+        self.assertIn(b'<Amount>1230</Amount>', capture.render_request())
+        void = Reversal(order_id='1', tx_ref_num='A', amount=Money(5))
+        self.assertIn(b'<AdjustedAmt>005</AdjustedAmt>', void.render_void())
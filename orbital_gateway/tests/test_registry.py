@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .. import config
+from ..registry import ClientRegistry, UnknownMerchant
+from ..simulator import OrbitalSimulator, SimulatorTransport
+from .orbital_gateway_test_data import VISA_LOOKUP
+
+
+class CountingTransport(SimulatorTransport):
+    def __init__(self, simulator):
+        super(CountingTransport, self).__init__(simulator)
+        self.in_flight = 0
+        self.most_in_flight = 0
+        self.lock = threading.Lock()
+
+    def post(self, url, data, headers, timeout=None):
+        with self.lock:
+            self.in_flight += 1
+            self.most_in_flight = max(self.most_in_flight, self.in_flight)
+        try:
+            time.sleep(0.005)
+            return super(CountingTransport, self).post(
+                url, data, headers, timeout
+            )
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+class TestClientRegistry(unittest.TestCase):
+    def setUp(self):
+        self.simulator = OrbitalSimulator(seed=1)
+        self.transport = SimulatorTransport(self.simulator)
+        self.registry = ClientRegistry(
+            url='sim://primary', transport=self.transport
+        )
+        self.registry.register('1111', username='one', password='secret1')
+        self.registry.register('2222', username='two', password='secret2',
+                               platform='pns')
+
+    def test_routes_by_merchant(self):
+        for merchant_id in ('1111', '2222', '1111'):
+            self.registry.order(
+                merchant_id, order_id=merchant_id, **VISA_LOOKUP
+            ).authorize()
+        merchants = sorted(merchant for merchant, trace in self.simulator.traces)
+        self.assertEqual(merchants, ['1111', '1111', '2222'])
+
+    def test_platform_and_credentials(self):
+        xml = self.registry.order(
+            2222, order_id='1', **VISA_LOOKUP
+        ).render_charge()
+        self.assertIn(b'<BIN>000002</BIN>', xml)
+        self.assertIn(b'<OrbitalConnectionUsername>two<', xml)
+        self.assertIn(b'<MerchantID>2222</MerchantID>', xml)
+
+    def test_environment_does_not_override(self):
+        environ = dict(os.environ)
+        self.addCleanup(os.environ.update, environ)
+        self.addCleanup(os.environ.clear)
+        os.environ.update(ORBITAL_MERCHANT_ID='9999', ORBITAL_PASSWORD='x')
+        client = self.registry.register('3333', password='secret3')
+        order = client.order(order_id='1', **VISA_LOOKUP)
+        self.assertEqual(order.headers['MerchantID'], '3333')
+        self.assertIn(b'secret3', order.render_charge())
+
+    def test_lookup_errors(self):
+        with self.assertRaises(UnknownMerchant):
+            self.registry.client('4444')
+        with self.assertRaises(UnknownMerchant):
+            self.registry.client('1111', platform='pns')
+        self.registry.register('1111', platform='pns')
+        with self.assertRaises(ValueError):
+            self.registry['1111']
+        self.assertEqual(self.registry.client('1111', 'PNS').platform, 'pns')
+        with self.assertRaises(ValueError):
+            self.registry.register('2222', platform='pns')
+        self.assertIn('2222', self.registry)
+        self.assertEqual(len(self.registry), 3)
+
+    def test_profiles(self):
+        result = self.registry.profile(
+            '1111', cc_expiry='1230', **VISA_LOOKUP
+        ).create()
+        ref = result['CustomerRefNum']
+        read = self.registry.profile('1111', customer_ref_num=ref).read()
+        self.assertEqual(read['CustomerCity'], 'Bedford')
+        self.assertEqual(read['ProfileProcStatus'], config.PROCSTATUS_SUCCESS)
+
+    def test_concurrency_limit(self):
+        transport = CountingTransport(self.simulator)
+        client = self.registry.register(
+            '5555', transport=transport, max_concurrency=2
+        )
+
+        def authorize(i):
+            return client.order(order_id=str(i), **VISA_LOOKUP).authorize()
+
+        with ThreadPoolExecutor(8) as executor:
+            list(executor.map(authorize, range(16)))
+        self.assertEqual(transport.most_in_flight, 2)
+
+    def test_own_transport_per_merchant(self):
+        registry = ClientRegistry(url='sim://primary')
+        with registry:
+            first = registry.register('1111', max_concurrency=4)
+            second = registry.register('2222', rate_limit=10)
+        self.assertIsNot(first.transport.transport,
+                         second.transport.transport)
+        self.assertEqual(second.transport.limiter.rate, 10)
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+import pickle
+import unittest
+import xml.etree.ElementTree as ET
+
+from ..orbital_gateway import Order, Profile
+from ..results import OrbitalResult, ResponseParseError, decode
+
+NEW_ORDER_RESPONSE = (
+    '<?xml version="1.0" encoding="UTF-8"?><Response><NewOrderResp>'
+    '<IndustryType></IndustryType><MessageType>A</MessageType>'
+    '<MerchantID>1234</MerchantID><CardBrand>AX</CardBrand>'
+    '<OrderID>946033583</OrderID>'
+    '<TxRefNum>57E9B37668E45028A6FB3E10EF1F8CBD3B59535A</TxRefNum>'
+    '<TxRefIdx>0</TxRefIdx><ProcStatus>0</ProcStatus>'
+    '<ApprovalStatus>1</ApprovalStatus><RespCode>00</RespCode>'
+    '<AVSRespCode>B\n        </AVSRespCode><CVV2RespCode> </CVV2RespCode>'
+    '<AuthCode>tst661</AuthCode><StatusMsg>Approved &amp; &#233;</StatusMsg>'
+    '<RequestedAmount>10000</RequestedAmount><RedeemedAmount/>'
+    '</NewOrderResp></Response>'
+)
+
+PROFILE_RESPONSE = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n<Response>\n  <ProfileResp>\n'
+    '    <CustomerName>TEST VISA</CustomerName>\n'
+    '    <CustomerRefNum>653048486</CustomerRefNum>\n'
+    '    <ProfileProcStatus>0</ProfileProcStatus>\n'
+    '    <CustomerCity>BEDFORD</CustomerCity>\n'
+    '  </ProfileResp>\n</Response>'
+)
+
+
+def tree_values(text):
+    resp_elem = ET.fromstring(text)[0]
+    return dict((child.tag, child.text) for child in resp_elem)
+
+
+class TestDecode(unittest.TestCase):
+    def test_matches_elementtree(self):
+        for text in (NEW_ORDER_RESPONSE, PROFILE_RESPONSE,
+                     NEW_ORDER_RESPONSE.encode('utf-8')):
+            self.assertEqual(decode(text).to_dict(), tree_values(text))
+
+    def test_typed_fields(self):
+        result = decode(NEW_ORDER_RESPONSE)
+        self.assertEqual(result.response_type, 'NewOrderResp')
+        self.assertEqual(result.proc_status, 0)
+        self.assertEqual(result.approval_status, 1)
+        self.assertEqual(result.tx_ref_idx, 0)
+        self.assertEqual(result.resp_code, '00')
+        self.assertEqual(result.avs_resp_code, 'B')
+        self.assertIsNone(result.cvv2_resp_code)
+        self.assertEqual(result.requested_amount, 10000)
+        self.assertIsNone(result.redeemed_amount)
+        self.assertIsNone(result.amount)
+        self.assertEqual(result.status_msg, u'Approved & \xe9')
+        self.assertTrue(result.approved)
+
+    def test_profile_approved(self):
+        result = decode(PROFILE_RESPONSE)
+        self.assertEqual(result.profile_proc_status, 0)
+        self.assertTrue(result.approved)
+
+    def test_mapping_access(self):
+        result = decode(NEW_ORDER_RESPONSE)
+        self.assertEqual(result['ProcStatus'], '0')
+        self.assertEqual(result.get('Missing', 'x'), 'x')
+        self.assertIn('TxRefNum', result)
+        self.assertEqual(result, tree_values(NEW_ORDER_RESPONSE))
+        self.assertEqual(pickle.loads(pickle.dumps(result)), result)
+
+    def test_immutable(self):
+        result = decode(NEW_ORDER_RESPONSE)
+        with self.assertRaises(AttributeError):
+            result.proc_status = 1
+        with self.assertRaises(TypeError):
+            result['ProcStatus'] = '1'
+        self.assertFalse(hasattr(result, '__dict__'))
+
+    def test_shapes_are_shared(self):
+        self.assertIs(
+            decode(NEW_ORDER_RESPONSE)._shape, decode(NEW_ORDER_RESPONSE)._shape
+        )
+
+    def test_not_a_response(self):
+        with self.assertRaises(ResponseParseError):
+            decode('Could not communicate with Chase')
+        with self.assertRaises(SyntaxError):
+            decode('<Response><!-- broken')
+
+    def test_comments_fall_back_to_tree(self):
+        text = NEW_ORDER_RESPONSE.replace('<TxRefIdx>', '<!-- x --><TxRefIdx>')
+        self.assertEqual(decode(text).to_dict(), tree_values(text))
+
+    def test_attributes_fall_back_to_tree(self):
+        for old, new in (
+            ('<NewOrderResp>', '<NewOrderResp a="1">'),
+            ('<ProcStatus>', '<ProcStatus b="2">'),
+            ('<Response>', '<Response xmlns:x="urn:x">'),
+        ):
+            text = NEW_ORDER_RESPONSE.replace(old, new)
+            result = decode(text)
+            self.assertEqual(result.response_type, 'NewOrderResp')
+            self.assertEqual(result['ProcStatus'], '0')
+            self.assertEqual(result.to_dict(), tree_values(text))
+
+    def test_nested_elements_fall_back_to_tree(self):
+        text = NEW_ORDER_RESPONSE.replace(
+            '<TxRefIdx>0</TxRefIdx>',
+            '<Extra><TxRefIdx>0</TxRefIdx></Extra>',
+        )
+        result = decode(text)
+        self.assertNotIn('TxRefIdx', result)
+        self.assertEqual(result.to_dict(), tree_values(text))
+
+
+class TestEndpointResults(unittest.TestCase):
+    def test_parse_result_is_a_dict(self):
+        result = Order().parse_result(NEW_ORDER_RESPONSE)
+        self.assertIs(type(result), dict)
+        result.update({'MOP': 'Amex'})
+
+    def test_profile_title_case(self):
+        result = Profile().parse_result(PROFILE_RESPONSE)
+        self.assertEqual(result['CustomerName'], 'Test Visa')
+        self.assertEqual(result['CustomerCity'], 'Bedford')
+
+    def test_decode_result(self):
+        self.assertIsInstance(
+            Order().decode_result(NEW_ORDER_RESPONSE), OrbitalResult
+        )
@@ -0,0 +1,91 @@
+import time
+import unittest
+
+from .. import config
+from ..health import EndpointHealth
+from ..orbital_gateway import MarkForCapture
+from ..retry import (
+    RetryTraceError, TraceNumbers, is_invalid_retry_trace,
+)
+from ..transport import HTTPTransport
+from .fake_orbital import FakeOrbitalServer, NEW_ORDER_RESPONSE
+
+DEAD_URL = 'http://127.0.0.1:1/authorize'
+INVALID_TRACE_RESPONSE = NEW_ORDER_RESPONSE.replace(
+    '<ProcStatus>0</ProcStatus>',
+    '<ProcStatus>%s</ProcStatus>' % config.PROCSTATUS_INVALID_RETRY_TRACE,
+)
+
+
+def traces(server):
+    return [headers['Trace-number'] for headers, body in server.requests]
+
+
+class TestRetryTrace(unittest.TestCase):
+    def setUp(self):
+        self.health = EndpointHealth(backoff_base=0.01)
+        self.transport = HTTPTransport(connect_timeout=0.5, read_timeout=0.2)
+
+    def capture(self, *urls, **kwargs):
+        kwargs.update(
+            url=urls[0], url2=urls[1] if len(urls) > 1 else None,
+            health=self.health, transport=self.transport,
+            order_id='1', amount='1.00', tx_ref_num='ABC',
+        )
+        return MarkForCapture(**kwargs)
+
+    def test_trace_numbers_are_unique(self):
+        numbers = TraceNumbers()
+        values = set(numbers.next() for i in range(1000))
+        self.assertEqual(len(values), 1000)
+        self.assertTrue(all(len(v) <= 16 for v in values))
+
+    def test_detects_invalid_retry_trace(self):
+        self.assertTrue(is_invalid_retry_trace(INVALID_TRACE_RESPONSE))
+        self.assertTrue(is_invalid_retry_trace(
+            '<ProfileProcStatus>9714</ProfileProcStatus>'
+        ))
+        self.assertFalse(is_invalid_retry_trace(NEW_ORDER_RESPONSE))
+
+    def test_retries_replay_the_trace(self):
+        with FakeOrbitalServer() as failing, FakeOrbitalServer() as backup:
+            failing.status = 500
+            capture = self.capture(failing.url, backup.url)
+            capture.request()
+            capture.request()
+            first, second = traces(failing)[0], traces(backup)
+        self.assertEqual(second[0], first)
+        self.assertNotEqual(second[1], first)
+
+    def test_new_trace_after_9714_when_nothing_was_sent(self):
+        responses = [INVALID_TRACE_RESPONSE, NEW_ORDER_RESPONSE]
+        with FakeOrbitalServer(body=lambda body: responses.pop(0)) as server:
+            result = self.capture(DEAD_URL, server.url).request()
+            first, second = traces(server)
+        self.assertEqual(result['ProcStatus'], '0')
+        self.assertNotEqual(first, second)
+
+    def test_9714_after_ambiguous_send_raises(self):
+        with FakeOrbitalServer(delay=0.5) as slow, \
+                FakeOrbitalServer(body=INVALID_TRACE_RESPONSE) as server:
+            capture = self.capture(slow.url, server.url)
+            with self.assertRaises(RetryTraceError) as ctx:
+                capture.make_request(b'<Request/>')
+        self.assertEqual(ctx.exception.trace_number, capture.trace_number)
+
+    def test_pinned_trace_is_never_replaced(self):
+        with FakeOrbitalServer(body=INVALID_TRACE_RESPONSE) as server:
+            capture = self.capture(server.url, trace_number='42')
+            with self.assertRaises(RetryTraceError):
+                capture.make_request(b'<Request/>')
+            self.assertEqual(traces(server), ['42'])
+
+    def test_deadline_caps_transaction_time(self):
+        with FakeOrbitalServer(delay=1) as slow, \
+                FakeOrbitalServer(delay=1) as slower:
+            self.transport.read_timeout = 5
+            capture = self.capture(slow.url, slower.url, deadline=0.3)
+            start = time.time()
+            with self.assertRaises(IOError):
+                capture.make_request(b'<Request/>')
+            self.assertLess(time.time() - start, 0.6)
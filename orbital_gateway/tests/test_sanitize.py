@@ -0,0 +1,70 @@
+import random
+import unittest
+
+from ..orbital_gateway import Order, Profile, remove_control_characters
+from ..sanitize import (
+    ORDER_FIELDS, PROFILE_FIELDS, FieldRule, sanitize_columns,
+)
+
+ALPHABET = u'aZ9 %|^\\/().-@\x00\x1f\t\xe9\u200b\u2028'
+
+
+def random_rows(count, seed=1):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        row = {}
+        for name, rule in PROFILE_FIELDS:
+            if rng.random() < 0.1:
+                row[name] = None
+            else:
+                row[name] = u''.join(
+                    rng.choice(ALPHABET) for j in range(rng.randint(0, 60))
+                )
+        rows.append(row)
+    return rows
+
+
+class TestSanitizeColumns(unittest.TestCase):
+    def assertSameAsEndpoints(self, cls, fields, rows, clean):
+        columns = sanitize_columns(dict(
+            (name, [row[name] for row in rows]) for name, rule in fields
+        ), fields, clean)
+        for i, row in enumerate(rows):
+            endpoint = cls(**dict(
+                (name, row[name]) for name, rule in fields
+            ))
+            endpoint.sanitize()
+            for name, rule in fields:
+                expected = getattr(endpoint, rule.attribute)
+                if clean and expected is not None:
+                    expected = remove_control_characters(expected)
+                self.assertEqual(columns[name][i], expected, (name, row))
+
+    def test_same_as_profile(self):
+        rows = random_rows(300)
+        self.assertSameAsEndpoints(Profile, PROFILE_FIELDS, rows, True)
+        self.assertSameAsEndpoints(Profile, PROFILE_FIELDS, rows, False)
+
+    def test_same_as_order(self):
+        rows = random_rows(300, seed=2)
+        self.assertSameAsEndpoints(Order, ORDER_FIELDS, rows, True)
+
+    def test_printable_columns(self):
+        columns = sanitize_columns({
+            'address1': [u'1 Main St. / Apt 2', None, u'x' * 40],
+            'phone': [u'(603) 555-1234'],
+            'order_id': ['1', '2'],
+        })
+        self.assertEqual(columns, {
+            'address1': [u'1 Main St.  Apt 2', None, u'x' * 30],
+            'phone': [u'603 5551234'],
+            'order_id': ['1', '2'],
+        })
+
+    def test_values_holding_the_separator(self):
+        rule = FieldRule('city', 20, u'/')
+        self.assertEqual(rule.apply_column([u'a/\x00b', u'c/d'], clean=False),
+                         [u'a\x00b', u'cd'])
+        self.assertEqual(rule.apply_column([u'a/\x00b', u'c/d']),
+                         [u'ab', u'cd'])
@@ -0,0 +1,173 @@
+import time
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .. import config
+from ..health import EndpointHealth
+from ..orbital_gateway import MarkForCapture, Order, Profile, Reversal
+from ..simulator import (
+    DO_NOT_HONOR, OUTAGE_DOWN, OUTAGE_ERROR, OUTAGE_HANG, OrbitalSimulator,
+    SimulatorTransport, fixed, lognormal,
+)
+from ..transport import HTTPTransport
+from .orbital_gateway_test_data import MASTERCARD_LOOKUP, VISA_LOOKUP
+
+SIM_URL = 'sim://primary'
+
+
+class SlowSimulator(OrbitalSimulator):
+    def _NewOrder(self, request):
+        time.sleep(0.01)
+        return super(SlowSimulator, self)._NewOrder(request)
+
+
+class SimulatorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.simulator = OrbitalSimulator(
+            seed=1, declines={MASTERCARD_LOOKUP['cc_num']: DO_NOT_HONOR}
+        )
+        self.transport = SimulatorTransport(self.simulator)
+        self.health = EndpointHealth(backoff_base=0.01)
+        self.kwargs = {
+            'url': SIM_URL, 'transport': self.transport,
+            'health': self.health, 'merchant_id': '1234',
+        }
+
+    def order(self, profile, **kwargs):
+        params = dict(profile, **self.kwargs)
+        params.update(kwargs)
+        return Order(**params)
+
+
+class TestSimulatedOperations(SimulatorTestCase):
+    def test_authorize_capture_void(self):
+        auth = self.order(VISA_LOOKUP, order_id='1', amount='10.00')
+        result = auth.authorize()
+        self.assertEqual(result['ApprovalStatus'], config.APPROVAL_APPROVED)
+        self.assertEqual(result['CardBrand'], 'VI')
+        capture = MarkForCapture(
+            order_id='1', amount='5.00', tx_ref_num=result['TxRefNum'],
+            **self.kwargs
+        ).request()
+        self.assertEqual(capture['ProcStatus'], config.PROCSTATUS_SUCCESS)
+        self.assertEqual(capture['Amount'], '500')
+        void = Reversal(
+            order_id='1', tx_ref_num=result['TxRefNum'], tx_ref_idx='0',
+            **self.kwargs
+        ).void()
+        self.assertEqual(void['OutstandingAmt'], '0')
+        again = Reversal(
+            order_id='1', tx_ref_num=result['TxRefNum'], **self.kwargs
+        ).void()
+        self.assertNotEqual(again['ProcStatus'], config.PROCSTATUS_SUCCESS)
+
+    def test_decline_rule(self):
+        result = self.order(MASTERCARD_LOOKUP, order_id='2').authorize()
+        self.assertEqual(result['ApprovalStatus'], config.APPROVAL_DECLINED)
+        self.assertEqual(result['RespCode'], '05')
+
+    def test_profile_lifecycle(self):
+        profile_kwargs = dict(VISA_LOOKUP, **self.kwargs)
+        created = Profile(**profile_kwargs).create()
+        ref = created['CustomerRefNum']
+        read = Profile(customer_ref_num=ref, **self.kwargs).read()
+        self.assertEqual(read['CustomerName'], 'Test Visa')
+        self.assertEqual(read['CCAccountNum'], VISA_LOOKUP['cc_num'])
+        Profile(customer_ref_num=ref, **self.kwargs).destroy()
+        missing = Profile(customer_ref_num=ref, **self.kwargs).read()
+        self.assertEqual(
+            missing['ProfileProcStatus'], config.PROCSTATUS_USER_NOT_FOUND
+        )
+        charge = self.order({}, customer_num=ref, order_id='3', amount='1.00')
+        self.assertEqual(charge.authorize()['ProcStatus'], '0')
+
+    def test_retry_trace_replays_answer(self):
+        order = self.order(VISA_LOOKUP, order_id='4', trace_number='77')
+        xml = order.render_charge()
+        headers = dict(order.headers, **{'Trace-number': '77'})
+        status, first = self.simulator.respond(xml, headers)
+        status, second = self.simulator.respond(xml, headers)
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.simulator.transactions), 1)
+        status, other = self.simulator.respond(
+            xml.replace(b'<OrderID>4', b'<OrderID>5'), headers
+        )
+        self.assertIn(config.PROCSTATUS_INVALID_RETRY_TRACE, other)
+
+    def respond_traced(self, order_id, trace):
+        order = self.order(VISA_LOOKUP, order_id=order_id)
+        headers = dict(order.headers, **{'Trace-number': trace})
+        return self.simulator.respond(order.render_charge(), headers)[1]
+
+    def test_traces_are_bounded(self):
+        self.simulator.max_traces = 2
+        first = self.respond_traced('1', '1')
+        self.respond_traced('2', '2')
+        # replaying trace 1 makes trace 2 the least recently used
+        self.assertEqual(self.respond_traced('1', '1'), first)
+        self.respond_traced('3', '3')
+        self.assertEqual(
+            [trace for merchant, trace in self.simulator.traces], ['1', '3']
+        )
+        self.assertEqual(len(self.simulator.transactions), 3)
+
+    def test_concurrent_retries_of_a_trace_answer_once(self):
+        self.simulator = SlowSimulator(seed=1)
+        order = self.order(VISA_LOOKUP, order_id='6')
+        xml = order.render_charge()
+        headers = dict(order.headers, **{'Trace-number': '78'})
+        with ThreadPoolExecutor(8) as pool:
+            answers = list(pool.map(
+                lambda i: self.simulator.respond(xml, headers)[1], range(16)
+            ))
+        self.assertEqual(len(set(answers)), 1)
+        self.assertEqual(len(self.simulator.transactions), 1)
+
+
+class TestSimulatedFailures(SimulatorTestCase):
+    def test_error_rate(self):
+        self.simulator.error_rate = 0.5
+        statuses = [self.simulator.respond(b'<Request/>')[0] for i in range(200)]
+        self.assertTrue(60 < statuses.count(500) < 140)
+
+    def test_latency_distribution(self):
+        self.simulator.latency = lognormal(0.002, 0.3)
+        start = time.time()
+        for i in range(20):
+            self.simulator.respond(b'<Request/>')
+        self.assertGreater(time.time() - start, 0.02)
+
+    def test_in_process_outage_fails_over(self):
+        self.transport.outages[SIM_URL] = OUTAGE_DOWN
+        order = self.order(VISA_LOOKUP, order_id='6', url2='sim://backup')
+        self.assertEqual(order.authorize()['ProcStatus'], '0')
+        self.transport.outages['sim://backup'] = OUTAGE_ERROR
+        with self.assertRaises(IOError):
+            self.order(VISA_LOOKUP, order_id='7', url2='sim://backup').authorize()
+
+    def test_http_endpoints(self):
+        self.simulator.hang_seconds = 1
+        transport = HTTPTransport(read_timeout=0.2)
+        with self.simulator.serve() as primary, \
+                self.simulator.serve() as backup:
+            primary.outage = OUTAGE_HANG
+            kwargs = dict(VISA_LOOKUP, url=primary.url, url2=backup.url,
+                          transport=transport, health=self.health)
+            result = Order(order_id='8', **kwargs).authorize()
+            self.assertEqual(result['ProcStatus'], '0')
+            primary.outage = OUTAGE_DOWN
+            result = Order(order_id='9', **kwargs).authorize()
+            self.assertEqual(result['ProcStatus'], '0')
+
+    def test_concurrent_load(self):
+        self.simulator.latency = fixed(0.01)
+
+        def authorize(i):
+            return self.order(VISA_LOOKUP, order_id=str(i)).authorize()
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(authorize, range(200)))
+        self.assertTrue(all(r['ProcStatus'] == '0' for r in results))
+        self.assertEqual(self.simulator.requests, 200)
+        self.assertGreater(self.simulator.max_in_flight, 1)
@@ -0,0 +1,92 @@
+import threading
+import time
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from ..cache import ProfileCache, mask_number
+from ..orbital_gateway import Profile
+from ..simulator import OrbitalSimulator, SimulatorTransport, fixed
+from ..singleflight import SingleFlight
+from ..transport import HTTPTransport
+from .fake_orbital import FakeOrbitalServer
+from .orbital_gateway_test_data import VISA_LOOKUP
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_calls_share_one(self):
+        group = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            release.wait(5)
+            return 'value'
+
+        with ThreadPoolExecutor(8) as executor:
+            futures = [executor.submit(group.do, 'key', fetch)
+                       for i in range(8)]
+            while getattr(group._calls.get('key'), 'waiters', 0) < 7:
+                time.sleep(0.001)
+            release.set()
+            results = [future.result() for future in futures]
+        self.assertEqual(calls, [1])
+        self.assertEqual(results, ['value'] * 8)
+        self.assertEqual(group.in_flight(), 0)
+
+    def test_error_reaches_every_caller(self):
+        group = SingleFlight()
+        with self.assertRaises(ValueError):
+            group.do('key', lambda: int('x'))
+        self.assertEqual(group.do('key', lambda: 1), 1)
+
+
+class TestProfileReadCoalescing(unittest.TestCase):
+    def read_concurrently(self, server, **kwargs):
+        transport = HTTPTransport()
+
+        def read(i):
+            return Profile(
+                url=server.url, transport=transport, merchant_id='1234',
+                customer_ref_num='42', **kwargs
+            ).read()
+
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(read, range(8)))
+        transport.close()
+        return results
+
+    def test_concurrent_reads_share_one_request(self):
+        with FakeOrbitalServer(delay=0.2) as server:
+            results = self.read_concurrently(server)
+            self.assertEqual(len(server.requests), 1)
+        self.assertEqual(len(set(id(values) for values in results)), 8)
+        self.assertTrue(all(values == results[0] for values in results))
+
+    def test_coalescing_can_be_disabled(self):
+        with FakeOrbitalServer(delay=0.2) as server:
+            self.read_concurrently(server, coalesce=False)
+            self.assertEqual(len(server.requests), 8)
+
+    def test_readers_through_different_caches_do_not_share(self):
+        simulator = OrbitalSimulator(latency=fixed(0.1))
+        kwargs = {
+            'url': 'sim://primary', 'merchant_id': '1234',
+            'transport': SimulatorTransport(simulator),
+        }
+        created = Profile(**dict(VISA_LOOKUP, **kwargs)).create()
+        cache = ProfileCache()
+
+        def read(i):
+            return Profile(
+                customer_ref_num=created['CustomerRefNum'],
+                cache=cache if i % 2 else None, **kwargs
+            ).read()['CCAccountNum']
+
+        with ThreadPoolExecutor(8) as executor:
+            numbers = list(executor.map(read, range(8)))
+        cc_num = VISA_LOOKUP['cc_num']
+        self.assertEqual(numbers[0::2], [cc_num] * 4)
+        self.assertEqual(numbers[1::2], [mask_number(cc_num, 6)] * 4)
+        self.assertEqual(simulator.requests, 3)
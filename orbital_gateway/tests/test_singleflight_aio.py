@@ -0,0 +1,29 @@
+import asyncio
+import unittest
+
+from ..aio import AsyncSingleFlight
+
+
+class TestAsyncSingleFlight(unittest.TestCase):
+    def test_async_calls_share_one(self):
+        group = AsyncSingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 'value'
+
+        async def main():
+            return await asyncio.gather(
+                *[group.do('key', fetch) for i in range(8)]
+            )
+
+        loop = asyncio.new_event_loop()
+        try:
+            results = loop.run_until_complete(main())
+        finally:
+            loop.close()
+        self.assertEqual(calls, [1])
+        self.assertEqual(results, ['value'] * 8)
+        self.assertEqual(group.in_flight(), 0)
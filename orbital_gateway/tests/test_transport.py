@@ -0,0 +1,75 @@
+import threading
+import unittest
+
+from six.moves import BaseHTTPServer
+
+from ..orbital_gateway import MarkForCapture
+from ..transport import HTTPTransport
+
+
+class KeepAliveHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    connections = set()
+
+    def _reply(self, body):
+        self.connections.add(self.client_address)
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self._reply(b'<Response/>')
+
+    def do_HEAD(self):
+        self.connections.add(self.client_address)
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHTTPTransport(unittest.TestCase):
+    def setUp(self):
+        KeepAliveHandler.connections = set()
+        self.server = BaseHTTPServer.HTTPServer(
+            ('127.0.0.1', 0), KeepAliveHandler
+        )
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.url = 'http://127.0.0.1:%d/authorize' % self.server.server_port
+        self.transport = HTTPTransport(pool_size=2)
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connections_are_reused(self):
+        for i in range(5):
+            response = self.transport.post(self.url, b'<Request/>', {})
+            self.assertEqual(response.text, '<Response/>')
+        self.assertEqual(len(KeepAliveHandler.connections), 1)
+
+    def test_session_per_url(self):
+        other = 'http://127.0.0.1:1/authorize'
+        self.assertIs(
+            self.transport.session(self.url), self.transport.session(self.url)
+        )
+        self.assertIsNot(
+            self.transport.session(self.url), self.transport.session(other)
+        )
+
+    def test_warm_up(self):
+        dead = 'http://127.0.0.1:1/authorize'
+        self.assertEqual(self.transport.warm_up(self.url, dead, None), [dead])
+        self.transport.post(self.url, b'<Request/>', {})
+        self.assertEqual(len(KeepAliveHandler.connections), 1)
+
+    def test_endpoint_uses_transport(self):
+        capture = MarkForCapture(url=self.url, transport=self.transport)
+        self.assertEqual(capture.make_request(b'<Request/>'), '<Response/>')
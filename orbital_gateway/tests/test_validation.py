@@ -0,0 +1,145 @@
+import datetime
+import unittest
+
+from .. import config, validation
+from ..context import MerchantContext
+from ..orbital_gateway import Order, Profile
+from ..simulator import OrbitalSimulator, SimulatorTransport
+from ..validation import ValidationError, Validator, aba_valid
+from .orbital_gateway_test_data import ECHECK_LOOKUP, VISA_LOOKUP
+
+
+class TestValidator(unittest.TestCase):
+    def setUp(self):
+        self.validator = Validator(today=lambda: datetime.date(2020, 6, 15))
+
+    def codes(self, values, schema=validation.ORDER_CARD):
+        values = dict({
+            'MessageType': config.AUTHORIZE, 'OrderID': '1',
+            'Amount': '1000', 'AccountNum': '4112344112344113',
+        }, **values)
+        return dict(
+            (error.field, error.code)
+            for error in self.validator.errors(schema, values)
+        )
+
+    def test_valid(self):
+        self.assertEqual(self.codes({'Exp': '0620', 'CardSecVal': '411'}), {})
+
+    def test_card_number(self):
+        self.assertEqual(self.codes({'AccountNum': '4112344112344114'}),
+                         {'AccountNum': validation.CHECKSUM})
+        self.assertEqual(self.codes({'AccountNum': '41123441123441'}),
+                         {'AccountNum': validation.FORMAT})
+        self.assertEqual(self.codes({'AccountNum': '4112 3441'}),
+                         {'AccountNum': validation.FORMAT})
+
+    def test_accepted_brands(self):
+        self.validator = Validator(card_types=[config.CARD_TYPE_VISA])
+        self.assertEqual(self.codes({'AccountNum': '5112345112345114'}),
+                         {'AccountNum': validation.BRAND})
+
+    def test_expiry(self):
+        self.assertEqual(self.codes({'Exp': '0520'}),
+                         {'Exp': validation.EXPIRED})
+        self.assertEqual(self.codes({'Exp': '1320'}),
+                         {'Exp': validation.FORMAT})
+        self.assertEqual(self.codes({'Exp': '06/20'}),
+                         {'Exp': validation.FORMAT})
+        refund = validation.ORDER_CARD_WITHOUT_AUTHORIZATION
+        self.assertEqual(self.codes({'Exp': '0520'}, refund), {})
+        self.assertEqual(self.codes({'Exp': '06/20'}, refund),
+                         {'Exp': validation.FORMAT})
+
+    def test_required_and_choices(self):
+        self.assertEqual(
+            self.codes({'MessageType': 'X', 'OrderID': None, 'Amount': ''}),
+            {'MessageType': validation.CHOICE,
+             'OrderID': validation.REQUIRED, 'Amount': validation.REQUIRED},
+        )
+        self.assertEqual(self.codes({'MessageType': config.FORCE_CAPTURE}),
+                         {'PriorAuthID': validation.REQUIRED})
+        self.assertEqual(self.codes({'OrderID': 'x' * 23}),
+                         {'OrderID': validation.TOO_LONG})
+
+    def test_reference_replaces_account(self):
+        self.assertEqual(self.codes({'AccountNum': ''}),
+                         {'AccountNum': validation.REQUIRED})
+        self.assertEqual(
+            self.codes({'AccountNum': '', 'CustomerRefNum': '123'}), {}
+        )
+
+    def test_echeck(self):
+        values = {
+            'BCRtNum': '122000248', 'CheckDDA': '08882711X6',
+            'BankAccountType': 'Q',
+            'BankPmtDelv': config.BEST_POSSIBLE_METHOD,
+        }
+        self.assertEqual(self.codes(values, validation.ORDER_ECHECK), {
+            'BCRtNum': validation.CHECKSUM, 'CheckDDA': validation.FORMAT,
+            'BankAccountType': validation.CHOICE,
+        })
+
+    def test_aba(self):
+        self.assertTrue(aba_valid('122000247'))
+        self.assertTrue(aba_valid('072403004'))
+        self.assertFalse(aba_valid('122000248'))
+        self.assertFalse(aba_valid('12200024'))
+
+
+class TestEndpointValidation(unittest.TestCase):
+    def setUp(self):
+        self.simulator = OrbitalSimulator(seed=1)
+        self.kwargs = {
+            'merchant_id': '1234', 'url': 'sim://primary',
+            'transport': SimulatorTransport(self.simulator),
+        }
+
+    def test_rejected_before_sending(self):
+        order = Order(order_id='1', **dict(
+            VISA_LOOKUP, cc_num='4112344112344114', amount='1.0x',
+            **self.kwargs
+        ))
+        with self.assertRaises(ValidationError) as context:
+            order.authorize()
+        self.assertEqual(sorted(context.exception.fields),
+                         ['AccountNum', 'Amount'])
+        self.assertIsInstance(context.exception, ValueError)
+        self.assertEqual(self.simulator.transactions, {})
+
+    def test_refund_to_an_expired_card(self):
+        order = Order(order_id='1', **dict(
+            VISA_LOOKUP, cc_expiry='0120', **self.kwargs
+        ))
+        with self.assertRaises(ValidationError):
+            order.authorize()
+        result = order.refund()
+        self.assertEqual(result['ProcStatus'], config.PROCSTATUS_SUCCESS)
+
+    def test_disabled(self):
+        order = Order(order_id='1', validator=None, **dict(
+            VISA_LOOKUP, amount='1.0x', **self.kwargs
+        ))
+        order.render_charge()
+
+    def test_echeck_order(self):
+        Order(order_id='1', **dict(ECHECK_LOOKUP, **self.kwargs)).authorize()
+        order = Order(order_id='2', **dict(
+            ECHECK_LOOKUP, routing_number='122000248', **self.kwargs
+        ))
+        with self.assertRaises(ValidationError):
+            order.authorize()
+
+    def test_profile(self):
+        profile = Profile(cc_expiry='13', **dict(VISA_LOOKUP, **self.kwargs))
+        with self.assertRaises(ValidationError) as context:
+            profile.create()
+        self.assertEqual(context.exception.fields, ['CCExpireDate'])
+
+    def test_context_order(self):
+        context = MerchantContext(
+            validator=Validator(card_types=[config.CARD_TYPE_MC]),
+            **self.kwargs
+        )
+        with self.assertRaises(ValidationError):
+            context.order(order_id='1', **VISA_LOOKUP).render_charge()
@@ -0,0 +1,118 @@
+import time
+import unittest
+
+from ..money import InvalidAmount, Money
+from ..simulator import DO_NOT_HONOR, OrbitalSimulator, SimulatorTransport
+from ..workflow import (
+    AUTHORIZED, CAPTURED, DECLINED, EXPIRED, FAILED, QUEUED, CaptureWorkflow,
+    UnknownOrder, WorkflowError,
+)
+from .orbital_gateway_test_data import MASTERCARD_LOOKUP, VISA_LOOKUP
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCaptureWorkflow(unittest.TestCase):
+    def setUp(self):
+        self.simulator = OrbitalSimulator(
+            seed=1, declines={MASTERCARD_LOOKUP['cc_num']: DO_NOT_HONOR}
+        )
+        self.kwargs = {
+            'url': 'sim://primary', 'merchant_id': '1234',
+            'transport': SimulatorTransport(self.simulator),
+        }
+
+    def workflow(self, **kwargs):
+        kwargs.setdefault('flush_interval', None)
+        workflow = CaptureWorkflow(endpoint_kwargs=self.kwargs, **kwargs)
+        self.addCleanup(workflow.close, flush=False)
+        return workflow
+
+    def authorize(self, workflow, order_id, card=VISA_LOOKUP, amount='10.00'):
+        return workflow.authorize(**dict(card, order_id=order_id,
+                                         amount=amount))
+
+    def test_authorize_and_capture(self):
+        workflow = self.workflow()
+        order = self.authorize(workflow, '1')
+        self.assertEqual(order.state, AUTHORIZED)
+        self.assertEqual(order.amount, Money(1000))
+        self.assertTrue(order.tx_ref_num)
+        declined = self.authorize(workflow, '2', MASTERCARD_LOOKUP)
+        self.assertEqual(declined.state, DECLINED)
+        self.assertEqual(workflow.capture('1', '4.50').state, QUEUED)
+        with self.assertRaises(WorkflowError):
+            workflow.capture('1')
+        with self.assertRaises(WorkflowError):
+            workflow.capture('2')
+        with self.assertRaises(UnknownOrder):
+            workflow.capture('3')
+        self.assertEqual(workflow.flush(), 1)
+        order = workflow.get('1')
+        self.assertEqual(order.state, CAPTURED)
+        self.assertEqual(order.capture_amount, Money(450))
+        self.assertEqual(order.response['Amount'], '450')
+        self.assertEqual(workflow.counts(), {CAPTURED: 1, DECLINED: 1})
+        self.assertEqual(workflow.forget(), 2)
+        self.assertEqual(workflow.orders(), [])
+
+    def test_partial_capture_limit(self):
+        workflow = self.workflow()
+        self.authorize(workflow, '1')
+        with self.assertRaises(InvalidAmount):
+            workflow.capture('1', '10.01')
+        self.assertEqual(workflow.get('1').state, AUTHORIZED)
+
+    def test_failed_capture_can_be_queued_again(self):
+        workflow = self.workflow()
+        workflow.track('1', 'NOSUCHTXREFNUM', '5.00')
+        workflow.capture('1')
+        workflow.flush()
+        order = workflow.get('1')
+        self.assertEqual(order.state, FAILED)
+        self.assertEqual([o.order_id for o in workflow.orders(FAILED)], ['1'])
+        self.assertIsNotNone(order.response)
+        self.assertEqual(workflow.capture('1').state, QUEUED)
+
+    def test_expiry(self):
+        clock = Clock()
+        workflow = self.workflow(auth_ttl=100, clock=clock)
+        for order_id in '123':
+            self.authorize(workflow, order_id)
+        workflow.capture('1')
+        clock.now += 100
+        self.assertEqual(workflow.capture('2').state, EXPIRED)
+        self.assertEqual([o.order_id for o in workflow.expire()], ['3'])
+        self.assertEqual(workflow.flush(), 0)
+        self.assertEqual(workflow.get('1').state, EXPIRED)
+        self.assertEqual(self.simulator.requests, 3)
+
+    def test_size_triggered_batches(self):
+        workflow = self.workflow(batch_size=5)
+        for i in range(12):
+            self.authorize(workflow, str(i))
+            workflow.capture(str(i))
+        deadline = time.time() + 5
+        while len(workflow.orders(CAPTURED)) < 10 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(workflow.orders(CAPTURED)), 10)
+        self.assertEqual(len(workflow.orders(QUEUED)), 2)
+        workflow.close()
+        self.assertEqual(workflow.counts(), {CAPTURED: 12})
+        with self.assertRaises(WorkflowError):
+            workflow.capture('1')
+
+    def test_time_triggered_flush(self):
+        workflow = self.workflow(flush_interval=0.05)
+        self.authorize(workflow, '1')
+        workflow.capture('1')
+        deadline = time.time() + 5
+        while workflow.get('1').state != CAPTURED and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(workflow.get('1').state, CAPTURED)
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+import os
+import subprocess
+import sys
+import unittest
+import xml.etree.ElementTree as ET
+
+from ..orbital_gateway import remove_control_characters
+from ..xml_templates import (
+    TEMPLATE_DIR, CompiledTemplate, _cached_template, _read, compile_template,
+    load_template, template_names,
+)
+
+
+def legacy_render(xml_file_name, values, default_value=None):
+    """
+    The per-call ElementTree rendering parse_xml used to do.
+    """
+    root = ET.parse(os.path.join(TEMPLATE_DIR, xml_file_name)).getroot()
+    for key, value in values.items():
+        elem = root.find(".//%s" % key)
+        if elem is not None:
+            elem.text = value or default_value
+            if elem.text is not None:
+                elem.text = remove_control_characters(elem.text)
+    return ET.tostring(root)
+
+
+SAMPLE_VALUES = {
+    'OrbitalConnectionUsername': 'user',
+    'OrbitalConnectionPassword': 'p&ss<word>',
+    'BIN': '000001',
+    'CustomerBin': '000001',
+    'MerchantID': '1234',
+    'CustomerMerchantID': '1234',
+    'MessageType': 'A',
+    'AccountNum': '4112344112344113',
+    'CCAccountNum': '4112344112344113',
+    'OrderID': '946033583',
+    'Amount': '10000',
+    'AVSaddress1': u'1 Straße Blvd\x07',
+    'CustomerName': u'Zoë “Q” O\'Neil',
+    'AVSaddress2': '',
+    'CustomerAddress2': '',
+    'TxRefNum': None,
+    'CardSecValInd': '1',
+    'TerminalID': None,
+    'NotInTemplate': 'ignored',
+}
+
+
+class TestCompiledTemplates(unittest.TestCase):
+    def test_matches_elementtree(self):
+        for name in template_names():
+            for default_value in (None, ''):
+                self.assertEqual(
+                    load_template(name).render(
+                        dict(SAMPLE_VALUES), default_value=default_value,
+                        clean=remove_control_characters,
+                    ),
+                    legacy_render(name, dict(SAMPLE_VALUES), default_value),
+                    name,
+                )
+
+    def test_untouched_slots_keep_template_text(self):
+        for name in template_names():
+            self.assertEqual(
+                load_template(name).render({}), legacy_render(name, {})
+            )
+
+    def test_compiled_once(self):
+        self.assertIs(
+            load_template('order_new.xml'), load_template('order_new.xml')
+        )
+
+    def test_build_cache_is_current(self):
+        # rebuild with `python -m orbital_gateway.xml_templates`
+        for name in template_names():
+            cached = _cached_template(name, _read(name))
+            self.assertIsNotNone(cached, name)
+            compiled = compile_template(name)
+            for attribute in CompiledTemplate.__slots__:
+                self.assertEqual(getattr(cached, attribute),
+                                 getattr(compiled, attribute), name)
+
+
+class TestStartup(unittest.TestCase):
+    def test_import_is_light(self):
+        code = (
+            'import sys\n'
+            'from orbital_gateway.orbital_gateway import Order\n'
+            "Order(merchant_id='1', order_id='1', amount='1.00',\n"
+            "      cc_num='4112344112344113').render_charge()\n"
+            "print(' '.join(sorted(set(sys.modules) & {\n"
+            "    'requests', 'xml.etree.ElementTree', 'logging'})))\n"
+        )
+        root = os.path.dirname(os.path.dirname(TEMPLATE_DIR))
+        output = subprocess.check_output(
+            [sys.executable, '-c', code], cwd=root
+        )
+        self.assertEqual(output.strip(), b'')
+
@@ -0,0 +1,226 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.connection import (
+    HTTPConnection, HTTPSConnection,
+)
+from requests.packages.urllib3.connectionpool import (
+    HTTPConnectionPool, HTTPSConnectionPool,
+)
+from requests.packages.urllib3.exceptions import NewConnectionError
+
+clock = getattr(time, 'perf_counter', time.time)
+
+_connect_times = threading.local()
+
+
+class ConnectFailed(requests.exceptions.ConnectionError):
+    """
+    The connection could not be opened, so the request never left this
+    process.
+    """
+
+
+def request_was_sent(error):
+    """
+    Whether the request behind transport `error` may have reached Orbital.
+    Only connection failures are known not to have.
+    """
+    if isinstance(error, (ConnectFailed, requests.exceptions.ConnectTimeout)):
+        return False
+    if isinstance(error, requests.exceptions.ConnectionError):
+        reason = getattr(error.args[0] if error.args else None, 'reason', None)
+        if isinstance(reason, NewConnectionError):
+            return False
+    return True
+
+
+class TransportResponse(object):
+    """
+    Minimal stand-in for requests.Response, returned by transports that do
+    not go through requests.
+    """
+    __slots__ = ('url', 'status_code', 'text', 'elapsed', 'connect_time')
+
+    def __init__(self, url, status_code, text, elapsed=None,
+                 connect_time=None):
+        self.url = url
+        self.status_code = status_code
+        self.text = text
+        self.elapsed = elapsed
+        self.connect_time = connect_time
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(
+                '%s Error for url: %s' % (self.status_code, self.url),
+                response=self,
+            )
+
+
+class _TimedConnect(object):
+    """
+    Adds the time spent opening connections in this thread, TLS handshake
+    included, to the running total HTTPTransport.post reads.
+    """
+    def connect(self):
+        start = clock()
+        try:
+            return super(_TimedConnect, self).connect()
+        finally:
+            _connect_times.total = (
+                getattr(_connect_times, 'total', 0.0) + clock() - start
+            )
+
+
+class _TimedHTTPConnection(_TimedConnect, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnect, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super(_TimedAdapter, self).init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool,
+        }
+
+
+class HTTPTransport(object):
+    def __init__(self, pool_size=10, pool_block=False, keep_alive=True,
+                 connect_timeout=5.0, read_timeout=30.0):
+        """
+        Pooled HTTP transport shared by Endpoint instances.
+
+        One requests.Session is kept per gateway url, each with its own
+        connection pool, so repeated transactions reuse open TCP/TLS
+        connections instead of handshaking with Orbital every time.
+
+        pool_size       max connections kept open per url
+        pool_block      block when the pool is exhausted instead of opening
+                        throwaway connections
+        keep_alive      send `Connection: close` when False
+        connect_timeout seconds to wait for the connection to open
+        read_timeout    seconds to wait for Orbital to answer
+        """
+        self.pool_size = pool_size
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    @property
+    def timeout(self):
+        return (self.connect_timeout, self.read_timeout)
+
+    def session(self, url):
+        """
+        Return the session bound to `url`, creating it on first use.
+        """
+        try:
+            return self._sessions[url]
+        except KeyError:
+            pass
+        with self._lock:
+            if url not in self._sessions:
+                self._sessions[url] = self._new_session()
+            return self._sessions[url]
+
+    def _new_session(self):
+        session = requests.Session()
+        adapter = _TimedAdapter(
+            pool_connections=1,
+            pool_maxsize=self.pool_size,
+            pool_block=self.pool_block,
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+        return session
+
+    def post(self, url, data, headers, timeout=None):
+        """
+        `timeout` caps both the connect and read timeouts for this request.
+        The response's `connect_time` is the time spent opening a
+        connection for it, 0 when a pooled one was reused.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        elif not isinstance(timeout, tuple):
+            timeout = (
+                min(self.connect_timeout, timeout),
+                min(self.read_timeout, timeout),
+            )
+        _connect_times.total = 0.0
+        response = self.session(url).post(
+            url, data=data, headers=headers, timeout=timeout
+        )
+        response.connect_time = _connect_times.total
+        return response
+
+    def warm_up(self, *urls):
+        """
+        Pre-open a pooled connection to each url, e.g. at process start:
+
+            transport.warm_up(endpoint.url, endpoint.url2)
+
+        Returns the urls that could not be reached.
+        """
+        failed = []
+        for url in urls:
+            if not url:
+                continue
+            try:
+                self.session(url).head(url, timeout=self.timeout)
+            except requests.exceptions.RequestException:
+                failed.append(url)
+        return failed
+
+    def close(self):
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+        for session in sessions.values():
+            session.close()
+
+
+_default_transport = None
+_default_lock = threading.Lock()
+
+
+def get_default_transport():
+    """
+    Process wide transport used by every Endpoint that is not given one.
+    """
+    global _default_transport
+    if _default_transport is None:
+        with _default_lock:
+            if _default_transport is None:
+                _default_transport = HTTPTransport()
+    return _default_transport
+
+
+def set_default_transport(transport):
+    """
+    Replace the process wide transport, returns the previous one.
+    """
+    global _default_transport
+    with _default_lock:
+        previous, _default_transport = _default_transport, transport
+    return previous
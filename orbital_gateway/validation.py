@@ -0,0 +1,285 @@
+"""
+Local validation of requests before they go to Orbital.
+
+    try:
+        order.authorize()
+    except ValidationError as e:
+        for error in e.errors:
+            print(error.field, error.code, error.message)
+
+Every request is checked against a schema, a tuple of Fields naming a
+request element, whether it is required and what it may hold. All the
+invalid fields are reported at once. The check runs in render_*(), so an
+invalid transaction is never journaled or sent.
+
+Validation is on by default: endpoints use `default_validator`, and a
+request it rejects raises ValidationError instead of being sent. Pass
+`validator=` a Validator of your own, e.g. one accepting fewer card
+brands, or `validator=None` to send requests unchecked as before.
+
+Refunds and force captures do not need a live card, their expiry date is
+only checked for its format.
+"""
+import collections
+import re
+import time
+
+import six
+
+from . import cards, config
+
+# FieldError codes
+REQUIRED = 'required'
+TOO_LONG = 'too_long'
+CHOICE = 'choice'
+FORMAT = 'format'
+CHECKSUM = 'checksum'
+EXPIRED = 'expired'
+BRAND = 'brand'
+
+_DIGITS = re.compile(r'[0-9]+\Z')
+_EXPIRY = re.compile(r'(0[1-9]|1[0-2])([0-9]{2})\Z')
+_ABA_WEIGHTS = (3, 7, 1, 3, 7, 1, 3, 7, 1)
+
+
+class FieldError(object):
+    __slots__ = ('field', 'code', 'message')
+
+    def __init__(self, field, code, message):
+        self.field = field
+        self.code = code
+        self.message = message
+
+    def __repr__(self):
+        return 'FieldError(%s, %s)' % (self.field, self.code)
+
+
+class ValidationError(ValueError):
+    """
+    The request was rejected locally, `errors` holds a FieldError for
+    every invalid field.
+    """
+    def __init__(self, errors):
+        super(ValidationError, self).__init__('; '.join(
+            '%s %s' % (error.field, error.message) for error in errors
+        ))
+        self.errors = errors
+
+    @property
+    def fields(self):
+        return [error.field for error in self.errors]
+
+
+def aba_valid(routing_number):
+    """
+    True for a 9 digit ABA routing number with a good check digit.
+    """
+    if len(routing_number) != 9 or not _DIGITS.match(routing_number):
+        return False
+    return sum(
+        weight * (ord(digit) - 48)
+        for weight, digit in zip(_ABA_WEIGHTS, routing_number)
+    ) % 10 == 0
+
+
+def digits(value, validator):
+    if not _DIGITS.match(value):
+        return FORMAT, 'must only hold digits'
+
+
+def amount(value, validator):
+    if not _DIGITS.match(value):
+        return FORMAT, 'must be an amount of at most %d decimal places' % (
+            config.CURRENCY_EXPONENT
+        )
+
+
+def card_number(value, validator):
+    if not _DIGITS.match(value):
+        return FORMAT, 'must only hold digits'
+    info = cards.lookup(value)
+    if info is None:
+        if not 12 <= len(value) <= 19:
+            return FORMAT, 'must be 12 to 19 digits long'
+        if not cards.luhn_valid(value):
+            return CHECKSUM, 'fails the Luhn check'
+        return None
+    if info.brand not in validator.card_types:
+        return BRAND, '%s cards are not accepted' % info.brand
+    if not info.length_valid:
+        return FORMAT, 'must be %s digits long for %s' % (
+            ' or '.join(str(length) for length in info.lengths), info.brand
+        )
+    if not info.luhn_valid:
+        return CHECKSUM, 'fails the Luhn check'
+
+
+def expiry_format(value, validator):
+    if not _EXPIRY.match(value):
+        return FORMAT, 'must be MMYY'
+
+
+def expiry(value, validator):
+    match = _EXPIRY.match(value)
+    if match is None:
+        return FORMAT, 'must be MMYY'
+    month, year = int(match.group(1)), 2000 + int(match.group(2))
+    today = validator.today()
+    if (year, month) < (today.year, today.month):
+        return EXPIRED, 'is in the past'
+
+
+def card_security_value(value, validator):
+    if not 3 <= len(value) <= 4 or not _DIGITS.match(value):
+        return FORMAT, 'must be 3 or 4 digits'
+
+
+def routing_number(value, validator):
+    if len(value) != 9 or not _DIGITS.match(value):
+        return FORMAT, 'must be 9 digits'
+    if not aba_valid(value):
+        return CHECKSUM, 'fails the ABA checksum'
+
+
+class Field(object):
+    __slots__ = ('name', 'required', 'max_length', 'choices', 'check')
+
+    def __init__(self, name, required=False, max_length=None, choices=None,
+                 check=None):
+        """
+        name        request element
+        required    True, or a function of the request values telling
+                    whether the field is needed
+        max_length  longest value Orbital takes
+        choices     the values Orbital takes
+        check       function(value, validator) returning (code, message)
+                    for an invalid value
+        """
+        self.name = name
+        self.required = required
+        self.max_length = max_length
+        self.choices = frozenset(choices) if choices is not None else None
+        self.check = check
+
+
+def _without_reference(values):
+    # charges against a profile or an earlier transaction carry no account
+    return not values.get('CustomerRefNum') and not values.get('TxRefNum')
+
+
+def _force_capture(values):
+    return values.get('MessageType') == config.FORCE_CAPTURE
+
+
+ORDER = (
+    Field('MessageType', True, choices=config.MESSAGE_TYPES),
+    Field('OrderID', True, max_length=22),
+    Field('Amount', True, max_length=12, check=amount),
+    Field('PriorAuthID', _force_capture, max_length=6),
+    Field('TxRefNum', max_length=40),
+    Field('CustomerRefNum', max_length=22),
+)
+
+ORDER_CARD = ORDER + (
+    Field('AccountNum', _without_reference, check=card_number),
+    Field('Exp', check=expiry),
+    Field('CardSecVal', check=card_security_value),
+)
+
+# message types that do not authorize the card, it may have expired since
+# the sale
+WITHOUT_AUTHORIZATION = (config.REFUND, config.FORCE_CAPTURE)
+
+ORDER_CARD_WITHOUT_AUTHORIZATION = ORDER + (
+    Field('AccountNum', _without_reference, check=card_number),
+    Field('Exp', check=expiry_format),
+    Field('CardSecVal', check=card_security_value),
+)
+
+ORDER_ECHECK = ORDER + (
+    Field('AVSname', max_length=30),
+    Field('BCRtNum', _without_reference, check=routing_number),
+    Field('CheckDDA', _without_reference, max_length=17, check=digits),
+    Field('BankAccountType', True, choices=config.DEPOSIT_ACCOUNT_TYPES),
+    Field('BankPmtDelv', True, choices=config.ECP_PAYMENT_DELIVERY_METHODS),
+)
+
+MARK_FOR_CAPTURE = (
+    Field('Amount', max_length=12, check=amount),
+)
+
+REVERSAL = (
+    Field('AdjustedAmt', max_length=12, check=amount),
+)
+
+PROFILE = (
+    Field('CustomerRefNum', max_length=22),
+    Field('CCAccountNum', check=card_number),
+    Field('CCExpireDate', check=expiry),
+    Field('ECPAccountRT', check=routing_number),
+    Field('ECPAccountDDA', max_length=17, check=digits),
+    Field('ECPAccountType', choices=config.DEPOSIT_ACCOUNT_TYPES),
+    Field('ECPBankPmtDlv', choices=config.ECP_PAYMENT_DELIVERY_METHODS),
+)
+
+
+_Date = collections.namedtuple('_Date', 'year month day')
+
+
+def _today():
+    # datetime.date.today() without importing datetime
+    now = time.localtime()
+    return _Date(now.tm_year, now.tm_mon, now.tm_mday)
+
+
+class Validator(object):
+    def __init__(self, card_types=config.CARD_TYPES, today=None):
+        """
+        card_types  card brands accepted, config.CARD_TYPE_* values
+        today       callable returning the date expiry dates are compared
+                    to, anything with .year and .month such as
+                    datetime.date.today; the local date from
+                    time.localtime() by default
+        """
+        self.card_types = frozenset(card_types)
+        self.today = today or _today
+
+    def errors(self, schema, values):
+        """
+        FieldErrors of the request `values` under `schema`.
+        """
+        errors = []
+        for field in schema:
+            value = values.get(field.name)
+            if value is None or value == '':
+                required = field.required
+                if required is True or required and required(values):
+                    errors.append(FieldError(field.name, REQUIRED,
+                                             'is required'))
+                continue
+            if not isinstance(value, six.string_types):
+                value = six.text_type(value)
+            if field.max_length is not None and \
+                    len(value) > field.max_length:
+                errors.append(FieldError(
+                    field.name, TOO_LONG,
+                    'must be at most %d characters' % field.max_length,
+                ))
+            elif field.choices is not None and value not in field.choices:
+                errors.append(FieldError(
+                    field.name, CHOICE,
+                    'must be one of %s' % ', '.join(sorted(field.choices)),
+                ))
+            elif field.check is not None:
+                error = field.check(value, self)
+                if error is not None:
+                    errors.append(FieldError(field.name, *error))
+        return errors
+
+    def validate(self, schema, values):
+        errors = self.errors(schema, values)
+        if errors:
+            raise ValidationError(errors)
+
+
+default_validator = Validator()
@@ -0,0 +1,376 @@
+"""
+Authorize at checkout, capture at shipment, without keeping the books.
+
+    workflow = CaptureWorkflow(batch_size=100, flush_interval=30,
+                               endpoint_kwargs=credentials)
+    workflow.authorize(order_id='1001', amount='45.25', cc_num=cc_num,
+                       cc_expiry='1230')
+    ...
+    workflow.capture('1001')                    # shipped in full
+    workflow.capture('1002', amount='20.00')    # partial shipment
+    workflow.get('1001').state                  # 'queued', then 'captured'
+    workflow.close()
+
+The workflow remembers the TxRefNum and amount of every authorization,
+from authorize() or track() for ones made elsewhere. capture() only
+queues the MarkForCapture; queued captures go out together through a
+BatchRunner once `batch_size` of them are waiting or the oldest one has
+waited `flush_interval` seconds, or on flush() and close().
+
+A capture may be for less than the amount authorized, Orbital releases
+the rest. An authorization older than `auth_ttl` is no longer captured:
+the order is EXPIRED, and has to be authorized again. A capture that
+failed or was declined leaves the order FAILED and can be queued again.
+
+Orders are kept in memory until forget() drops the finished ones.
+"""
+import collections
+import threading
+import time
+
+from . import config
+from .batch import CAPTURE, SUCCESS, BatchRunner, classify
+from .money import InvalidAmount, Money
+from .orbital_gateway import Order
+
+AUTHORIZED = 'authorized'
+DECLINED = 'declined'
+QUEUED = 'queued'
+CAPTURING = 'capturing'
+CAPTURED = 'captured'
+FAILED = 'failed'
+EXPIRED = 'expired'
+
+# states capture() accepts an order in
+CAPTURABLE = (AUTHORIZED, FAILED)
+# states nothing happens to an order in anymore
+FINISHED = (DECLINED, CAPTURED, EXPIRED)
+
+
+class UnknownOrder(KeyError):
+    pass
+
+
+class WorkflowError(ValueError):
+    pass
+
+
+class OrderState(object):
+    __slots__ = (
+        'order_id', 'state', 'amount', 'tx_ref_num', 'merchant_id',
+        'authorized_at', 'capture_amount', 'queued_at', 'captured_at',
+        'response', 'error',
+    )
+
+    def __init__(self, order_id, state, amount, tx_ref_num=None,
+                 merchant_id=None, authorized_at=None, response=None):
+        """
+        order_id        our order id, the OrderID sent to Orbital
+        state           AUTHORIZED, DECLINED, QUEUED, CAPTURING, CAPTURED,
+                        FAILED or EXPIRED
+        amount          money.Money authorized
+        tx_ref_num      TxRefNum of the authorization
+        merchant_id     merchant the order was authorized for, None for
+                        the workflow's own
+        authorized_at   time of the authorization
+        capture_amount  money.Money to capture, once queued
+        queued_at       time the capture was last queued
+        captured_at     time Orbital confirmed the capture
+        response        last response, a dict
+        error           exception of the last failed capture
+        """
+        self.order_id = order_id
+        self.state = state
+        self.amount = amount
+        self.tx_ref_num = tx_ref_num
+        self.merchant_id = merchant_id
+        self.authorized_at = authorized_at
+        self.capture_amount = None
+        self.queued_at = None
+        self.captured_at = None
+        self.response = response
+        self.error = None
+
+    def copy(self):
+        state = OrderState.__new__(OrderState)
+        for name in self.__slots__:
+            setattr(state, name, getattr(self, name))
+        return state
+
+    def __repr__(self):
+        return '<OrderState %s %s>' % (self.order_id, self.state)
+
+
+class CaptureWorkflow(object):
+    def __init__(self, batch_size=100, flush_interval=60.0,
+                 auth_ttl=config.AUTHORIZATION_TTL, workers=8,
+                 rate_limit=None, burst=None, endpoint_kwargs=None,
+                 clock=time.time):
+        """
+        batch_size      captures queued before they are sent
+        flush_interval  most seconds a capture waits to be sent, None to
+                        only send full batches and on flush()
+        auth_ttl        seconds an authorization can still be captured
+        workers         captures sent concurrently
+        rate_limit      max requests per second per merchant id
+        burst           token bucket size for rate_limit
+        endpoint_kwargs passed to every Endpoint (credentials, urls,
+                        transport...)
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.auth_ttl = auth_ttl
+        self.endpoint_kwargs = endpoint_kwargs or {}
+        self.runner = BatchRunner(
+            workers=workers, rate_limit=rate_limit, burst=burst,
+            endpoint_kwargs=self.endpoint_kwargs,
+        )
+        self._clock = clock
+        self._orders = {}
+        self._queue = collections.deque()
+        self._condition = threading.Condition()
+        self._flushing = threading.Lock()
+        self._closed = False
+        self._flusher = threading.Thread(
+            target=self._flush_loop, name='orbital-capture-workflow',
+        )
+        self._flusher.daemon = True
+        self._flusher.start()
+
+    def authorize(self, **order_kwargs):
+        """
+        Authorize an Order built from `order_kwargs`, which must hold
+        order_id and amount, and record it. Returns its OrderState,
+        AUTHORIZED or DECLINED. Errors are raised and nothing is recorded.
+        """
+        order_id = order_kwargs['order_id']
+        amount = Money.parse(order_kwargs['amount'])
+        kwargs = dict(self.endpoint_kwargs)
+        kwargs.update(order_kwargs, amount=amount)
+        response = Order(**kwargs).authorize()
+        approved = classify(response) == SUCCESS
+        return self._record(OrderState(
+            order_id, AUTHORIZED if approved else DECLINED, amount,
+            tx_ref_num=response.get('TxRefNum'),
+            merchant_id=order_kwargs.get('merchant_id'),
+            authorized_at=self._clock(), response=response,
+        ))
+
+    def track(self, order_id, tx_ref_num, amount, authorized_at=None,
+              merchant_id=None):
+        """
+        Record an authorization made outside the workflow, e.g. through a
+        ClientRegistry, so it can be captured. Returns its OrderState.
+        """
+        return self._record(OrderState(
+            order_id, AUTHORIZED, Money.parse(amount), tx_ref_num=tx_ref_num,
+            merchant_id=merchant_id,
+            authorized_at=(
+                authorized_at if authorized_at is not None else self._clock()
+            ),
+        ))
+
+    def _record(self, order):
+        with self._condition:
+            current = self._orders.get(order.order_id)
+            if current is not None and current.state in (QUEUED, CAPTURING):
+                raise WorkflowError(
+                    'order %s is %s' % (order.order_id, current.state)
+                )
+            self._orders[order.order_id] = order
+            return order.copy()
+
+    def capture(self, order_id, amount=None):
+        """
+        Queue the capture of `amount`, all of the authorized amount by
+        default. Returns the OrderState, QUEUED, or EXPIRED when the
+        authorization is too old to capture. Raises UnknownOrder,
+        WorkflowError for an order that cannot be captured or a closed
+        workflow, and InvalidAmount for more than was authorized.
+        """
+        with self._condition:
+            if self._closed:
+                raise WorkflowError('the workflow is closed')
+            order = self._order(order_id)
+            if order.state not in CAPTURABLE:
+                raise WorkflowError('order %s is %s' % (order_id, order.state))
+            if amount is None:
+                amount = order.amount
+            else:
+                amount = Money.parse(amount, order.amount.exponent)
+                if amount > order.amount:
+                    raise InvalidAmount('%s is more than the %s authorized' % (
+                        amount, order.amount
+                    ))
+            if self._expired(order):
+                order.state = EXPIRED
+                return order.copy()
+            order.state = QUEUED
+            order.capture_amount = amount
+            order.queued_at = self._clock()
+            self._queue.append(order)
+            if len(self._queue) >= self.batch_size or len(self._queue) == 1:
+                # a full batch, or a new deadline for the flusher
+                self._condition.notify()
+            return order.copy()
+
+    def _order(self, order_id):
+        try:
+            return self._orders[order_id]
+        except KeyError:
+            raise UnknownOrder(order_id)
+
+    def _expired(self, order):
+        return self._clock() - order.authorized_at >= self.auth_ttl
+
+    def get(self, order_id):
+        """
+        OrderState of `order_id`, a copy. Raises UnknownOrder.
+        """
+        with self._condition:
+            return self._order(order_id).copy()
+
+    def orders(self, state=None):
+        """
+        OrderStates of every order, or of those in `state`, copies.
+        """
+        with self._condition:
+            return [
+                order.copy() for order in self._orders.values()
+                if state is None or order.state == state
+            ]
+
+    def counts(self):
+        """
+        Number of orders in every state.
+        """
+        with self._condition:
+            return dict(collections.Counter(
+                order.state for order in self._orders.values()
+            ))
+
+    def expire(self):
+        """
+        Mark the authorized orders too old to capture EXPIRED and return
+        their OrderStates, for them to be authorized again.
+        """
+        with self._condition:
+            expired = []
+            for order in self._orders.values():
+                if order.state in CAPTURABLE and self._expired(order):
+                    order.state = EXPIRED
+                    expired.append(order.copy())
+            return expired
+
+    def forget(self, states=FINISHED):
+        """
+        Drop the orders in `states` and return how many there were.
+        """
+        with self._condition:
+            forgotten = [
+                order_id for order_id, order in self._orders.items()
+                if order.state in states
+            ]
+            for order_id in forgotten:
+                del self._orders[order_id]
+            return len(forgotten)
+
+    def _due(self):
+        if len(self._queue) >= self.batch_size:
+            return True
+        return bool(self._queue) and self.flush_interval is not None and \
+            self._clock() - self._queue[0].queued_at >= self.flush_interval
+
+    def _flush_loop(self):
+        while True:
+            with self._condition:
+                while not self._closed and not self._due():
+                    timeout = None
+                    if self._queue and self.flush_interval is not None:
+                        timeout = max(0.0, self.flush_interval - (
+                            self._clock() - self._queue[0].queued_at
+                        ))
+                    self._condition.wait(timeout)
+                if self._closed:
+                    return
+            self._flush(due_only=True)
+
+    def flush(self):
+        """
+        Send the queued captures now, `batch_size` at a time, and return
+        how many were sent. Orders whose authorization expired while
+        queued are not sent.
+        """
+        return self._flush()
+
+    def _flush(self, due_only=False):
+        sent = 0
+        with self._flushing:
+            while True:
+                batch = self._take(due_only)
+                if not batch:
+                    return sent
+                sent += len(batch)
+                for result in self.runner.run(self._specs(batch)):
+                    self._captured(result)
+
+    def _take(self, due_only):
+        with self._condition:
+            batch = []
+            if due_only and not self._due():
+                return batch
+            while self._queue and len(batch) < self.batch_size:
+                order = self._queue.popleft()
+                if order.state != QUEUED or \
+                        self._orders.get(order.order_id) is not order:
+                    # forgotten or replaced while queued
+                    continue
+                if self._expired(order):
+                    order.state = EXPIRED
+                    continue
+                order.state = CAPTURING
+                batch.append(order)
+            return batch
+
+    def _specs(self, batch):
+        for order in batch:
+            spec = {
+                'action': CAPTURE, 'order_id': order.order_id,
+                'tx_ref_num': order.tx_ref_num, 'amount': order.capture_amount,
+            }
+            if order.merchant_id is not None:
+                spec['merchant_id'] = order.merchant_id
+            yield spec
+
+    def _captured(self, result):
+        with self._condition:
+            order = self._orders.get(result.spec['order_id'])
+            if order is None or order.state != CAPTURING:
+                return
+            order.response = result.response
+            order.error = result.error
+            if result.status == SUCCESS:
+                order.state = CAPTURED
+                order.captured_at = self._clock()
+            else:
+                order.state = FAILED
+
+    def close(self, flush=True):
+        """
+        Stop the background flushes, sending what is queued unless
+        `flush` is False.
+        """
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify()
+        self._flusher.join()
+        if flush:
+            self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
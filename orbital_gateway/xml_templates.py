@@ -0,0 +1,211 @@
+import io
+import os
+import threading
+import zlib
+
+import six
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), 'templates')
+CACHE_PATH = os.path.join(os.path.dirname(__file__), '_template_cache.py')
+
+_MARKER = '{{slot:%d}}'
+
+
+def escape_text(text):
+    """
+    Same escaping ElementTree applies to element text.
+    """
+    if '&' in text:
+        text = text.replace('&', '&amp;')
+    if '<' in text:
+        text = text.replace('<', '&lt;')
+    if '>' in text:
+        text = text.replace('>', '&gt;')
+    return text
+
+
+class CompiledTemplate(object):
+    """
+    An Orbital request template parsed once into static chunks and field
+    slots.
+
+    Every leaf element of the template is a slot, named by its tag. Only
+    the first element with a given tag is a slot, which mirrors the
+    `root.find(".//tag")` lookup Endpoint.parse_xml used to do. Rendering
+    is a single pass over the slots and produces the same bytes as
+    `ET.tostring(root)` of the filled in tree.
+    """
+    __slots__ = (
+        'name', 'chunks', 'slots', 'defaults', 'opens', 'closes', 'empties',
+    )
+
+    def __init__(self, name, root):
+        self.name = name
+        slots = []
+        defaults = []
+        seen = set()
+        for elem in root.iter():
+            if elem is root or len(elem) or elem.attrib or elem.tag in seen:
+                continue
+            seen.add(elem.tag)
+            defaults.append(self._element(elem.tag, elem.text))
+            elem.text = _MARKER % len(slots)
+            slots.append(elem.tag)
+
+        import xml.etree.ElementTree as ET
+        serialized = ET.tostring(root).decode('ascii')
+        chunks = []
+        for index, tag in enumerate(slots):
+            filled = '<%s>%s</%s>' % (tag, _MARKER % index, tag)
+            head, serialized = serialized.split(filled, 1)
+            chunks.append(head)
+        chunks.append(serialized)
+
+        self._set_parts(chunks, slots, defaults)
+
+    @classmethod
+    def from_parts(cls, name, chunks, slots, defaults):
+        """
+        Template already compiled, e.g. read from the build time cache.
+        """
+        template = cls.__new__(cls)
+        template.name = name
+        template._set_parts(chunks, slots, defaults)
+        return template
+
+    def _set_parts(self, chunks, slots, defaults):
+        self.chunks = tuple(chunks)
+        self.slots = tuple(slots)
+        self.defaults = tuple(defaults)
+        self.opens = tuple(u'<%s>' % tag for tag in slots)
+        self.closes = tuple(u'</%s>' % tag for tag in slots)
+        self.empties = tuple(u'<%s />' % tag for tag in slots)
+
+    @staticmethod
+    def _element(tag, text):
+        if text:
+            return u'<%s>%s</%s>' % (tag, escape_text(text), tag)
+        return u'<%s />' % tag
+
+    def render(self, values, default_value=None, clean=None):
+        """
+        Fill the slots from `values` and return the request bytes.
+
+        Slots missing from `values` keep the template text. A falsy value
+        is replaced by `default_value`, and `clean` (if given) is applied
+        to every non empty text before it is escaped.
+        """
+        chunks = self.chunks
+        defaults = self.defaults
+        opens, closes, empties = self.opens, self.closes, self.empties
+        parts = [chunks[0]]
+        append = parts.append
+        get = values.get
+        missing = self
+        for index, tag in enumerate(self.slots):
+            value = get(tag, missing)
+            if value is missing:
+                append(defaults[index])
+            else:
+                text = value or default_value
+                if text is not None:
+                    text = clean(text) if clean else six.text_type(text)
+                if text:
+                    append(opens[index])
+                    append(escape_text(text))
+                    append(closes[index])
+                else:
+                    append(empties[index])
+            append(chunks[index + 1])
+        return u''.join(parts).encode('ascii', 'xmlcharrefreplace')
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _read(name):
+    with io.open(os.path.join(TEMPLATE_DIR, name), 'rb') as f:
+        return f.read()
+
+
+def compile_template(name, source=None):
+    """
+    Parse and compile the template `name`.
+    """
+    import xml.etree.ElementTree as ET
+    if source is None:
+        source = _read(name)
+    return CompiledTemplate(name, ET.fromstring(source))
+
+
+def _cached_template(name, source):
+    """
+    The template from the build time cache, None when it is missing or
+    was built from another version of the file.
+    """
+    try:
+        from ._template_cache import TEMPLATES
+    except ImportError:
+        return None
+    entry = TEMPLATES.get(name)
+    if entry is None or entry[0] != zlib.crc32(source) & 0xffffffff:
+        return None
+    return CompiledTemplate.from_parts(name, *entry[1:])
+
+
+def load_template(name):
+    """
+    Return the compiled template for `name` from the templates directory.
+    It is compiled on first use in this process, unless the build time
+    cache written by build_cache() holds it.
+    """
+    try:
+        return _cache[name]
+    except KeyError:
+        pass
+    with _cache_lock:
+        if name not in _cache:
+            source = _read(name)
+            template = _cached_template(name, source)
+            if template is None:
+                template = compile_template(name, source)
+            _cache[name] = template
+        return _cache[name]
+
+
+def template_names():
+    return sorted(
+        name for name in os.listdir(TEMPLATE_DIR) if name.endswith('.xml')
+    )
+
+
+def build_cache(path=CACHE_PATH):
+    """
+    Write every template, compiled, as a Python module load_template()
+    reads instead of parsing the XML. Run at build time:
+
+        python -m orbital_gateway.xml_templates
+    """
+    lines = [
+        '# generated by `python -m orbital_gateway.xml_templates`, '
+        'do not edit',
+        'TEMPLATES = {',
+    ]
+    for name in template_names():
+        source = _read(name)
+        template = compile_template(name, source)
+        lines.append('    %r: (' % name)
+        lines.append('        %d,' % (zlib.crc32(source) & 0xffffffff))
+        for parts in (template.chunks, template.slots, template.defaults):
+            lines.append('        (')
+            lines.extend('            %r,' % str(part) for part in parts)
+            lines.append('        ),')
+        lines.append('    ),')
+    lines.append('}')
+    with io.open(path, 'w', encoding='ascii') as f:
+        f.write(u'\n'.join(lines) + u'\n')
+
+
+if __name__ == '__main__':
+    build_cache()
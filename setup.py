@@ -11,13 +11,13 @@ if 'test' in sys.argv:
 install_requires = [
     'requests>=2.0',
     'six',
+    'futures; python_version < "3"',
 ]
 
 tests_require = [
     'pytest',
     'responses',
     'coverage >= 3.7.1, < 5.0.0',
-    'vcrpy',
 ]
 
 setup(
@@ -36,11 +36,14 @@ setup(
         'Programming Language :: Python :: 2.7',
         'Programming Language :: Python :: 3.5',
     ],
-    packages=find_packages(exclude=['*.tests']),
+    packages=find_packages(exclude=['*.tests', 'benchmarks']),
     keywords='payment',
     install_requires=install_requires,
     tests_require=tests_require,
     setup_requires=setup_requires,
-    extras_require={},
-    package_data={'orbital_gateway': ['templates/*.xml']},
+    extras_require={
+        'async': ['aiohttp>=3.3'],
+        'prometheus': ['prometheus_client'],
+    },
+    package_data={'orbital_gateway': ['templates/*.xml', 'data/*.csv']},
 )